@@ -1,4 +1,6 @@
 import os
+import json
+import time
 import psycopg2
 from psycopg2.extras import execute_values
 
@@ -14,4 +16,108 @@ def get_db_connection():
         user=os.environ.get("DB_USER"),
         password=os.environ.get("DB_PASSWORD"),
         sslmode="require",
+        connect_timeout=10,
+        # Keep the socket alive while the container is frozen between invocations
+        keepalives=1,
+        keepalives_idle=60,
+        keepalives_interval=10,
+        keepalives_count=3,
     )
+
+
+# Kept at module scope so warm invocations of the same container skip the
+# TLS + auth handshake
+_warm_conn = None
+
+
+def get_warm_connection():
+    """
+    Return the connection cached by a previous invocation if it is still
+    usable, otherwise open a new one. Returns (conn, reused).
+    Callers must not close it; use close_warm_connection() after a failure.
+    """
+    global _warm_conn
+    if _warm_conn is not None and not _warm_conn.closed:
+        try:
+            # Roll back anything an interrupted invocation left open and drop
+            # any advisory locks it still held; this doubles as the ping
+            _warm_conn.rollback()
+            with _warm_conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock_all()")
+            _warm_conn.commit()
+            return _warm_conn, True
+        except psycopg2.Error:
+            close_warm_connection()
+
+    _warm_conn = get_db_connection()
+    return _warm_conn, False
+
+
+def close_warm_connection():
+    """Discard the cached connection so the next call reconnects"""
+    global _warm_conn
+    if _warm_conn is not None:
+        try:
+            _warm_conn.close()
+        except psycopg2.Error:
+            pass
+    _warm_conn = None
+
+
+def try_advisory_lock(conn, job, wait_seconds=0, poll_interval=1.0):
+    """
+    Take the session-level advisory lock for `job`, polling for up to
+    wait_seconds while another run holds it.
+    Returns (acquired, seconds_waited). The lock is held until
+    release_advisory_lock() or until the connection closes.
+    """
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        while True:
+            cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (job,))
+            acquired = cur.fetchone()[0]
+            if acquired or time.monotonic() - started + poll_interval > wait_seconds:
+                break
+            time.sleep(poll_interval)
+    # Don't leave the lock check sitting in an open transaction
+    conn.commit()
+    return acquired, time.monotonic() - started
+
+
+def release_advisory_lock(conn, job):
+    """Release the advisory lock taken by try_advisory_lock()"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (job,))
+    conn.commit()
+
+
+def record_ingest_run(
+    conn,
+    job,
+    started_at,
+    status,
+    ladders_committed=(),
+    ladders_skipped=None,
+    players_written=0,
+    lock_wait_seconds=None,
+):
+    """Write one row per run to ingest_log for monitoring"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO ingest_log
+                  (job, started_at, finished_at, status, ladders_committed,
+                   ladders_skipped, players_written, lock_wait_seconds)
+                VALUES (%s, %s, now(), %s, %s, %s, %s, %s)
+                """,
+                (
+                    job,
+                    started_at,
+                    status,
+                    list(ladders_committed),
+                    json.dumps(ladders_skipped or {}),
+                    players_written,
+                    lock_wait_seconds,
+                ),
+            )
@@ -1,18 +1,30 @@
 import os
 import json
+import math
 import asyncio
 import aiohttp
 from datetime import datetime, timezone
 from psycopg2.extras import execute_values
 import time
 from logger import setup_logger
-from db_utils import get_db_connection
+from db_utils import (
+    get_warm_connection,
+    close_warm_connection,
+    try_advisory_lock,
+    release_advisory_lock,
+    record_ingest_run,
+)
 
 # Set up logger
 logger = setup_logger("current_leaderboard")
 
 # Table names
 CURRENT_LEADERBOARD = "current_leaderboard"
+REGION_STATS = "region_stats"
+
+# Aggregates published to region_stats with every refresh
+TOP_AVERAGES = (25, 100)
+PERCENTILES = (50, 90, 99)
 
 # Configs
 REGIONS = ["US", "EU", "AP"]
@@ -21,6 +33,11 @@ REGION_MAPPING = {"US": "NA", "EU": "EU", "AP": "AP"}
 BASE_URL = "https://hearthstone.blizzard.com/en-us/api/community/leaderboardsData"
 CURRENT_SEASON = int(os.environ.get("CURRENT_SEASON", "17"))
 
+# Only one current leaderboard refresh may write at a time; a new run waits
+# this long for the previous one before skipping
+JOB_NAME = "current_leaderboard"
+LOCK_WAIT_SECONDS = int(os.environ.get("LOCK_WAIT_SECONDS", "30"))
+
 
 async def fetch_all_pages(session, region, mode_api, mode_short, sem):
     """Fetch all pages for a specific region and mode"""
@@ -143,11 +160,43 @@ def _make_names_unique(players):
     return final
 
 
-def update_current_leaderboard(players):
+def log_ingest_run(conn, started_at, status, **kwargs):
+    """Record the run in ingest_log; a logging failure must not fail the refresh"""
+    try:
+        record_ingest_run(conn, JOB_NAME, started_at, status, **kwargs)
+    except Exception as e:
+        logger.error(f"Error writing ingest log: {str(e)}")
+
+
+def ladder_stats(players):
+    """
+    One region_stats row per region/mode: player count, top-N average
+    ratings, rating percentiles (nearest rank, as percentile_disc) and the
+    top rating
+    """
+    ladders = {}
+    for p in players:
+        ladders.setdefault((p["region"], str(p["game_mode"])), []).append(p["rating"])
+
+    rows = []
+    for (region, game_mode), ratings in ladders.items():
+        ratings.sort()
+        count = len(ratings)
+        top_averages = [
+            sum(ratings[-n:]) / min(n, count) for n in TOP_AVERAGES
+        ]
+        percentiles = [
+            ratings[math.ceil(pct / 100 * count) - 1] for pct in PERCENTILES
+        ]
+        rows.append(
+            (region, game_mode, count, *top_averages, *percentiles, ratings[-1])
+        )
+    return rows
+
+
+def update_current_leaderboard(conn, players):
     """Update the current_leaderboard table with the latest data"""
-    conn = None
     try:
-        conn = get_db_connection()
         with conn:
             with conn.cursor() as cur:
                 cur.execute(f"TRUNCATE TABLE {CURRENT_LEADERBOARD};")
@@ -169,30 +218,116 @@ def update_current_leaderboard(players):
                 logger.info(
                     f"Inserted {len(players)} players into current_leaderboard."
                 )
+
+                # Aggregates for !stats, from the same rows; a plain DELETE
+                # keeps the old stats readable until this commits
+                stats = ladder_stats(players)
+                cur.execute(f"DELETE FROM {REGION_STATS}")
+                execute_values(
+                    cur,
+                    f"""
+                    INSERT INTO {REGION_STATS}
+                      (region, game_mode, player_count, top25_avg, top100_avg,
+                       p50_rating, p90_rating, p99_rating, max_rating)
+                    VALUES %s
+                    """,
+                    stats,
+                )
+                logger.info(f"Updated region stats for {len(stats)} ladders.")
                 return len(players)
     except Exception as e:
         logger.error(f"Error updating current_leaderboard: {str(e)}")
         raise
-    finally:
-        if conn:
-            conn.close()
 
 
 async def process_current_leaderboard():
-    """Main function to fetch and process current leaderboard data"""
+    """
+    Main function to fetch and process current leaderboard data. The write is
+    guarded by an advisory lock so an overlapping run can't interleave its
+    TRUNCATE/INSERT with ours.
+    """
     start_time = time.time()
+    started_at = datetime.now(timezone.utc)
     logger.info("Fetching current leaderboard data...")
-    players = await fetch_current_leaderboards()
-    logger.info(f"Fetched {len(players)} players.")
-    players_count = update_current_leaderboard(players)
+    fetch = asyncio.create_task(fetch_current_leaderboards())
+    conn = None
+    locked = False
+    failed = False
+    try:
+        connect_started = time.monotonic()
+        conn, reused = await asyncio.to_thread(get_warm_connection)
+        logger.info(
+            f"{'Reused' if reused else 'Opened'} database connection "
+            f"in {time.monotonic() - connect_started:.2f}s"
+        )
+
+        # Wait briefly for an overlapping run to finish while the fetch proceeds
+        locked, lock_wait = await asyncio.to_thread(
+            try_advisory_lock, conn, JOB_NAME, LOCK_WAIT_SECONDS
+        )
+        if not locked:
+            logger.warning(
+                f"Another {JOB_NAME} run still holds the lock after {lock_wait:.2f}s, skipping this run"
+            )
+            fetch.cancel()
+            log_ingest_run(
+                conn, started_at, "skipped_locked", lock_wait_seconds=lock_wait
+            )
+            return 0
+        if lock_wait >= 1:
+            logger.warning(f"Waited {lock_wait:.2f}s for the previous {JOB_NAME} run")
+
+        players = await fetch
+        logger.info(f"Fetched {len(players)} players.")
+        if not players:
+            # Every fetch failed; keep the last ladder and stats rather than
+            # truncating them to nothing
+            logger.warning("Fetched no players, keeping the current leaderboard")
+            log_ingest_run(
+                conn, started_at, "skipped_empty", lock_wait_seconds=lock_wait
+            )
+            players_count = 0
+        else:
+            players_count = update_current_leaderboard(conn, players)
+            log_ingest_run(
+                conn,
+                started_at,
+                "ok",
+                players_written=players_count,
+                lock_wait_seconds=lock_wait,
+            )
+    except Exception:
+        failed = True
+        raise
+    finally:
+        if not fetch.done():
+            fetch.cancel()
+        # The connection stays open for the next warm invocation unless this
+        # one left it in an unknown state
+        if locked and not failed and not conn.closed:
+            try:
+                release_advisory_lock(conn, JOB_NAME)
+            except Exception as e:
+                logger.error(f"Error releasing advisory lock: {str(e)}")
+                failed = True
+        if failed:
+            close_warm_connection()
+
     end_time = time.time()
     elapsed_time = end_time - start_time
     logger.info(f"Execution time: {elapsed_time:.2f} seconds")
     return players_count
 
 
+# The first invocation in a container is the cold start
+_cold_start = True
+
+
 def lambda_handler(event, context):
     """AWS Lambda entry point"""
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    start_time = time.monotonic()
     try:
         players_count = asyncio.run(process_current_leaderboard())
         return {
@@ -201,6 +336,8 @@ def lambda_handler(event, context):
                 {
                     "message": "Current leaderboard updated successfully",
                     "players_processed": players_count,
+                    "cold_start": cold_start,
+                    "duration_seconds": round(time.monotonic() - start_time, 2),
                 }
             ),
         }
@@ -210,6 +347,11 @@ def lambda_handler(event, context):
             "statusCode": 500,
             "body": json.dumps({"message": f"Error during execution: {str(e)}"}),
         }
+    finally:
+        logger.info(
+            f"{'Cold' if cold_start else 'Warm'} start invocation took "
+            f"{time.monotonic() - start_time:.2f}s"
+        )
 
 
 # For local testing
@@ -14,4 +14,49 @@ def get_db_connection():
         user=os.environ.get("DB_USER"),
         password=os.environ.get("DB_PASSWORD"),
         sslmode="require",
+        connect_timeout=10,
+        # Keep the socket alive while the container is frozen between invocations
+        keepalives=1,
+        keepalives_idle=60,
+        keepalives_interval=10,
+        keepalives_count=3,
     )
+
+
+# Kept at module scope so warm invocations of the same container skip the
+# TLS + auth handshake
+_warm_conn = None
+
+
+def get_warm_connection():
+    """
+    Return the connection cached by a previous invocation if it is still
+    usable, otherwise open a new one. Returns (conn, reused).
+    Callers must not close it; use close_warm_connection() after a failure.
+    """
+    global _warm_conn
+    if _warm_conn is not None and not _warm_conn.closed:
+        try:
+            # Roll back anything an interrupted invocation left open and drop
+            # any advisory locks it still held; this doubles as the ping
+            _warm_conn.rollback()
+            with _warm_conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock_all()")
+            _warm_conn.commit()
+            return _warm_conn, True
+        except psycopg2.Error:
+            close_warm_connection()
+
+    _warm_conn = get_db_connection()
+    return _warm_conn, False
+
+
+def close_warm_connection():
+    """Discard the cached connection so the next call reconnects"""
+    global _warm_conn
+    if _warm_conn is not None:
+        try:
+            _warm_conn.close()
+        except psycopg2.Error:
+            pass
+    _warm_conn = None
@@ -1,10 +1,12 @@
 from openai import OpenAI
 import os
-from dotenv import load_dotenv
 import re
 
-# Load environment variables from .env file
-load_dotenv()
+# Outside Lambda, load environment variables from a local .env file
+if "AWS_LAMBDA_FUNCTION_NAME" not in os.environ:
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 # Get API key from environment
 api_key = os.getenv("OPENAI_API_KEY")
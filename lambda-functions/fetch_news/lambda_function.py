@@ -2,8 +2,11 @@ import requests
 import re
 import html2text
 import json
-from db_utils import get_db_connection
-from gpt_call import summarize_and_format_patch, check_battlegrounds_relevance
+import time
+from db_utils import get_warm_connection, close_warm_connection
+
+# gpt_call (and the OpenAI client it builds) is only imported once a new post
+# needs summarizing, which most runs never do
 
 BASE_FORUM_URL = "https://us.forums.blizzard.com/en/hearthstone"
 BLOG_APIS = (
@@ -16,7 +19,7 @@ TRACKER_APIS = (
 
 
 def get_recent_urls(limit=10):
-    conn = get_db_connection()
+    conn, _ = get_warm_connection()
     with conn:
         with conn.cursor() as cur:
             cur.execute(
@@ -130,6 +133,8 @@ def get_forum_patch_notes():
 
 
 def insert_patch_to_supabase(post, relevant, table_name="news_posts"):
+    from gpt_call import summarize_and_format_patch
+
     # Generate slug (normalize topic_slug)
     slug = post["slug"].lower().replace("–", "-").replace(" ", "-")
 
@@ -156,7 +161,7 @@ def insert_patch_to_supabase(post, relevant, table_name="news_posts"):
         "battlegrounds_relevant": relevant,
     }
 
-    conn = get_db_connection()
+    conn, _ = get_warm_connection()
     with conn:
         with conn.cursor() as cur:
             # First, try to delete any existing record with the same slug to avoid conflicts
@@ -234,7 +239,41 @@ def extract_first_image(html):
     return match.group(1) if match else None
 
 
+def check_relevance(post):
+    from gpt_call import check_battlegrounds_relevance
+
+    return check_battlegrounds_relevance(post.get("body", ""))
+
+
+# The first invocation in a container is the cold start
+_cold_start = True
+
+
 def lambda_handler(event, context):
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    start_time = time.monotonic()
+    try:
+        process_new_posts()
+    except Exception:
+        close_warm_connection()
+        raise
+    duration = time.monotonic() - start_time
+    print(f"{'Cold' if cold_start else 'Warm'} start invocation took {duration:.2f}s")
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps(
+            {
+                "message": "Patch processing complete",
+                "cold_start": cold_start,
+                "duration_seconds": round(duration, 2),
+            }
+        ),
+    }
+
+
+def process_new_posts():
     recent_urls = get_recent_urls()
     blog_posts = get_blog_patch_notes()
     forum_posts = get_forum_patch_notes()
@@ -244,7 +283,7 @@ def lambda_handler(event, context):
             continue
         if "battlegrounds" not in blog_post.get("body", "").lower():
             continue
-        relevant = check_battlegrounds_relevance(blog_post.get("body", ""))
+        relevant = check_relevance(blog_post)
         insert_patch_to_supabase(blog_post, relevant)
 
     for forum_post in forum_posts:
@@ -252,11 +291,9 @@ def lambda_handler(event, context):
             continue
         if "battlegrounds" not in forum_post.get("body", "").lower():
             continue
-        relevant = check_battlegrounds_relevance(forum_post.get("body", ""))
+        relevant = check_relevance(forum_post)
         insert_patch_to_supabase(forum_post, relevant)
 
-    return {"statusCode": 200, "body": json.dumps("Patch processing complete")}
-
 
 # For local testing
 if __name__ == "__main__":
@@ -285,7 +322,7 @@ def test_insert_patch(use_blog=False):
     latest["is_published"] = False  # override publish flag
     latest["date"] = "2025-05-09T00:00:00Z"  # override created_at
     # Remove any existing test post to ensure upsert/replace
-    conn = get_db_connection()
+    conn, _ = get_warm_connection()
     with conn:
         with conn.cursor() as cur:
             cur.execute(
@@ -293,7 +330,7 @@ def test_insert_patch(use_blog=False):
                 (latest["slug"],),
             )
     # Summarize and format
-    relevant = check_battlegrounds_relevance(latest["body"])
+    relevant = check_relevance(latest)
     # Insert into Supabase
     insert_patch_to_supabase(latest, relevant, table_name="news_posts")
     print("Test insert completed for slug:", latest["slug"])
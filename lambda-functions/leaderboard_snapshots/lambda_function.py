@@ -1,25 +1,39 @@
 import os
 import json
 import asyncio
+import time
 import aiohttp
 from datetime import datetime, timezone, timedelta
 from psycopg2.extras import execute_values
 from logger import setup_logger
-from db_utils import get_db_connection
+from db_utils import (
+    get_db_connection,
+    get_warm_connection,
+    close_warm_connection,
+    try_advisory_lock,
+    release_advisory_lock,
+    record_ingest_run,
+)
+from milestones import MilestoneEngine
+from schema import SCHEMA_VERSION, ensure_schema, ensure_snapshot_partitions
 import pytz
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Outside Lambda, load environment variables from a local .env file
+if "AWS_LAMBDA_FUNCTION_NAME" not in os.environ:
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 # Set up logger
 logger = setup_logger("leaderboard_snapshots")
 
 # Table names
 LEADERBOARD_SNAPSHOTS = "leaderboard_snapshots"
-MILESTONE_TRACKING = "milestone_tracking"
 DAILY_LEADERBOARD_STATS = "daily_leaderboard_stats"
 PLAYERS_TABLE = "players"
+RATING_ROLLUP_HOURLY = "rating_rollup_hourly"
+RATING_ROLLUP_DAILY = "rating_rollup_daily"
+CURRENT_RANKS = "current_ranks"
 
 # Configs
 REGIONS = ["US", "EU", "AP"]
@@ -29,6 +43,9 @@ BASE_URL = "https://hearthstone.blizzard.com/en-us/api/community/leaderboardsDat
 CURRENT_SEASON = int(os.environ.get("CURRENT_SEASON", "17"))
 MILESTONE_START = int(os.environ.get("MILESTONE_START", "8000"))
 MILESTONE_INCREMENT = int(os.environ.get("MILESTONE_INCREMENT", "1000"))
+TRACK_PERSONAL_MILESTONES = (
+    os.environ.get("TRACK_PERSONAL_MILESTONES", "false").lower() == "true"
+)
 
 # Concurrency & batching
 FETCH_CONCURRENCY = int(
@@ -42,6 +59,57 @@ BATCH_WRITE_SIZE = int(
 
 MAX_PAGES = int(os.environ.get("MAX_PAGES", "40"))
 
+# Stop writing once this many seconds have passed (300s Lambda timeout - 60s buffer)
+WRITE_CUTOFF_SECONDS = int(os.environ.get("WRITE_CUTOFF_SECONDS", "240"))
+# Seconds kept free before the Lambda's own timeout when it is shorter than the cutoff
+DEADLINE_BUFFER_SECONDS = int(os.environ.get("DEADLINE_BUFFER_SECONDS", "20"))
+# Assumed cost of committing one ladder until a real one has been measured
+LADDER_COMMIT_ESTIMATE_SECONDS = float(
+    os.environ.get("LADDER_COMMIT_ESTIMATE_SECONDS", "5")
+)
+# Monthly leaderboard_snapshots partitions kept ready ahead of time
+SNAPSHOT_PARTITIONS_AHEAD = int(os.environ.get("SNAPSHOT_PARTITIONS_AHEAD", "2"))
+# How far back the change-point check looks for a player's last rating, so it
+# only has to search the newest partitions
+SNAPSHOT_LOOKBACK_DAYS = int(os.environ.get("SNAPSHOT_LOOKBACK_DAYS", "35"))
+# Only one snapshot ingest may write at a time; a new run waits this long for the
+# previous one before skipping
+JOB_NAME = "leaderboard_snapshots"
+LOCK_WAIT_SECONDS = int(os.environ.get("LOCK_WAIT_SECONDS", "30"))
+
+PACIFIC = pytz.timezone("America/Los_Angeles")
+
+# Module scope so the milestone frontier survives warm invocations
+MILESTONES = MilestoneEngine(
+    CURRENT_SEASON,
+    MILESTONE_START,
+    MILESTONE_INCREMENT,
+    track_personal=TRACK_PERSONAL_MILESTONES,
+)
+
+
+class Deadline:
+    """Time budget for one invocation, tracked with time.monotonic()"""
+
+    def __init__(self, seconds):
+        self.started = time.monotonic()
+        self.expires = self.started + seconds
+
+    @classmethod
+    def for_invocation(cls, context=None):
+        """Budget is the write cutoff, or less if the Lambda has less time left"""
+        seconds = WRITE_CUTOFF_SECONDS
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            remaining = context.get_remaining_time_in_millis() / 1000
+            seconds = min(seconds, remaining - DEADLINE_BUFFER_SECONDS)
+        return cls(max(seconds, 0))
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
 
 def get_max_pages(region: str, game_mode: int) -> int:
     """
@@ -135,63 +203,74 @@ async def fetch_region_mode_pages(
     return players
 
 
-async def fetch_leaderboards(max_pages=MAX_PAGES):
-    """Fetch leaderboard data from all regions and modes with smart pagination"""
-    players = []
-    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
-
-    # Configure session with timeouts and connection limits
-    timeout = aiohttp.ClientTimeout(total=60)  # 60 second timeout for entire session
-
-    # Fetch data from global regions (US, EU, AP)
-    async with aiohttp.ClientSession(
-        timeout=timeout,
+def _client_session():
+    """Create an aiohttp session with the shared timeout and connection limits"""
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=60),  # 60 second timeout per request
         connector=aiohttp.TCPConnector(
             limit=AIOHTTP_CONNECTOR_LIMIT, limit_per_host=AIOHTTP_PER_HOST_LIMIT
         ),
-    ) as session:
-        tasks = []
-        for mode_api, mode_short in MODES:
-            for api_region in REGIONS:
-                # Calculate max_pages based on region and game mode
-                mapped_region = REGION_MAPPING[api_region]
-                region_max_pages = get_max_pages(mapped_region, mode_short)
-                # Fetch pages for this region/mode until we get an empty page
-                tasks.append(
-                    fetch_region_mode_pages(
-                        session, api_region, mode_api, mode_short, sem, region_max_pages
-                    )
-                )
+    )
 
-        results = await asyncio.gather(*tasks)
-        for result in results:
-            if result:
-                players.extend(result)
 
-    # Fetch data from China region with smart pagination
-    async with aiohttp.ClientSession(
-        timeout=timeout,
-        connector=aiohttp.TCPConnector(
-            limit=AIOHTTP_CONNECTOR_LIMIT, limit_per_host=AIOHTTP_PER_HOST_LIMIT
-        ),
-    ) as session:
-        cn_tasks = []
-        for mode_short, mode_name in [(0, "battlegrounds"), (1, "battlegroundsduo")]:
-            # Calculate max_pages based on region and game mode
-            cn_max_pages = get_max_pages("CN", mode_short)
-            cn_tasks.append(
-                fetch_cn_region_mode_pages(
-                    session, mode_short, mode_name, sem, cn_max_pages
-                )
+def ladder_fetchers(session, sem):
+    """
+    Build one fetch coroutine per region/mode ladder, keyed by (region, game_mode).
+    Global regions (US, EU, AP) and CN share the same session and semaphore.
+    """
+    fetchers = {}
+    for mode_api, mode_short in MODES:
+        for api_region in REGIONS:
+            mapped_region = REGION_MAPPING[api_region]
+            fetchers[(mapped_region, mode_short)] = fetch_region_mode_pages(
+                session,
+                api_region,
+                mode_api,
+                mode_short,
+                sem,
+                get_max_pages(mapped_region, mode_short),
             )
+        fetchers[("CN", mode_short)] = fetch_cn_region_mode_pages(
+            session, mode_short, mode_api, sem, get_max_pages("CN", mode_short)
+        )
+    return fetchers
 
-        cn_results = await asyncio.gather(*cn_tasks)
-        for result in cn_results:
-            if result:
-                players.extend(result)
 
-    logger.info(f"Fetched {len(players)} players from all regions including CN")
-    return _make_names_unique(players)
+async def produce_ladders(queue, deadline=None):
+    """
+    Fetch every region/mode ladder concurrently and put each one on the queue
+    as (key, players, skip_reason) as soon as all of its pages are in. Ladders
+    that fail or don't finish before the deadline are queued with players=None.
+    A final None marks the end of the fetch.
+    Returns the time.monotonic() at which the last ladder finished downloading.
+    """
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    timeout = deadline.remaining() if deadline else None
+
+    async def _fetch(key, fetcher):
+        try:
+            return key, await asyncio.wait_for(fetcher, timeout), None
+        except asyncio.TimeoutError:
+            logger.warning(f"Fetch of {key[0]}/{key[1]} did not finish before the deadline")
+            return key, None, "fetch_deadline"
+        except Exception as e:
+            logger.error(f"Fetch of {key[0]}/{key[1]} failed: {str(e)}")
+            return key, None, "fetch_failed"
+
+    try:
+        async with _client_session() as session:
+            tasks = [
+                asyncio.create_task(_fetch(key, fetcher))
+                for key, fetcher in ladder_fetchers(session, sem).items()
+            ]
+            for finished in asyncio.as_completed(tasks):
+                key, players, skip_reason = await finished
+                if players is not None:
+                    players = _make_names_unique(players)
+                await queue.put((key, players, skip_reason))
+        return time.monotonic()
+    finally:
+        await queue.put(None)
 
 
 async def fetch_cn_page(session, url, params, sem, retries=3):
@@ -281,487 +360,614 @@ def _make_names_unique(players):
     return final
 
 
-def write_to_postgres(players):
-    """Write player data to the database and process milestones"""
-
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn:
-            with conn.cursor() as cur:
-                # Create or replace the estimate_placement PostgreSQL function
-                # This replicates the Python estimate_placement logic
-                cur.execute(
-                    """
-                    CREATE OR REPLACE FUNCTION estimate_placement(start_rating NUMERIC, end_rating NUMERIC)
-                    RETURNS NUMERIC
-                    LANGUAGE plpgsql
-                    IMMUTABLE
-                    AS $$
-                    DECLARE
-                        gain NUMERIC;
-                        dex_avg NUMERIC;
-                        placements NUMERIC[] := ARRAY[1, 2, 3, 3.5, 4, 4.5, 5, 5.5, 6, 6.5, 7, 7.5, 8];
-                        p NUMERIC;
-                        avg_opp NUMERIC;
-                        delta NUMERIC;
-                        best_placement NUMERIC := 1;
-                        best_delta NUMERIC := 'Infinity'::NUMERIC;
-                    BEGIN
-                        gain := end_rating - start_rating;
-                        
-                        -- Calculate dexAvg
-                        IF start_rating < 8200 THEN
-                            dex_avg := start_rating;
-                        ELSE
-                            dex_avg := start_rating - 0.85 * (start_rating - 8500);
-                        END IF;
-                        
-                        -- Find placement with smallest delta
-                        FOREACH p IN ARRAY placements
-                        LOOP
-                            -- avgOpp-formula
-                            avg_opp := start_rating - 148.1181435 * (100 - ((p - 1) * (200.0 / 7.0) + gain));
-                            
-                            -- Skip placements where avg_opp > 8500
-                            IF avg_opp > 8500 THEN
-                                CONTINUE;
-                            END IF;
-                            
-                            delta := ABS(dex_avg - avg_opp);
-                            
-                            IF delta < best_delta THEN
-                                best_delta := delta;
-                                best_placement := p;
-                            END IF;
-                        END LOOP;
-                        
-                        RETURN best_placement;
-                    END;
-                    $$;
-                """
-                )
-
-                # Map player_name -> player_id (upsert players, then fetch ids)
-                unique_names = sorted({p["player_name"] for p in players})
-                id_by_name = {}
-                if unique_names:
-                    # Helper to chunk large arrays
-                    def _chunks(lst, n):
-                        for i in range(0, len(lst), n):
-                            yield lst[i : i + n]
-
-                    # 1) Upsert without RETURNING (safe across execute_values batching)
-                    player_upsert_query = """
-                        INSERT INTO players (player_name)
-                        VALUES %s
-                        ON CONFLICT (player_name)
-                        DO UPDATE SET player_name = EXCLUDED.player_name
-                        """
-                    execute_values(
-                        cur,
-                        player_upsert_query,
-                        [(n,) for n in unique_names],
-                        page_size=BATCH_WRITE_SIZE,
-                    )
-
-                    # 2) Fetch ids for all names in chunks to avoid overly-large arrays
-                    id_rows = []
-                    for chunk in _chunks(unique_names, 1000):
-                        cur.execute(
-                            """
-                            SELECT player_id, player_name
-                            FROM players
-                            WHERE player_name = ANY(%s)
-                            """,
-                            (chunk,),
-                        )
-                        id_rows.extend(cur.fetchall())
-                    id_by_name = {name: pid for (pid, name) in id_rows}
+class SchemaBehind(RuntimeError):
+    """The database needs a migration the Lambda leaves to scripts/migrate.py"""
 
-                    # Sanity log
-                    if len(id_by_name) != len(unique_names):
-                        missing = [n for n in unique_names if n not in id_by_name]
-                        logger.warning(
-                            f"Player id lookup mismatch: expected {len(unique_names)}, got {len(id_by_name)}. Missing sample: {missing[:10]}"
-                        )
-                    logger.info(f"Prepared id map for {len(id_by_name)} players.")
-                else:
-                    logger.info("No player names to upsert into players table.")
-
-                # Process milestones after inserting player data
-                process_milestones(cur, players)
-
-                pacific = pytz.timezone("America/Los_Angeles")
-                now_utc = datetime.now(timezone.utc)
-                today_pt = now_utc.astimezone(pacific).date()
-                yesterday_pt = today_pt - timedelta(days=1)
-                is_monday = today_pt.weekday() == 0  # Monday is 0
-
-                # Stage today's polled rows in a temp table, then do a single server-side upsert
-                cur.execute(
-                    """
-                    CREATE TEMP TABLE tmp_daily (
-                      player_id int,
-                      game_mode game_mode_enum,
-                      region    region_enum,
-                      rating    int,
-                      rank      int,
-                      day_start date,
-                      updated_at timestamptz
-                    ) ON COMMIT DROP
-                    """
-                )
 
-                # Build temp rows from fetched players
-                tmp_rows = []
-                for p in players:
-                    pid = id_by_name.get(p["player_name"])
-                    if pid is None:
-                        continue
-                    tmp_rows.append(
-                        (
-                            pid,
-                            str(p["game_mode"]),  # label auto-casts to enum
-                            p["region"],  # label auto-casts to enum
-                            p["rating"],
-                            p["rank"],
-                            today_pt,
-                            now_utc,
-                        )
-                    )
-
-                if tmp_rows:
-                    execute_values(
-                        cur,
-                        """
-                        INSERT INTO tmp_daily (player_id, game_mode, region, rating, rank, day_start, updated_at)
-                        VALUES %s
-                        """,
-                        tmp_rows,
-                        page_size=BATCH_WRITE_SIZE,
-                    )
-
-                    # Single statement: insert new rows with correct initial counters,
-                    # and update existing rows by incrementing when rating changes.
-                    # For inserts, we carry yesterday's weekly unless Monday.
-                    cur.execute(
-                        f"""
-                        WITH prev AS (
-                          SELECT d.player_id, d.game_mode, d.region,
-                                 d.rating AS prev_rating,
-                                 d.weekly_games_played AS prev_weekly,
-                                 d.day_avg AS prev_day_avg,
-                                 d.weekly_avg AS prev_weekly_avg,
-                                 d.games_played AS prev_games_played
-                          FROM {DAILY_LEADERBOARD_STATS} d
-                          WHERE d.day_start = %s
-                        )
-                        INSERT INTO {DAILY_LEADERBOARD_STATS}
-                          (player_id, game_mode, region, day_start, rating, rank, games_played, weekly_games_played, day_avg, weekly_avg, updated_at)
-                        SELECT t.player_id, t.game_mode, t.region, t.day_start, t.rating, t.rank,
-                               CASE WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN 1 ELSE 0 END AS games_played,
-                               (CASE WHEN %s THEN 0 ELSE COALESCE(p.prev_weekly, 0) END)
-                                 + CASE WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN 1 ELSE 0 END AS weekly_games_played,
-                               CASE 
-                                 WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN
-                                   estimate_placement(p.prev_rating, t.rating)
-                                 ELSE NULL
-                               END AS day_avg,
-                               CASE 
-                                 WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN
-                                   estimate_placement(p.prev_rating, t.rating)
-                                 ELSE NULL
-                               END AS weekly_avg,
-                               t.updated_at
-                        FROM tmp_daily t
-                        LEFT JOIN prev p
-                          ON p.player_id = t.player_id
-                         AND p.game_mode = t.game_mode
-                         AND p.region    = t.region
-                        ON CONFLICT (player_id, game_mode, region, day_start)
-                        DO UPDATE SET
-                          rating = EXCLUDED.rating,
-                          rank = EXCLUDED.rank,
-                          games_played = CASE
-                            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN {DAILY_LEADERBOARD_STATS}.games_played + 1
-                            ELSE {DAILY_LEADERBOARD_STATS}.games_played
-                          END,
-                          weekly_games_played = CASE
-                            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN {DAILY_LEADERBOARD_STATS}.weekly_games_played + 1
-                            ELSE {DAILY_LEADERBOARD_STATS}.weekly_games_played
-                          END,
-                          day_avg = CASE
-                            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN
-                              CASE
-                                WHEN {DAILY_LEADERBOARD_STATS}.games_played = 0 OR {DAILY_LEADERBOARD_STATS}.day_avg IS NULL THEN
-                                  estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating)
-                                ELSE
-                                  ({DAILY_LEADERBOARD_STATS}.day_avg * {DAILY_LEADERBOARD_STATS}.games_played 
-                                   + estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating))
-                                  / ({DAILY_LEADERBOARD_STATS}.games_played + 1.0)
-                              END
-                            ELSE {DAILY_LEADERBOARD_STATS}.day_avg
-                          END,
-                          weekly_avg = CASE
-                            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN
-                              CASE
-                                WHEN {DAILY_LEADERBOARD_STATS}.weekly_games_played = 0 OR {DAILY_LEADERBOARD_STATS}.weekly_avg IS NULL THEN
-                                  estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating)
-                                ELSE
-                                  ({DAILY_LEADERBOARD_STATS}.weekly_avg * {DAILY_LEADERBOARD_STATS}.weekly_games_played 
-                                   + estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating))
-                                  / ({DAILY_LEADERBOARD_STATS}.weekly_games_played + 1.0)
-                              END
-                            ELSE {DAILY_LEADERBOARD_STATS}.weekly_avg
-                          END,
-                          updated_at = now()
-                        """,
-                        (yesterday_pt, is_monday),
-                    )
-                    logger.info(
-                        f"Daily upsert (server-side): affected_rows={cur.rowcount}"
-                    )
-                else:
-                    logger.info("No tmp_daily rows to upsert.")
-                # =============================
-                # Change-point insert into snapshots
-                # =============================
-                # Build staging rows with player_id + enums
-                snapshot_stage = []
-                for p in players:
-                    pid = id_by_name.get(
-                        p["player_name"]
-                    )  # must exist from earlier upsert
-                    if pid is None:
-                        continue
-                    snapshot_stage.append(
-                        (
-                            pid,  # player_id
-                            str(p["game_mode"]),  # game_mode_enum label '0' | '1'
-                            p["region"],  # region_enum label 'NA'|'EU'|'AP'|'CN'
-                            p["rank"],
-                            p["rating"],
-                            p["snapshot_time"],  # ISO string; cast to timestamptz below
-                        )
-                    )
-
-                if snapshot_stage:
-                    # 1) Put incoming poll into a TEMP table with proper enum types
-                    cur.execute(
-                        f"""
-                        CREATE TEMP TABLE tmp_ls (
-                          player_id int,
-                          game_mode { 'game_mode_enum' },
-                          region    { 'region_enum'   },
-                          rank      int,
-                          rating    int,
-                          snapshot_time timestamptz
-                        ) ON COMMIT DROP
-                        """.replace(
-                            "{ 'game_mode_enum' }", "game_mode_enum"
-                        ).replace(
-                            "{ 'region_enum'   }", "region_enum"
-                        )
-                    )
-
-                    # Insert rows, casting labels to enums/timestamptz
-                    execute_values(
-                        cur,
-                        """
-                        INSERT INTO tmp_ls (player_id, game_mode, region, rating, snapshot_time)
-                        VALUES %s
-                        """,
-                        [
-                            (
-                                r[0],
-                                r[1],  # label will auto-cast to game_mode_enum
-                                r[2],  # label will auto-cast to region_enum
-                                r[4],
-                                r[5],
-                            )
-                            for r in snapshot_stage
-                        ],
-                        page_size=BATCH_WRITE_SIZE,
-                    )
-
-                    # 2) Insert only change points into snapshots using a LATERAL lookup of the last rating
-                    cur.execute(
-                        f"""
-                        INSERT INTO {LEADERBOARD_SNAPSHOTS}
-                          (player_id, game_mode, region, rating, snapshot_time)
-                        SELECT t.player_id, t.game_mode, t.region, t.rating, t.snapshot_time
-                        FROM tmp_ls t
-                        LEFT JOIN LATERAL (
-                          SELECT ls.rating
-                          FROM {LEADERBOARD_SNAPSHOTS} ls
-                          WHERE ls.player_id = t.player_id
-                            AND ls.region    = t.region
-                            AND ls.game_mode = t.game_mode
-                          ORDER BY ls.snapshot_time DESC
-                          LIMIT 1
-                        ) prev ON TRUE
-                        WHERE prev.rating IS NULL OR prev.rating <> t.rating
-                        """
-                    )
-                    snapshot_inserted = cur.rowcount
-                    logger.info(
-                        f"Snapshots change-points: staged={len(snapshot_stage)}, inserted={snapshot_inserted}, skipped={len(snapshot_stage) - snapshot_inserted}"
-                    )
-                else:
-                    logger.info("No snapshot rows to stage (empty or missing ids).")
-    except Exception as e:
-        logger.error(f"Error inserting into DB: {str(e)}")
-        raise
-    finally:
-        if conn:
-            conn.close()
+# Set once the schema version has been checked; only done once per container
+_schema_checked = False
+# UTC month the snapshot partitions were last checked in
+_partitions_checked_for = None
 
 
-def process_milestones(cursor, players):
-    """Process rating milestones and insert into milestone_tracking table"""
-    try:
-        # Get existing milestones
-        cursor.execute(
-            f"""
-            SELECT region, game_mode, milestone 
-            FROM {MILESTONE_TRACKING} 
-            WHERE season = %s
+def check_schema_once(conn):
+    """
+    Verify (and if needed migrate) the schema version once per container, and
+    make sure upcoming snapshot partitions exist once per month. Raises
+    SchemaBehind if a heavy migration is still pending: the ladder writes and
+    the partition check need the latest schema.
+    """
+    global _schema_checked, _partitions_checked_for
+    if not _schema_checked:
+        # The slow migrations are left to scripts/migrate.py
+        version = ensure_schema(conn, allow_heavy=False)
+        logger.info(f"Schema at version {version}")
+        if version < SCHEMA_VERSION:
+            # Checked again on the next invocation
+            raise SchemaBehind(
+                f"Schema at version {version}, the ingest needs {SCHEMA_VERSION}; "
+                "run scripts/migrate.py"
+            )
+        _schema_checked = True
+
+    month = datetime.now(timezone.utc).strftime("%Y-%m")
+    if _partitions_checked_for != month:
+        created = ensure_snapshot_partitions(conn, SNAPSHOT_PARTITIONS_AHEAD)
+        if created:
+            logger.info(f"Created {created} leaderboard_snapshots partitions")
+        _partitions_checked_for = month
+
+
+def create_staging_tables(cur):
+    """Create the per-transaction temp tables that ladders are staged into"""
+    cur.execute(
+        """
+        CREATE TEMP TABLE tmp_daily (
+          player_id int,
+          game_mode game_mode_enum,
+          region    region_enum,
+          rating    int,
+          rank      int,
+          day_start date,
+          updated_at timestamptz
+        ) ON COMMIT DROP
+        """
+    )
+    cur.execute(
+        """
+        CREATE TEMP TABLE tmp_ls (
+          player_id int,
+          game_mode game_mode_enum,
+          region    region_enum,
+          rank      int,
+          rating    int,
+          snapshot_time timestamptz
+        ) ON COMMIT DROP
+        """
+    )
+    cur.execute(
+        """
+        CREATE TEMP TABLE tmp_changes (
+          player_id int,
+          game_mode game_mode_enum,
+          region    region_enum,
+          rating    int,
+          prev_rating int,
+          snapshot_time timestamptz
+        ) ON COMMIT DROP
+        """
+    )
+
+
+def _chunks(lst, n):
+    """Helper to chunk large arrays"""
+    for i in range(0, len(lst), n):
+        yield lst[i : i + n]
+
+
+def upsert_player_ids(cur, players):
+    """Map player_name -> player_id (upsert players, then fetch ids)"""
+    unique_names = sorted({p["player_name"] for p in players})
+    if not unique_names:
+        return {}
+
+    # 1) Upsert without RETURNING (safe across execute_values batching)
+    execute_values(
+        cur,
+        """
+        INSERT INTO players (player_name)
+        VALUES %s
+        ON CONFLICT (player_name)
+        DO UPDATE SET player_name = EXCLUDED.player_name
         """,
-            (CURRENT_SEASON,),
+        [(n,) for n in unique_names],
+        page_size=BATCH_WRITE_SIZE,
+    )
+
+    # 2) Fetch ids for all names in chunks to avoid overly-large arrays
+    id_rows = []
+    for chunk in _chunks(unique_names, 1000):
+        cur.execute(
+            """
+            SELECT player_id, player_name
+            FROM players
+            WHERE player_name = ANY(%s)
+            """,
+            (chunk,),
         )
+        id_rows.extend(cur.fetchall())
+    id_by_name = {name: pid for (pid, name) in id_rows}
+
+    # Sanity log
+    if len(id_by_name) != len(unique_names):
+        missing = [n for n in unique_names if n not in id_by_name]
+        logger.warning(
+            f"Player id lookup mismatch: expected {len(unique_names)}, got {len(id_by_name)}. Missing sample: {missing[:10]}"
+        )
+    return id_by_name
+
+
+def stage_ladder(cur, players):
+    """
+    Stage one fully fetched region/mode ladder into tmp_daily and tmp_ls.
+    Returns the player_name -> player_id map used for the staged rows.
+    """
+    id_by_name = upsert_player_ids(cur, players)
 
-        existing_milestones = set()
-        for row in cursor.fetchall():
-            existing_milestones.add(f"{row[0]}#{row[1]}#{row[2]}")
-
-        # Group players by region and game_mode
-        region_mode_players = {}
-        for player in players:
-            key = f"{player['region']}#{player['game_mode']}"
-            if key not in region_mode_players:
-                region_mode_players[key] = []
-            region_mode_players[key].append(player)
-
-        # Find highest rated player for each region/mode
-        milestones_to_insert = []
-        now = datetime.now(timezone.utc)
-
-        for key, players_list in region_mode_players.items():
-            region, game_mode = key.split("#")
-            # Sort by rating (highest first)
-            sorted_players = sorted(
-                players_list, key=lambda p: p["rating"], reverse=True
+    now_utc = datetime.now(timezone.utc)
+    today_pt = now_utc.astimezone(PACIFIC).date()
+
+    daily_rows = []
+    snapshot_rows = []
+    for p in players:
+        pid = id_by_name.get(p["player_name"])
+        if pid is None:
+            continue
+        # game_mode / region labels auto-cast to game_mode_enum / region_enum
+        daily_rows.append(
+            (
+                pid,
+                str(p["game_mode"]),
+                p["region"],
+                p["rating"],
+                p["rank"],
+                today_pt,
+                now_utc,
+            )
+        )
+        snapshot_rows.append(
+            (
+                pid,
+                str(p["game_mode"]),
+                p["region"],
+                p["rating"],
+                p["snapshot_time"],  # ISO string; cast to timestamptz
             )
+        )
 
-            if not sorted_players:
-                continue
-
-            # Get highest rated player
-            top_player = sorted_players[0]
-            top_rating = top_player["rating"]
-
-            # Calculate all milestones this player has achieved
-            milestone = MILESTONE_START
-            while milestone <= top_rating:
-                milestone_key = f"{region}#{game_mode}#{milestone}"
-
-                # Check if this milestone already exists
-                if milestone_key not in existing_milestones:
-                    milestones_to_insert.append(
-                        {
-                            "season": CURRENT_SEASON,
-                            "game_mode": game_mode,
-                            "region": region,
-                            "milestone": milestone,
-                            "player_name": top_player["player_name"],
-                            "timestamp": now,
-                            "rating": top_rating,
-                        }
-                    )
-
-                milestone += MILESTONE_INCREMENT
-
-        # Insert new milestones
-        if milestones_to_insert:
-            # Use ON CONFLICT DO NOTHING to handle duplicates gracefully
-            milestone_insert_query = f"""
-                INSERT INTO {MILESTONE_TRACKING}
-                (season, game_mode, region, milestone, player_name, timestamp, rating)
-                VALUES %s
-                ON CONFLICT (season, game_mode, region, milestone) DO NOTHING
+    if daily_rows:
+        execute_values(
+            cur,
             """
-            milestone_values = [
-                (
-                    m["season"],
-                    m["game_mode"],
-                    m["region"],
-                    m["milestone"],
-                    m["player_name"],
-                    m["timestamp"],
-                    m["rating"],
-                )
-                for m in milestones_to_insert
-            ]
+            INSERT INTO tmp_daily (player_id, game_mode, region, rating, rank, day_start, updated_at)
+            VALUES %s
+            """,
+            daily_rows,
+            page_size=BATCH_WRITE_SIZE,
+        )
+        execute_values(
+            cur,
+            """
+            INSERT INTO tmp_ls (player_id, game_mode, region, rating, snapshot_time)
+            VALUES %s
+            """,
+            snapshot_rows,
+            page_size=BATCH_WRITE_SIZE,
+        )
+    return id_by_name
 
-            execute_values(
-                cursor,
-                milestone_insert_query,
-                milestone_values,
-                page_size=BATCH_WRITE_SIZE,
-            )
-            logger.info(f"Processed {len(milestones_to_insert)} milestones.")
 
-    except Exception as e:
-        logger.error(f"Error processing milestones: {e}")
-        raise
+def apply_staged_ladders(cur, players, id_by_name):
+    """
+    Run the set-based upserts over everything staged in tmp_daily / tmp_ls:
+    milestones, the daily_leaderboard_stats upsert, the change-point
+    insert into leaderboard_snapshots and the rating rollups.
+    """
+    MILESTONES.process(cur, players, id_by_name)
+
+    today_pt = datetime.now(timezone.utc).astimezone(PACIFIC).date()
+    yesterday_pt = today_pt - timedelta(days=1)
+    is_monday = today_pt.weekday() == 0  # Monday is 0
+
+    # Single statement: insert new rows with correct initial counters,
+    # and update existing rows by incrementing when rating changes.
+    # For inserts, we carry yesterday's weekly unless Monday.
+    cur.execute(
+        f"""
+        WITH prev AS (
+          SELECT d.player_id, d.game_mode, d.region,
+                 d.rating AS prev_rating,
+                 d.weekly_games_played AS prev_weekly,
+                 d.day_avg AS prev_day_avg,
+                 d.weekly_avg AS prev_weekly_avg,
+                 d.games_played AS prev_games_played
+          FROM {DAILY_LEADERBOARD_STATS} d
+          WHERE d.day_start = %s
+        )
+        INSERT INTO {DAILY_LEADERBOARD_STATS}
+          (player_id, game_mode, region, day_start, rating, rank, games_played, weekly_games_played, day_avg, weekly_avg, updated_at)
+        SELECT t.player_id, t.game_mode, t.region, t.day_start, t.rating, t.rank,
+               CASE WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN 1 ELSE 0 END AS games_played,
+               (CASE WHEN %s THEN 0 ELSE COALESCE(p.prev_weekly, 0) END)
+                 + CASE WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN 1 ELSE 0 END AS weekly_games_played,
+               CASE 
+                 WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN
+                   estimate_placement(p.prev_rating, t.rating)
+                 ELSE NULL
+               END AS day_avg,
+               CASE 
+                 WHEN p.prev_rating IS NOT NULL AND p.prev_rating IS DISTINCT FROM t.rating THEN
+                   estimate_placement(p.prev_rating, t.rating)
+                 ELSE NULL
+               END AS weekly_avg,
+               t.updated_at
+        FROM tmp_daily t
+        LEFT JOIN prev p
+          ON p.player_id = t.player_id
+         AND p.game_mode = t.game_mode
+         AND p.region    = t.region
+        ON CONFLICT (player_id, game_mode, region, day_start)
+        DO UPDATE SET
+          rating = EXCLUDED.rating,
+          rank = EXCLUDED.rank,
+          games_played = CASE
+            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN {DAILY_LEADERBOARD_STATS}.games_played + 1
+            ELSE {DAILY_LEADERBOARD_STATS}.games_played
+          END,
+          weekly_games_played = CASE
+            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN {DAILY_LEADERBOARD_STATS}.weekly_games_played + 1
+            ELSE {DAILY_LEADERBOARD_STATS}.weekly_games_played
+          END,
+          day_avg = CASE
+            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN
+              CASE
+                WHEN {DAILY_LEADERBOARD_STATS}.games_played = 0 OR {DAILY_LEADERBOARD_STATS}.day_avg IS NULL THEN
+                  estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating)
+                ELSE
+                  ({DAILY_LEADERBOARD_STATS}.day_avg * {DAILY_LEADERBOARD_STATS}.games_played 
+                   + estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating))
+                  / ({DAILY_LEADERBOARD_STATS}.games_played + 1.0)
+              END
+            ELSE {DAILY_LEADERBOARD_STATS}.day_avg
+          END,
+          weekly_avg = CASE
+            WHEN EXCLUDED.rating <> {DAILY_LEADERBOARD_STATS}.rating THEN
+              CASE
+                WHEN {DAILY_LEADERBOARD_STATS}.weekly_games_played = 0 OR {DAILY_LEADERBOARD_STATS}.weekly_avg IS NULL THEN
+                  estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating)
+                ELSE
+                  ({DAILY_LEADERBOARD_STATS}.weekly_avg * {DAILY_LEADERBOARD_STATS}.weekly_games_played 
+                   + estimate_placement({DAILY_LEADERBOARD_STATS}.rating, EXCLUDED.rating))
+                  / ({DAILY_LEADERBOARD_STATS}.weekly_games_played + 1.0)
+              END
+            ELSE {DAILY_LEADERBOARD_STATS}.weekly_avg
+          END,
+          updated_at = now()
+        """,
+        (yesterday_pt, is_monday),
+    )
+    logger.info(f"Daily upsert (server-side): affected_rows={cur.rowcount}")
+
+    refresh_current_ranks(cur)
+
+    # Find the change points using a LATERAL lookup of the last rating. The
+    # lookback bound prunes the lookup to the newest partitions; a player
+    # unchanged for longer than that just gets a fresh anchor row.
+    cur.execute(
+        f"""
+        INSERT INTO tmp_changes
+          (player_id, game_mode, region, rating, prev_rating, snapshot_time)
+        SELECT t.player_id, t.game_mode, t.region, t.rating, prev.rating, t.snapshot_time
+        FROM tmp_ls t
+        LEFT JOIN LATERAL (
+          SELECT ls.rating
+          FROM {LEADERBOARD_SNAPSHOTS} ls
+          WHERE ls.player_id = t.player_id
+            AND ls.region    = t.region
+            AND ls.game_mode = t.game_mode
+            AND ls.snapshot_time >= now() - make_interval(days => %s)
+          ORDER BY ls.snapshot_time DESC
+          LIMIT 1
+        ) prev ON TRUE
+        WHERE prev.rating IS NULL OR prev.rating <> t.rating
+        """,
+        (SNAPSHOT_LOOKBACK_DAYS,),
+    )
+    cur.execute(
+        f"""
+        INSERT INTO {LEADERBOARD_SNAPSHOTS}
+          (player_id, game_mode, region, rating, snapshot_time)
+        SELECT player_id, game_mode, region, rating, snapshot_time
+        FROM tmp_changes
+        """
+    )
+    snapshot_inserted = cur.rowcount
+    cur.execute("SELECT COUNT(*) FROM tmp_ls")
+    staged = cur.fetchone()[0]
+    logger.info(
+        f"Snapshots change-points: staged={staged}, inserted={snapshot_inserted}, skipped={staged - snapshot_inserted}"
+    )
+
+    update_rating_rollups(cur)
+
+
+def refresh_current_ranks(cur):
+    """
+    Replace the staged ladders in current_ranks: upsert every staged rank,
+    then drop ranks deeper than a ladder now goes (e.g. a shorter CN page)
+    """
+    cur.execute(
+        f"""
+        INSERT INTO {CURRENT_RANKS} AS c (region, game_mode, rank, player_id, rating, updated_at)
+        SELECT DISTINCT ON (t.region, t.game_mode, t.rank)
+               t.region, t.game_mode, t.rank, t.player_id, t.rating, t.updated_at
+        FROM tmp_daily t
+        WHERE t.rank IS NOT NULL
+        ORDER BY t.region, t.game_mode, t.rank
+        ON CONFLICT (region, game_mode, rank)
+        DO UPDATE SET
+          player_id = EXCLUDED.player_id,
+          rating = EXCLUDED.rating,
+          updated_at = EXCLUDED.updated_at
+        """
+    )
+    upserted = cur.rowcount
+    cur.execute(
+        f"""
+        DELETE FROM {CURRENT_RANKS} c
+        USING (
+          SELECT region, game_mode, MAX(rank) AS depth
+          FROM tmp_daily
+          GROUP BY region, game_mode
+        ) l
+        WHERE c.region = l.region
+          AND c.game_mode = l.game_mode
+          AND c.rank > l.depth
+        """
+    )
+    logger.info(f"Current ranks: upserted={upserted}, trimmed={cur.rowcount}")
+
+
+# (table, bucket column, bucket expression over tmp_changes c)
+RATING_ROLLUPS = [
+    (RATING_ROLLUP_HOURLY, "hour_start", "date_trunc('hour', c.snapshot_time)"),
+    (
+        RATING_ROLLUP_DAILY,
+        "day_start",
+        "(c.snapshot_time AT TIME ZONE 'America/Los_Angeles')::date",
+    ),
+]
+
+
+def update_rating_rollups(cur):
+    """
+    Fold the staged change points into the hourly and daily rating rollups.
+    A change from a known previous rating counts as a game; the first row of
+    a bucket opens at the rating the player went into that game with.
+    """
+    for table, bucket_column, bucket in RATING_ROLLUPS:
+        cur.execute(
+            f"""
+            INSERT INTO {table} AS r
+              (player_id, game_mode, region, {bucket_column}, open_rating, high_rating,
+               low_rating, close_rating, games, placement_sum)
+            SELECT c.player_id, c.game_mode, c.region, {bucket},
+                   COALESCE(c.prev_rating, c.rating),
+                   GREATEST(c.rating, c.prev_rating),
+                   LEAST(c.rating, c.prev_rating),
+                   c.rating,
+                   CASE WHEN c.prev_rating IS NOT NULL THEN 1 ELSE 0 END,
+                   CASE
+                     WHEN c.prev_rating IS NOT NULL THEN estimate_placement(c.prev_rating, c.rating)
+                     ELSE 0
+                   END
+            FROM tmp_changes c
+            ON CONFLICT (player_id, region, game_mode, {bucket_column})
+            DO UPDATE SET
+              high_rating = GREATEST(r.high_rating, EXCLUDED.high_rating),
+              low_rating = LEAST(r.low_rating, EXCLUDED.low_rating),
+              close_rating = EXCLUDED.close_rating,
+              games = r.games + EXCLUDED.games,
+              placement_sum = r.placement_sum + EXCLUDED.placement_sum
+            """
+        )
+        logger.info(f"Rollup upsert into {table}: affected_rows={cur.rowcount}")
 
 
-async def process_leaderboards():
-    """Main function to fetch and process leaderboard data with timeout protection"""
-    start_time = datetime.now()
-    logger.info("Fetching leaderboard data...")
+def commit_ladder(conn, players):
+    """Stage and apply one region/mode ladder in its own transaction"""
+    with conn:
+        with conn.cursor() as cur:
+            create_staging_tables(cur)
+            id_by_name = stage_ladder(cur, players)
+            apply_staged_ladders(cur, players, id_by_name)
+    return sum(1 for p in players if p["player_name"] in id_by_name)
+
 
+def log_ingest_run(conn, started_at, status, **kwargs):
+    """Record the run in ingest_log; a logging failure must not fail the ingest"""
     try:
-        players = await fetch_leaderboards()
-        if not players:
+        record_ingest_run(conn, JOB_NAME, started_at, status, **kwargs)
+    except Exception as e:
+        logger.error(f"Error writing ingest log: {str(e)}")
+
+
+async def consume_ladders(queue, conn, deadline):
+    """
+    Commit each ladder as soon as it comes off the queue, while the remaining
+    ladders are still downloading. A ladder is only written if the deadline
+    leaves room for it, judged by the slowest commit seen so far.
+    Returns (committed, skipped, stage_intervals).
+    """
+    committed = {}  # "NA/0" -> rows written
+    skipped = {}  # "CN/0" -> reason
+    stage_intervals = []
+    commit_estimate = LADDER_COMMIT_ESTIMATE_SECONDS
+
+    while (item := await queue.get()) is not None:
+        (region, game_mode), ladder, skip_reason = item
+        label = f"{region}/{game_mode}"
+        if skip_reason:
+            skipped[label] = skip_reason
+            continue
+        if not ladder:
+            logger.warning(f"No players fetched for {label}")
+            skipped[label] = "empty"
+            continue
+
+        if deadline.remaining() < commit_estimate:
             logger.warning(
-                "No player data fetched — skipping DB write to avoid data loss."
+                f"Only {deadline.remaining():.2f}s left after {deadline.elapsed():.2f}s, "
+                f"not writing {label}"
             )
-            return 0
+            skipped[label] = "write_deadline"
+            continue
+
+        stage_start = time.monotonic()
+        try:
+            committed[label] = await asyncio.to_thread(commit_ladder, conn, ladder)
+        except Exception as e:
+            # The rolled back transaction may have advanced the cached frontier
+            MILESTONES.invalidate()
+            logger.error(f"Error writing {label}, rolled back: {str(e)}")
+            skipped[label] = "write_failed"
+            continue
+        stage_end = time.monotonic()
+        stage_intervals.append((stage_start, stage_end))
+        commit_estimate = max(commit_estimate, stage_end - stage_start)
+        logger.info(
+            f"Committed {label}: {committed[label]} rows in {stage_end - stage_start:.2f}s "
+            f"(t={deadline.elapsed():.2f}s)"
+        )
+
+    return committed, skipped, stage_intervals
+
+
+async def process_leaderboards(deadline=None):
+    """
+    Main function to fetch and process leaderboard data against a deadline.
+    Fetching and writing run as a producer/consumer pipeline, and each
+    region/mode ladder is committed independently as soon as it is fetched,
+    so a slow region can't cost the others their window.
+    """
+    deadline = deadline or Deadline.for_invocation()
+    started_at = datetime.now(timezone.utc)
+    logger.info("Fetching leaderboard data...")
 
-        fetch_time = (datetime.now() - start_time).total_seconds()
-        logger.info(f"Fetched {len(players)} players in {fetch_time:.2f}s.")
+    queue = asyncio.Queue()
+    producer = asyncio.create_task(produce_ladders(queue, deadline))
+    conn = None
+    locked = False
+    failed = False
+    try:
+        connect_started = time.monotonic()
+        conn, reused = await asyncio.to_thread(get_warm_connection)
+        logger.info(
+            f"{'Reused' if reused else 'Opened'} database connection "
+            f"in {time.monotonic() - connect_started:.2f}s"
+        )
 
-        # Check if we're approaching timeout (leave 60 seconds buffer for DB operations)
-        elapsed = (datetime.now() - start_time).total_seconds()
-        if elapsed > 240:  # 300 - 60 seconds buffer
+        # Wait briefly for an overlapping run to finish while the fetch proceeds
+        locked, lock_wait = await asyncio.to_thread(
+            try_advisory_lock,
+            conn,
+            JOB_NAME,
+            min(LOCK_WAIT_SECONDS, max(deadline.remaining(), 0)),
+        )
+        if not locked:
             logger.warning(
-                f"Approaching timeout after {elapsed}s, skipping database write"
+                f"Another {JOB_NAME} run still holds the lock after {lock_wait:.2f}s, skipping this run"
+            )
+            producer.cancel()
+            await asyncio.to_thread(
+                log_ingest_run,
+                conn,
+                started_at,
+                "skipped_locked",
+                lock_wait_seconds=lock_wait,
+            )
+            return 0
+        if lock_wait >= 1:
+            logger.warning(f"Waited {lock_wait:.2f}s for the previous {JOB_NAME} run")
+
+        try:
+            await asyncio.to_thread(check_schema_once, conn)
+        except SchemaBehind:
+            producer.cancel()
+            await asyncio.to_thread(
+                log_ingest_run,
+                conn,
+                started_at,
+                "skipped_schema",
+                lock_wait_seconds=lock_wait,
             )
-            return len(players)
+            raise
 
-        write_to_postgres(players)
-        total_time = (datetime.now() - start_time).total_seconds()
-        logger.info(f"DB write completed in {total_time:.2f}s")
+        committed, skipped, stage_intervals = await consume_ladders(
+            queue, conn, deadline
+        )
+        fetch_done = await producer
+
+        players_written = sum(committed.values())
+        if skipped:
+            logger.warning(f"Skipped ladders: {skipped}")
+        status = "ok" if not skipped else ("partial" if committed else "failed")
+        await asyncio.to_thread(
+            log_ingest_run,
+            conn,
+            started_at,
+            status,
+            ladders_committed=sorted(committed),
+            ladders_skipped=skipped,
+            players_written=players_written,
+            lock_wait_seconds=lock_wait,
+        )
 
-        return len(players)
+        # Write time spent while other ladders were still downloading
+        stage_time = sum(end - start for start, end in stage_intervals)
+        overlap = sum(
+            max(0.0, min(end, fetch_done) - start) for start, end in stage_intervals
+        )
+        logger.info(
+            f"Stage timings: lock_wait={lock_wait:.2f}s, fetch={fetch_done - deadline.started:.2f}s, "
+            f"write={stage_time:.2f}s ({overlap:.2f}s overlapped with fetch), "
+            f"total={deadline.elapsed():.2f}s"
+        )
+        logger.info(
+            f"Committed {len(committed)} ladders ({players_written} players), "
+            f"skipped {len(skipped)}"
+        )
+
+        return players_written
 
     except Exception as e:
+        failed = True
         logger.error(f"Error in process_leaderboards: {str(e)}")
         raise
+    finally:
+        if not producer.done():
+            producer.cancel()
+        # The connection stays open for the next warm invocation unless this
+        # one left it in an unknown state
+        if locked and not failed and not conn.closed:
+            try:
+                release_advisory_lock(conn, JOB_NAME)
+            except Exception as e:
+                logger.error(f"Error releasing advisory lock: {str(e)}")
+                failed = True
+        if failed:
+            close_warm_connection()
+
+
+# The first invocation in a container is the cold start
+_cold_start = True
 
 
 def lambda_handler(event, context):
     """AWS Lambda entry point"""
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    deadline = Deadline.for_invocation(context)
     try:
-        players_count = asyncio.run(process_leaderboards())
+        players_count = asyncio.run(process_leaderboards(deadline))
         return {
             "statusCode": 200,
             "body": json.dumps(
                 {
                     "message": "Leaderboard snapshots processed successfully",
                     "players_processed": players_count,
+                    "cold_start": cold_start,
+                    "duration_seconds": round(deadline.elapsed(), 2),
                 }
             ),
         }
@@ -771,6 +977,10 @@ def lambda_handler(event, context):
             "statusCode": 500,
             "body": json.dumps({"message": f"Error during execution: {str(e)}"}),
         }
+    finally:
+        logger.info(
+            f"{'Cold' if cold_start else 'Warm'} start invocation took {deadline.elapsed():.2f}s"
+        )
 
 
 # For local testing
@@ -0,0 +1,165 @@
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from logger import setup_logger
+
+logger = setup_logger("milestones")
+
+# Table names
+MILESTONE_TRACKING = "milestone_tracking"
+PLAYER_MILESTONES = "player_milestones"
+
+
+class MilestoneEngine:
+    """
+    Tracks rating milestones (e.g. 8000, 9000, ...) per region/game mode.
+
+    The highest milestone reached in each (region, game_mode) - the frontier -
+    is loaded once and then kept in memory across warm Lambda invocations, so
+    a poll only touches milestone_tracking when the frontier actually moves.
+    Personal-best milestones per player are tracked the same way when enabled.
+    """
+
+    def __init__(self, season, start, step, track_personal=False):
+        self.season = season
+        self.start = start
+        self.step = step
+        self.track_personal = track_personal
+        self._frontier = None  # (region, game_mode) -> highest milestone reached
+        self._personal = None  # (player_id, region, game_mode) -> highest milestone
+
+    def invalidate(self):
+        """Drop the cached frontier, e.g. after a rolled back transaction"""
+        self._frontier = None
+        self._personal = None
+
+    def milestone_for(self, rating):
+        """Highest milestone at or below rating, or None if below the first one"""
+        if rating < self.start:
+            return None
+        return self.start + (rating - self.start) // self.step * self.step
+
+    def _load(self, cursor):
+        if self._frontier is None:
+            cursor.execute(
+                f"""
+                SELECT region, game_mode, MAX(milestone)
+                FROM {MILESTONE_TRACKING}
+                WHERE season = %s
+                GROUP BY region, game_mode
+                """,
+                (self.season,),
+            )
+            self._frontier = {
+                (str(region), str(game_mode)): milestone
+                for region, game_mode, milestone in cursor.fetchall()
+            }
+            logger.info(f"Loaded milestone frontier: {self._frontier}")
+
+        if self.track_personal and self._personal is None:
+            cursor.execute(
+                f"""
+                SELECT player_id, region, game_mode, MAX(milestone)
+                FROM {PLAYER_MILESTONES}
+                WHERE season = %s
+                GROUP BY player_id, region, game_mode
+                """,
+                (self.season,),
+            )
+            self._personal = {
+                (player_id, str(region), str(game_mode)): milestone
+                for player_id, region, game_mode, milestone in cursor.fetchall()
+            }
+            logger.info(f"Loaded {len(self._personal)} personal-best milestones")
+
+    def _steps(self, reached, top):
+        """Milestones above `reached` up to and including `top`"""
+        first = self.start if reached is None else reached + self.step
+        return range(first, top + 1, self.step)
+
+    def process(self, cursor, players, id_by_name=None):
+        """
+        Record new milestones for a batch of players. The batch is scanned
+        once: for each region/mode the top rated player is kept, and if
+        personal tracking is on, every player at or above the first milestone.
+        """
+        self._load(cursor)
+
+        top = {}  # (region, game_mode) -> player
+        personal_candidates = []
+        for p in players:
+            rating = p["rating"]
+            if rating < self.start:
+                continue
+            key = (p["region"], str(p["game_mode"]))
+            best = top.get(key)
+            if best is None or rating > best["rating"]:
+                top[key] = p
+            if self.track_personal and id_by_name:
+                personal_candidates.append(p)
+
+        now = datetime.now(timezone.utc)
+        milestone_values = []
+        for (region, game_mode), p in top.items():
+            reached = self._frontier.get((region, game_mode))
+            for milestone in self._steps(reached, self.milestone_for(p["rating"])):
+                milestone_values.append(
+                    (
+                        self.season,
+                        game_mode,
+                        region,
+                        milestone,
+                        p["player_name"],
+                        now,
+                        p["rating"],
+                    )
+                )
+
+        if milestone_values:
+            # ON CONFLICT DO NOTHING in case another writer got there first
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {MILESTONE_TRACKING}
+                (season, game_mode, region, milestone, player_name, timestamp, rating)
+                VALUES %s
+                ON CONFLICT (season, game_mode, region, milestone) DO NOTHING
+                """,
+                milestone_values,
+            )
+            for _, game_mode, region, milestone, *_ in milestone_values:
+                key = (region, game_mode)
+                self._frontier[key] = max(self._frontier.get(key, milestone), milestone)
+            logger.info(f"Processed {len(milestone_values)} milestones.")
+
+        if personal_candidates:
+            self._process_personal(cursor, personal_candidates, id_by_name, now)
+
+    def _process_personal(self, cursor, players, id_by_name, now):
+        personal_values = []
+        for p in players:
+            pid = id_by_name.get(p["player_name"])
+            if pid is None:
+                continue
+            key = (pid, p["region"], str(p["game_mode"]))
+            reached = self._personal.get(key)
+            top = self.milestone_for(p["rating"])
+            if reached is not None and top <= reached:
+                continue
+            for milestone in self._steps(reached, top):
+                personal_values.append(
+                    (self.season, pid, key[2], key[1], milestone, p["rating"], now)
+                )
+            self._personal[key] = top
+
+        if personal_values:
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {PLAYER_MILESTONES}
+                (season, player_id, game_mode, region, milestone, rating, achieved_at)
+                VALUES %s
+                ON CONFLICT (season, player_id, game_mode, region, milestone) DO NOTHING
+                """,
+                personal_values,
+            )
+            logger.info(f"Processed {len(personal_values)} personal-best milestones.")
@@ -0,0 +1,691 @@
+"""
+Versioned schema migrations.
+
+Each migration runs exactly once, in its own transaction, and is recorded in
+schema_migrations. ensure_schema() is cheap when the database is already at
+SCHEMA_VERSION (one catalog lookup and one MAX() over a tiny table), so the
+ingest can call it at startup instead of running DDL on every write.
+
+Migrations are append-only: never edit one that has shipped, add a new one.
+Apply them ahead of a deploy with scripts/migrate.py.
+"""
+
+from logger import setup_logger
+
+logger = setup_logger("schema")
+
+SCHEMA_MIGRATIONS = "schema_migrations"
+
+# Lock key shared by every process that applies migrations
+MIGRATION_LOCK = "schema_migrations"
+
+ESTIMATE_PLACEMENT_FUNCTION = """
+CREATE OR REPLACE FUNCTION estimate_placement(start_rating NUMERIC, end_rating NUMERIC)
+RETURNS NUMERIC
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    gain NUMERIC;
+    dex_avg NUMERIC;
+    placements NUMERIC[] := ARRAY[1, 2, 3, 3.5, 4, 4.5, 5, 5.5, 6, 6.5, 7, 7.5, 8];
+    p NUMERIC;
+    avg_opp NUMERIC;
+    delta NUMERIC;
+    best_placement NUMERIC := 1;
+    best_delta NUMERIC := 'Infinity'::NUMERIC;
+BEGIN
+    gain := end_rating - start_rating;
+
+    -- Calculate dexAvg
+    IF start_rating < 8200 THEN
+        dex_avg := start_rating;
+    ELSE
+        dex_avg := start_rating - 0.85 * (start_rating - 8500);
+    END IF;
+
+    -- Find placement with smallest delta
+    FOREACH p IN ARRAY placements
+    LOOP
+        -- avgOpp-formula
+        avg_opp := start_rating - 148.1181435 * (100 - ((p - 1) * (200.0 / 7.0) + gain));
+
+        -- Skip placements where avg_opp > 8500
+        IF avg_opp > 8500 THEN
+            CONTINUE;
+        END IF;
+
+        delta := ABS(dex_avg - avg_opp);
+
+        IF delta < best_delta THEN
+            best_delta := delta;
+            best_placement := p;
+        END IF;
+    END LOOP;
+
+    RETURN best_placement;
+END;
+$$;
+"""
+
+# (version, description, sql). Statements must be safe to run against a
+# database that predates this subsystem, hence IF NOT EXISTS throughout.
+MIGRATIONS = [
+    (
+        1,
+        "core tables",
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'game_mode_enum') THEN
+                CREATE TYPE game_mode_enum AS ENUM ('0', '1');  -- 0 = solo, 1 = duo
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'region_enum') THEN
+                CREATE TYPE region_enum AS ENUM ('NA', 'EU', 'AP', 'CN');
+            END IF;
+        END
+        $$;
+
+        CREATE TABLE IF NOT EXISTS players (
+          player_id SERIAL PRIMARY KEY,
+          player_name TEXT NOT NULL UNIQUE
+        );
+
+        CREATE TABLE IF NOT EXISTS leaderboard_snapshots (
+          player_id INTEGER NOT NULL REFERENCES players (player_id),
+          game_mode game_mode_enum NOT NULL,
+          region region_enum NOT NULL,
+          rating INTEGER NOT NULL,
+          snapshot_time TIMESTAMPTZ NOT NULL,
+          PRIMARY KEY (player_id, game_mode, region, snapshot_time)
+        );
+
+        CREATE TABLE IF NOT EXISTS daily_leaderboard_stats (
+          player_id INTEGER NOT NULL REFERENCES players (player_id),
+          game_mode game_mode_enum NOT NULL,
+          region region_enum NOT NULL,
+          day_start DATE NOT NULL,            -- PT-based day start
+          rating INTEGER NOT NULL,
+          rank INTEGER,
+          games_played INTEGER NOT NULL DEFAULT 0,
+          weekly_games_played INTEGER NOT NULL DEFAULT 0,
+          day_avg NUMERIC,
+          weekly_avg NUMERIC,
+          updated_at TIMESTAMPTZ DEFAULT now(),
+          PRIMARY KEY (player_id, game_mode, region, day_start)
+        );
+
+        CREATE TABLE IF NOT EXISTS current_leaderboard (
+          player_name TEXT NOT NULL,
+          game_mode CHAR(1) NOT NULL,
+          region CHAR(2) NOT NULL,
+          rank INTEGER NOT NULL,
+          rating INTEGER NOT NULL,
+          PRIMARY KEY (player_name, game_mode, region)
+        );
+
+        CREATE TABLE IF NOT EXISTS milestone_tracking (
+          season SMALLINT NOT NULL,
+          game_mode game_mode_enum NOT NULL,
+          region region_enum NOT NULL,
+          milestone INTEGER NOT NULL,
+          player_name TEXT NOT NULL,
+          timestamp TIMESTAMPTZ NOT NULL,
+          rating INTEGER NOT NULL,
+          PRIMARY KEY (season, game_mode, region, milestone)
+        );
+
+        CREATE TABLE IF NOT EXISTS channels (
+          channel TEXT PRIMARY KEY,
+          player  TEXT,
+          youtube TEXT,
+          live    BOOLEAN NOT NULL DEFAULT FALSE,
+          added_at TIMESTAMPTZ DEFAULT now()
+        );
+
+        CREATE TABLE IF NOT EXISTS bg_entities (
+          id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+          entity_name TEXT NOT NULL UNIQUE,
+          entity_slug TEXT GENERATED ALWAYS AS (regexp_replace(lower(entity_name), '[^a-z0-9]', '', 'g')) STORED,
+          entity_id TEXT,
+          entity_type TEXT CHECK (entity_type IN ('hero', 'minion', 'buddy', 'spell', 'trinket', 'anomaly')),
+          image_url TEXT NOT NULL,
+          created_at TIMESTAMPTZ DEFAULT now()
+        );
+
+        -- For faster lookup during hover replacement
+        CREATE INDEX IF NOT EXISTS bg_entities_entity_slug_idx ON bg_entities (entity_slug);
+
+        CREATE TABLE IF NOT EXISTS news_posts (
+          id SERIAL PRIMARY KEY,
+          title TEXT NOT NULL,
+          slug TEXT NOT NULL,
+          type TEXT,
+          content TEXT,
+          summary TEXT,
+          image_url TEXT,
+          author TEXT,
+          created_at TIMESTAMPTZ DEFAULT now(),
+          updated_at TIMESTAMPTZ DEFAULT now(),
+          is_published BOOLEAN NOT NULL DEFAULT FALSE,
+          source TEXT,
+          metadata JSONB,
+          battlegrounds_relevant BOOLEAN
+        );
+        """,
+    ),
+    (2, "estimate_placement function", ESTIMATE_PLACEMENT_FUNCTION),
+    (
+        3,
+        "ingest_log",
+        """
+        -- One row per ingest run, written by the Lambdas
+        CREATE TABLE IF NOT EXISTS ingest_log (
+          id BIGSERIAL PRIMARY KEY,
+          job TEXT NOT NULL,
+          started_at TIMESTAMPTZ NOT NULL,
+          finished_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+          status TEXT NOT NULL,                -- ok | partial | failed | skipped_locked
+          ladders_committed TEXT[] NOT NULL DEFAULT '{}',   -- e.g. {NA/0,EU/0}
+          ladders_skipped JSONB NOT NULL DEFAULT '{}',      -- e.g. {"CN/0": "fetch_deadline"}
+          players_written INTEGER NOT NULL DEFAULT 0,
+          lock_wait_seconds REAL               -- time spent waiting on the job's advisory lock
+        );
+
+        -- For tables created before lock_wait_seconds was added
+        ALTER TABLE ingest_log ADD COLUMN IF NOT EXISTS lock_wait_seconds REAL;
+
+        CREATE INDEX IF NOT EXISTS ingest_log_job_started_idx ON ingest_log (job, started_at DESC);
+        """,
+    ),
+    (
+        4,
+        "player_milestones",
+        """
+        -- Personal-best milestones, written when TRACK_PERSONAL_MILESTONES=true
+        CREATE TABLE IF NOT EXISTS player_milestones (
+          season SMALLINT NOT NULL,
+          player_id INTEGER NOT NULL REFERENCES players (player_id),
+          game_mode game_mode_enum NOT NULL,
+          region region_enum NOT NULL,
+          milestone INTEGER NOT NULL,
+          rating INTEGER NOT NULL,
+          achieved_at TIMESTAMPTZ NOT NULL,
+          PRIMARY KEY (season, player_id, game_mode, region, milestone)
+        );
+        """,
+    ),
+    (
+        5,
+        "partition leaderboard_snapshots by month",
+        """
+        -- Creates the monthly partitions from the current month through
+        -- months_ahead; months already covered (e.g. by the history
+        -- partition) are skipped
+        CREATE OR REPLACE FUNCTION create_snapshot_partitions(months_ahead INTEGER)
+        RETURNS INTEGER
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            month_start TIMESTAMPTZ;
+            partition_name TEXT;
+            created INTEGER := 0;
+        BEGIN
+            FOR i IN 0..months_ahead LOOP
+                month_start := (date_trunc('month', now() AT TIME ZONE 'UTC')
+                                + make_interval(months => i)) AT TIME ZONE 'UTC';
+                partition_name := 'leaderboard_snapshots_' || to_char(month_start AT TIME ZONE 'UTC', '"y"YYYY"m"MM');
+                CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+                BEGIN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF leaderboard_snapshots FOR VALUES FROM (%L) TO (%L)',
+                        partition_name, month_start, month_start + interval '1 month'
+                    );
+                    created := created + 1;
+                EXCEPTION WHEN invalid_object_definition THEN
+                    -- Range already covered by another partition
+                    NULL;
+                END;
+            END LOOP;
+            RETURN created;
+        END;
+        $$;
+
+        DO $$
+        DECLARE
+            boundary TIMESTAMPTZ := (date_trunc('month', now() AT TIME ZONE 'UTC')
+                                     + interval '1 month') AT TIME ZONE 'UTC';
+            idx RECORD;
+            fk RECORD;
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_partitioned_table
+                WHERE partrelid = 'leaderboard_snapshots'::regclass
+            ) THEN
+                RETURN;
+            END IF;
+
+            -- Existing rows become one history partition, attached in place
+            -- rather than copied. A validated CHECK proving its range lets
+            -- ATTACH skip its own scan.
+            EXECUTE format(
+                'ALTER TABLE leaderboard_snapshots ADD CONSTRAINT leaderboard_snapshots_history_range '
+                'CHECK (snapshot_time < %L) NOT VALID',
+                boundary
+            );
+            ALTER TABLE leaderboard_snapshots VALIDATE CONSTRAINT leaderboard_snapshots_history_range;
+            ALTER TABLE leaderboard_snapshots RENAME TO leaderboard_snapshots_history;
+            FOR idx IN
+                SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = 'leaderboard_snapshots_history'::regclass
+                  AND c.relname LIKE 'leaderboard_snapshots%'
+            LOOP
+                EXECUTE format(
+                    'ALTER INDEX %I RENAME TO %I',
+                    idx.relname,
+                    regexp_replace(idx.relname, '^leaderboard_snapshots', 'leaderboard_snapshots_history')
+                );
+            END LOOP;
+
+            CREATE TABLE leaderboard_snapshots (
+                LIKE leaderboard_snapshots_history INCLUDING DEFAULTS INCLUDING INDEXES
+            ) PARTITION BY RANGE (snapshot_time);
+            -- Equivalent foreign keys on the history table are reused on attach
+            FOR fk IN
+                SELECT conname, pg_get_constraintdef(oid) AS def FROM pg_constraint
+                WHERE conrelid = 'leaderboard_snapshots_history'::regclass AND contype = 'f'
+            LOOP
+                EXECUTE format(
+                    'ALTER TABLE leaderboard_snapshots_history RENAME CONSTRAINT %I TO %I',
+                    fk.conname,
+                    regexp_replace(fk.conname, '^leaderboard_snapshots', 'leaderboard_snapshots_history')
+                );
+                EXECUTE format('ALTER TABLE leaderboard_snapshots ADD CONSTRAINT %I %s', fk.conname, fk.def);
+            END LOOP;
+
+            EXECUTE format(
+                'ALTER TABLE leaderboard_snapshots ATTACH PARTITION leaderboard_snapshots_history '
+                'FOR VALUES FROM (MINVALUE) TO (%L)',
+                boundary
+            );
+            ALTER TABLE leaderboard_snapshots_history DROP CONSTRAINT leaderboard_snapshots_history_range;
+        END
+        $$;
+
+        SELECT create_snapshot_partitions(2);
+        """,
+    ),
+    (
+        6,
+        "indexes behind the bot commands",
+        """
+        -- Every bot command and the ingest's lookups must be served by an
+        -- index; src/tests/test_query_plans.py checks the plans against these.
+
+        -- top10 (equality on day/region/mode, ORDER BY rank LIMIT 10) and its
+        -- "any rows for today" probe on day_start alone
+        CREATE INDEX IF NOT EXISTS daily_leaderboard_stats_day_rank_idx
+          ON daily_leaderboard_stats (day_start, region, game_mode, rank);
+
+        -- day/week/peak/rank by player and the ingest's last-rating LATERAL
+        -- lookup; INCLUDE (rating) lets them run as index-only scans
+        CREATE INDEX IF NOT EXISTS leaderboard_snapshots_player_time_idx
+          ON leaderboard_snapshots (player_id, region, game_mode, snapshot_time DESC)
+          INCLUDE (rating);
+
+        -- rank <n> above the daily stats limit
+        CREATE INDEX IF NOT EXISTS current_leaderboard_rank_idx
+          ON current_leaderboard (region, game_mode, rank);
+
+        -- stats: player count and top 25 average per region
+        CREATE INDEX IF NOT EXISTS current_leaderboard_rating_idx
+          ON current_leaderboard (region, game_mode, rating DESC);
+        """,
+    ),
+    (
+        7,
+        "hourly and daily rating rollups",
+        """
+        -- Open/high/low/close rating per player, region and mode, kept up to
+        -- date by the ingest from the change points it writes to
+        -- leaderboard_snapshots. open_rating is the rating going into the
+        -- bucket's first game; placement_sum / games is the average placement.
+        CREATE TABLE IF NOT EXISTS rating_rollup_hourly (
+          player_id INTEGER NOT NULL REFERENCES players (player_id),
+          game_mode game_mode_enum NOT NULL,
+          region region_enum NOT NULL,
+          hour_start TIMESTAMPTZ NOT NULL,
+          open_rating INTEGER NOT NULL,
+          high_rating INTEGER NOT NULL,
+          low_rating INTEGER NOT NULL,
+          close_rating INTEGER NOT NULL,
+          games INTEGER NOT NULL DEFAULT 0,
+          placement_sum NUMERIC NOT NULL DEFAULT 0,
+          PRIMARY KEY (player_id, region, game_mode, hour_start)
+        );
+
+        -- Same, per Pacific day (the day the bot commands reset on)
+        CREATE TABLE IF NOT EXISTS rating_rollup_daily (
+          player_id INTEGER NOT NULL REFERENCES players (player_id),
+          game_mode game_mode_enum NOT NULL,
+          region region_enum NOT NULL,
+          day_start DATE NOT NULL,
+          open_rating INTEGER NOT NULL,
+          high_rating INTEGER NOT NULL,
+          low_rating INTEGER NOT NULL,
+          close_rating INTEGER NOT NULL,
+          games INTEGER NOT NULL DEFAULT 0,
+          placement_sum NUMERIC NOT NULL DEFAULT 0,
+          PRIMARY KEY (player_id, region, game_mode, day_start)
+        );
+
+        -- Backfill the season so far from the snapshots
+        CREATE TEMP TABLE rollup_backfill ON COMMIT DROP AS
+        SELECT player_id, game_mode, region, rating, snapshot_time,
+               lag(rating) OVER (
+                 PARTITION BY player_id, region, game_mode ORDER BY snapshot_time
+               ) AS prev_rating
+        FROM leaderboard_snapshots;
+
+        INSERT INTO rating_rollup_hourly
+          (player_id, game_mode, region, hour_start, open_rating, high_rating,
+           low_rating, close_rating, games, placement_sum)
+        SELECT player_id, game_mode, region, date_trunc('hour', snapshot_time),
+               (array_agg(COALESCE(prev_rating, rating) ORDER BY snapshot_time))[1],
+               MAX(GREATEST(rating, prev_rating)),
+               MIN(LEAST(rating, prev_rating)),
+               (array_agg(rating ORDER BY snapshot_time DESC))[1],
+               COUNT(*) FILTER (WHERE prev_rating <> rating),
+               COALESCE(SUM(estimate_placement(prev_rating, rating))
+                        FILTER (WHERE prev_rating <> rating), 0)
+        FROM rollup_backfill
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT DO NOTHING;
+
+        INSERT INTO rating_rollup_daily
+          (player_id, game_mode, region, day_start, open_rating, high_rating,
+           low_rating, close_rating, games, placement_sum)
+        SELECT player_id, game_mode, region,
+               (snapshot_time AT TIME ZONE 'America/Los_Angeles')::date,
+               (array_agg(COALESCE(prev_rating, rating) ORDER BY snapshot_time))[1],
+               MAX(GREATEST(rating, prev_rating)),
+               MIN(LEAST(rating, prev_rating)),
+               (array_agg(rating ORDER BY snapshot_time DESC))[1],
+               COUNT(*) FILTER (WHERE prev_rating <> rating),
+               COALESCE(SUM(estimate_placement(prev_rating, rating))
+                        FILTER (WHERE prev_rating <> rating), 0)
+        FROM rollup_backfill
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT DO NOTHING;
+        """,
+    ),
+    (
+        8,
+        "current_ranks",
+        """
+        -- Who holds each rank right now, for every ladder the snapshot ingest
+        -- fetches; replaced ladder by ladder on each ingest so "rank N" is one
+        -- primary-key probe. Deeper ranks are in current_leaderboard.
+        CREATE TABLE IF NOT EXISTS current_ranks (
+          region region_enum NOT NULL,
+          game_mode game_mode_enum NOT NULL,
+          rank INTEGER NOT NULL,
+          player_id INTEGER NOT NULL REFERENCES players (player_id),
+          rating INTEGER NOT NULL,
+          updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+          PRIMARY KEY (region, game_mode, rank)
+        );
+
+        -- Seed from the latest day's ranks in the daily stats
+        INSERT INTO current_ranks (region, game_mode, rank, player_id, rating, updated_at)
+        SELECT DISTINCT ON (region, game_mode, rank)
+               region, game_mode, rank, player_id, rating,
+               COALESCE(updated_at, day_start::timestamptz)
+        FROM daily_leaderboard_stats
+        WHERE rank IS NOT NULL
+          AND day_start = (SELECT MAX(day_start) FROM daily_leaderboard_stats)
+        ORDER BY region, game_mode, rank, updated_at DESC NULLS LAST
+        ON CONFLICT DO NOTHING;
+
+        -- Rank lookups no longer search the daily stats by rank; databases
+        -- that applied an earlier migration 6 still have this index
+        DROP INDEX IF EXISTS daily_leaderboard_stats_rank_idx;
+        """,
+    ),
+    (
+        9,
+        "job_progress",
+        """
+        -- Resume points for the chunked maintenance scripts; each script
+        -- writes its row in the same transaction as the chunk it finished
+        CREATE TABLE IF NOT EXISTS job_progress (
+          job TEXT PRIMARY KEY,
+          position JSONB NOT NULL,             -- script-specific, e.g. {"window_start": ..., "player_id": ...}
+          rows_scanned BIGINT NOT NULL DEFAULT 0,
+          rows_changed BIGINT NOT NULL DEFAULT 0,
+          updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        """,
+    ),
+    (
+        10,
+        "region_stats",
+        """
+        -- Per-ladder aggregates of current_leaderboard, replaced by the
+        -- current leaderboard refresh in the same transaction as the ladder,
+        -- so !stats is a primary-key read. pNN_rating is the rating at the
+        -- NNth percentile of the ladder (p99 = the top 1% cut-off).
+        CREATE TABLE IF NOT EXISTS region_stats (
+          region CHAR(2) NOT NULL,
+          game_mode CHAR(1) NOT NULL,
+          player_count INTEGER NOT NULL,
+          top25_avg NUMERIC,
+          top100_avg NUMERIC,
+          p50_rating INTEGER,
+          p90_rating INTEGER,
+          p99_rating INTEGER,
+          max_rating INTEGER,
+          updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+          PRIMARY KEY (region, game_mode)
+        );
+
+        -- Seed from the ladder as it is now
+        INSERT INTO region_stats
+          (region, game_mode, player_count, top25_avg, top100_avg,
+           p50_rating, p90_rating, p99_rating, max_rating)
+        SELECT region, game_mode, COUNT(*),
+               AVG(rating) FILTER (WHERE position <= 25),
+               AVG(rating) FILTER (WHERE position <= 100),
+               percentile_disc(0.50) WITHIN GROUP (ORDER BY rating),
+               percentile_disc(0.90) WITHIN GROUP (ORDER BY rating),
+               percentile_disc(0.99) WITHIN GROUP (ORDER BY rating),
+               MAX(rating)
+        FROM (
+          SELECT region, game_mode, rating,
+                 row_number() OVER (PARTITION BY region, game_mode ORDER BY rating DESC) AS position
+          FROM current_leaderboard
+        ) ladder
+        GROUP BY region, game_mode
+        ON CONFLICT DO NOTHING;
+        """,
+    ),
+    (
+        11,
+        "channel stream metadata",
+        """
+        -- Written by twitch_live_check from the Helix streams it already
+        -- fetches; NULL while the channel is offline
+        ALTER TABLE channels
+          ADD COLUMN IF NOT EXISTS game_id TEXT,
+          ADD COLUMN IF NOT EXISTS game_name TEXT,
+          ADD COLUMN IF NOT EXISTS stream_started_at TIMESTAMPTZ,
+          ADD COLUMN IF NOT EXISTS viewer_count INTEGER,
+          ADD COLUMN IF NOT EXISTS live_checked_at TIMESTAMPTZ;
+
+        -- The bot reads the live channels and their game every few seconds
+        CREATE INDEX IF NOT EXISTS channels_live_idx
+          ON channels (channel) INCLUDE (game_id, game_name) WHERE live;
+        """,
+    ),
+    (
+        12,
+        "bot shards",
+        """
+        -- One row per running Twitch bot shard; the shards that heartbeated
+        -- recently split the channels between them on a hash ring
+        CREATE TABLE IF NOT EXISTS bot_shards (
+          shard_id TEXT PRIMARY KEY,
+          started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+          heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+          channels INTEGER NOT NULL DEFAULT 0
+        );
+
+        -- Command answers shared between the shards for a few seconds.
+        -- Unlogged: it is only a cache, so skip the WAL
+        CREATE UNLOGGED TABLE IF NOT EXISTS command_results (
+          key TEXT PRIMARY KEY,
+          result TEXT NOT NULL,
+          expires_at TIMESTAMPTZ NOT NULL
+        );
+        """,
+    ),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Migrations that rewrite, backfill or index the big tables (the partition
+# VALIDATE, the plain CREATE INDEX over the snapshot partitions and daily stats,
+# the full rollup backfill). On a production-sized table they outlast a Lambda
+# timeout while holding the migration lock, so only scripts/migrate.py runs them
+HEAVY_MIGRATIONS = {5, 6, 7}
+
+
+def current_version(conn):
+    """Highest applied migration, or 0 if the database has never been migrated"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (SCHEMA_MIGRATIONS,))
+        if not cur.fetchone()[0]:
+            version = 0
+        else:
+            cur.execute(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_MIGRATIONS}")
+            version = cur.fetchone()[0]
+    conn.commit()
+    return version
+
+
+def pending_migrations(conn, target=None):
+    """Migrations above the current version, up to target (default: latest)"""
+    target = SCHEMA_VERSION if target is None else target
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if version < m[0] <= target]
+
+
+def migrate(conn, target=None):
+    """
+    Apply pending migrations in order, each in its own transaction together
+    with its schema_migrations row. Concurrent callers serialize on an
+    advisory lock and re-check the version once they hold it, so each
+    migration is applied exactly once. Returns the versions applied.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (MIGRATION_LOCK,))
+    conn.commit()
+    applied = []
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {SCHEMA_MIGRATIONS} (
+                      version INTEGER PRIMARY KEY,
+                      description TEXT NOT NULL,
+                      applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                    """
+                )
+
+        for version, description, sql in pending_migrations(conn, target):
+            logger.info(f"Applying migration {version}: {description}")
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute(
+                        f"INSERT INTO {SCHEMA_MIGRATIONS} (version, description) VALUES (%s, %s)",
+                        (version, description),
+                    )
+            applied.append(version)
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (MIGRATION_LOCK,))
+        conn.commit()
+
+    return applied
+
+
+def ensure_schema(conn, allow_heavy=True):
+    """
+    Fast startup check; only migrates when the database is behind. With
+    allow_heavy=False, migrations stop before the first pending one in
+    HEAVY_MIGRATIONS, which is left to scripts/migrate.py. Returns the
+    version the database is at afterwards.
+    """
+    version = current_version(conn)
+    if version >= SCHEMA_VERSION:
+        return version
+    target = SCHEMA_VERSION
+    if not allow_heavy:
+        heavy = [v for v, _, _ in pending_migrations(conn) if v in HEAVY_MIGRATIONS]
+        if heavy:
+            target = heavy[0] - 1
+            logger.error(
+                f"Schema at version {version} needs migration {heavy[0]}, which is "
+                f"too slow to apply here; run scripts/migrate.py"
+            )
+    if target > version:
+        logger.warning(
+            f"Schema at version {version}, expected {SCHEMA_VERSION}; "
+            f"applying migrations up to {target}"
+        )
+        migrate(conn, target)
+    return current_version(conn)
+
+
+def ensure_snapshot_partitions(conn, months_ahead=2):
+    """Create any missing monthly snapshot partitions; returns how many were created"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT create_snapshot_partitions(%s)", (months_ahead,))
+            return cur.fetchone()[0]
+
+
+def snapshot_partitions(conn):
+    """(name, upper bound) of each snapshot partition, oldest first"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'leaderboard_snapshots'::regclass
+                ORDER BY c.relname
+                """
+            )
+            return cur.fetchall()
+
+
+def detach_snapshot_partition(conn, name):
+    """
+    Detach one partition so it can be archived or dropped without a DELETE.
+    DETACH ... CONCURRENTLY can't run inside a transaction block, so this
+    briefly switches the connection to autocommit.
+    """
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f'ALTER TABLE leaderboard_snapshots DETACH PARTITION "{name}" CONCURRENTLY'
+            )
+    finally:
+        conn.autocommit = autocommit
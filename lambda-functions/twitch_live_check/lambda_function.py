@@ -4,6 +4,7 @@ import re
 import requests
 import time
 import psycopg2
+from psycopg2.extras import execute_values
 from requests.exceptions import HTTPError
 from logger import setup_logger
 
@@ -26,11 +27,61 @@ def get_db_connection():
         user=os.environ.get("DB_USER"),
         password=os.environ.get("DB_PASSWORD"),
         sslmode="require",
+        connect_timeout=10,
+        # Keep the socket alive while the container is frozen between invocations
+        keepalives=1,
+        keepalives_idle=60,
+        keepalives_interval=10,
+        keepalives_count=3,
     )
 
 
+# Reused across warm invocations of the same container
+_warm_conn = None
+_session = requests.Session()
+_token = None  # (access_token, expires_at)
+
+
+def get_warm_connection():
+    """
+    Return the connection cached by a previous invocation if it still answers,
+    otherwise open a new one. Returns (conn, reused).
+    """
+    global _warm_conn
+    if _warm_conn is not None and not _warm_conn.closed:
+        try:
+            _warm_conn.rollback()
+            with _warm_conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            _warm_conn.rollback()
+            return _warm_conn, True
+        except psycopg2.Error:
+            close_warm_connection()
+
+    _warm_conn = get_db_connection()
+    return _warm_conn, False
+
+
+def close_warm_connection():
+    """Discard the cached connection so the next call reconnects"""
+    global _warm_conn
+    if _warm_conn is not None:
+        try:
+            _warm_conn.close()
+        except psycopg2.Error:
+            pass
+    _warm_conn = None
+
+
 def get_twitch_token():
-    """Get Twitch OAuth token for API access"""
+    """
+    Get Twitch OAuth token for API access. The app token is valid for weeks,
+    so it is cached and only refreshed shortly before it expires.
+    """
+    global _token
+    if _token and _token[1] > time.time() + 300:
+        return _token[0]
+
     client_id = os.environ.get("TWITCH_LIVE_CHECK_CLIENT_ID")
     client_secret = os.environ.get("TWITCH_LIVE_CHECK_SECRET")
 
@@ -39,7 +90,7 @@ def get_twitch_token():
             "Environment variables TWITCH_LIVE_CHECK_CLIENT_ID and TWITCH_LIVE_CHECK_SECRET must be set"
         )
 
-    resp = requests.post(
+    resp = _session.post(
         "https://id.twitch.tv/oauth2/token",
         params={
             "client_id": client_id,
@@ -63,11 +114,15 @@ def get_twitch_token():
     if "access_token" not in data:
         raise RuntimeError(f"No access_token in response: {data}")
 
-    return data["access_token"]
+    _token = (data["access_token"], time.time() + data.get("expires_in", 3600))
+    return _token[0]
 
 
-def fetch_live_channels(channels, token):
-    """Fetch live channels from Twitch API"""
+def fetch_live_streams(channels, token):
+    """
+    Fetch the streams of the live channels from the Twitch API. Returns
+    ({login: stream}, channels whose batch failed).
+    """
     valid_pattern = re.compile(r"^[0-9A-Za-z_]{4,25}$")
     channels = [c for c in channels if valid_pattern.match(c)]
 
@@ -76,11 +131,12 @@ def fetch_live_channels(channels, token):
         "Authorization": f"Bearer {token}",
     }
 
-    live = set()
+    live = {}
+    unknown = set()
     for batch in chunked(channels, 100):
         params = [("user_login", name) for name in batch]
         try:
-            resp = requests.get(
+            resp = _session.get(
                 "https://api.twitch.tv/helix/streams",
                 headers=headers,
                 params=params,
@@ -88,20 +144,27 @@ def fetch_live_channels(channels, token):
             resp.raise_for_status()
             data = resp.json().get("data", [])
             for stream in data:
-                live.add(stream["user_login"])
+                live[stream["user_login"].lower()] = stream
         except HTTPError as e:
             logger.error(f"Error fetching batch {batch}: {e}")
+            unknown.update(batch)
 
         time.sleep(0.5)  # avoid rate limits
 
-    return live
+    return live, unknown
 
 
 def update_live_flags():
-    """Update live flags for all channels in the database"""
+    """Update live flags and stream metadata for all channels in the database"""
     conn = None
+    cur = None
     try:
-        conn = get_db_connection()
+        connect_started = time.monotonic()
+        conn, reused = get_warm_connection()
+        logger.info(
+            f"{'Reused' if reused else 'Opened'} database connection "
+            f"in {time.monotonic() - connect_started:.2f}s"
+        )
         cur = conn.cursor()
 
         # Fetch all channel names
@@ -113,42 +176,77 @@ def update_live_flags():
 
         # Get Twitch token and fetch live channels
         token = get_twitch_token()
-        live_channels = fetch_live_channels(all_channels, token)
+        live_streams, unknown = fetch_live_streams(all_channels, token)
 
         logger.info(
-            f"Found {len(live_channels)} live channels: {', '.join(live_channels)}"
+            f"Found {len(live_streams)} live channels: {', '.join(live_streams)}"
         )
 
-        # Update live flag for each channel
-        cur.execute("UPDATE channels SET live = FALSE")
-        for channel in live_channels:
-            cur.execute(
-                "UPDATE channels SET live = TRUE WHERE channel = %s", (channel,)
+        # Channels that went offline; ones whose batch failed keep their state
+        cur.execute(
+            """
+            UPDATE channels
+            SET live = FALSE, game_id = NULL, game_name = NULL,
+                stream_started_at = NULL, viewer_count = NULL, live_checked_at = now()
+            WHERE live AND channel <> ALL(%s)
+            """,
+            (list(live_streams) + list(unknown),),
+        )
+        if live_streams:
+            execute_values(
+                cur,
+                """
+                UPDATE channels c
+                SET live = TRUE, game_id = s.game_id, game_name = s.game_name,
+                    stream_started_at = s.started_at, viewer_count = s.viewer_count,
+                    live_checked_at = now()
+                FROM (VALUES %s) AS s (channel, game_id, game_name, started_at, viewer_count)
+                WHERE c.channel = s.channel
+                """,
+                [
+                    (
+                        login,
+                        stream.get("game_id") or None,
+                        stream.get("game_name") or None,
+                        stream.get("started_at"),
+                        stream.get("viewer_count"),
+                    )
+                    for login, stream in live_streams.items()
+                ],
+                template="(%s, %s, %s, %s::timestamptz, %s::integer)",
             )
 
         conn.commit()
 
         return {
             "total_channels": len(all_channels),
-            "live_channels": len(live_channels),
-            "live_channel_list": list(live_channels),
+            "live_channels": len(live_streams),
+            "live_channel_list": list(live_streams),
+            "unchecked_channels": len(unknown),
         }
 
     except Exception as e:
         logger.error(f"Error updating live flags: {e}")
-        if conn:
-            conn.rollback()
+        close_warm_connection()
         raise
     finally:
-        if conn:
+        if cur and not cur.closed:
             cur.close()
-            conn.close()
+
+
+# The first invocation in a container is the cold start
+_cold_start = True
 
 
 def lambda_handler(event, context):
     """AWS Lambda entry point"""
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    start_time = time.monotonic()
     try:
         result = update_live_flags()
+        result["cold_start"] = cold_start
+        result["duration_seconds"] = round(time.monotonic() - start_time, 2)
         return {
             "statusCode": 200,
             "body": json.dumps(
@@ -161,6 +259,11 @@ def lambda_handler(event, context):
             "statusCode": 500,
             "body": json.dumps({"message": f"Error during execution: {str(e)}"}),
         }
+    finally:
+        logger.info(
+            f"{'Cold' if cold_start else 'Warm'} start invocation took "
+            f"{time.monotonic() - start_time:.2f}s"
+        )
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
+import time
 import requests
-from bs4 import BeautifulSoup
-from db_utils import get_db_connection
+from db_utils import get_warm_connection, close_warm_connection
 from logger import setup_logger
 
 # Setup logger
@@ -14,8 +14,8 @@ def check_recent_news_posts():
     Check if there are any news posts created within the last 4 hours
     Returns True if recent posts exist, False otherwise
     """
-    conn = get_db_connection()
     try:
+        conn, _ = get_warm_connection()
         with conn.cursor() as cur:
             # Check for posts created within the last 4 hours
             cur.execute(
@@ -27,13 +27,13 @@ def check_recent_news_posts():
                 """
             )
             count = cur.fetchone()[0]
-            logger.info(f"Found {count} news posts within the last 4 hours")
-            return count > 0
+        conn.commit()
+        logger.info(f"Found {count} news posts within the last 4 hours")
+        return count > 0
     except Exception as e:
         logger.error(f"Error checking recent news posts: {e}")
+        close_warm_connection()
         return False
-    finally:
-        conn.close()
 
 
 def scrape_and_insert_from_wiki(url: str, label: str):
@@ -41,6 +41,9 @@ def scrape_and_insert_from_wiki(url: str, label: str):
     Scrape entities from wiki and insert into database
     Adapted from scripts/get_entities.py
     """
+    # Only needed on the rare runs that follow a news post
+    from bs4 import BeautifulSoup
+
     try:
         response = requests.get(url, timeout=30)
         response.raise_for_status()
@@ -109,22 +112,19 @@ def scrape_and_insert_from_wiki(url: str, label: str):
                 )
 
         if values:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            cursor.executemany(
-                """
-                INSERT INTO bg_entities (entity_name, image_url)
-                VALUES (%s, %s)
-                ON CONFLICT (entity_name) DO UPDATE SET
-                    image_url = EXCLUDED.image_url
-                """,
-                values,
-            )
+            conn, _ = get_warm_connection()
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.executemany(
+                        """
+                        INSERT INTO bg_entities (entity_name, image_url)
+                        VALUES (%s, %s)
+                        ON CONFLICT (entity_name) DO UPDATE SET
+                            image_url = EXCLUDED.image_url
+                        """,
+                        values,
+                    )
 
-            conn.commit()
-            cursor.close()
-            conn.close()
             logger.info(f"Inserted {len(values)} entries for {label}")
             return len(values)
         else:
@@ -133,6 +133,7 @@ def scrape_and_insert_from_wiki(url: str, label: str):
 
     except Exception as e:
         logger.error(f"Error scraping {label} from {url}: {e}")
+        close_warm_connection()
         return 0
 
 
@@ -164,10 +165,17 @@ def update_entities():
     return total_updated
 
 
+# The first invocation in a container is the cold start
+_cold_start = True
+
+
 def lambda_handler(event, context):
     """
     Lambda handler that checks for recent news posts and updates entities if needed
     """
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    start_time = time.monotonic()
     try:
         logger.info("Starting entity update check")
 
@@ -196,6 +204,11 @@ def lambda_handler(event, context):
     except Exception as e:
         logger.error(f"Error in lambda handler: {e}")
         return {"statusCode": 500, "body": f"Error updating entities: {str(e)}"}
+    finally:
+        logger.info(
+            f"{'Cold' if cold_start else 'Warm'} start invocation took "
+            f"{time.monotonic() - start_time:.2f}s"
+        )
 
 
 # For local testing
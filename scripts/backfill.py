@@ -1,143 +1,281 @@
 #!/usr/bin/env python3
-import os
-import psycopg2
-from psycopg2.extras import DictCursor
-from datetime import datetime, timedelta
+"""
+Recount games_played and weekly_games_played in daily_leaderboard_stats from
+leaderboard_snapshots.
+
+Usage:
+    python backfill.py                                  # the current week
+    python backfill.py --since 2026-09-01               # a longer range
+    python backfill.py --since 2026-09-01 --shards 4    # 4 processes
+    python backfill.py --since 2026-09-01 --shards 4 --shard 2   # one shard only
+
+A game is a rating change between consecutive snapshots of a (player_id,
+region, game_mode) series, counted on its Pacific day; weekly_games_played is
+the running count from Monday. The snapshots and the daily stats are read as
+two server-side cursors in primary-key order and merge-joined series by
+series, so memory stays bounded whatever the date range. Rows whose counts
+differ are streamed into a staging table and applied by one UPDATE.
+
+Each series' latest stats row in the SEED_DAYS before --since seeds its
+previous rating and weekly count. Shards split the players by player_id modulo --shards.
+"""
+
+import sys
+import argparse
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
 import pytz
+from psycopg2.extras import execute_values
+
+from db_utils import get_db_connection
+
+load_dotenv()
+
+DRY_RUN = True  # Set to False to enable writes
 
-# ─── CONFIGURE ────────────────────────────────────────────────────────────────
 PT = pytz.timezone("America/Los_Angeles")
-# ────────────────────────────────────────────────────────────────────────────────
 
-# IMPORTANT: This script recalculates weekly_games_played using existing games_played data
-# It assumes the daily_leaderboard_stats table is correct except for weekly_games_played
+FETCH_SIZE = 10000  # Rows per round trip on each cursor
+STAGING_BATCH = 5000  # Corrections buffered before they are staged
+SEED_DAYS = 7  # How far before --since to look for each series' last stats row
+
+# Declared order of game_mode_enum and region_enum, which the cursors sort by
+GAME_MODE_ORDER = ("0", "1")
+REGION_ORDER = ("NA", "EU", "AP", "CN")
+
+SNAPSHOTS_QUERY = """
+SELECT player_id, game_mode, region, rating,
+       (snapshot_time AT TIME ZONE 'America/Los_Angeles')::date AS day_start
+FROM leaderboard_snapshots
+WHERE snapshot_time >= %(start)s AND snapshot_time < %(end)s
+  AND player_id %% %(shards)s = %(shard)s
+ORDER BY player_id, game_mode, region, snapshot_time
+"""
 
+STATS_QUERY = """
+SELECT player_id, game_mode, region, day_start, rating,
+       games_played, weekly_games_played
+FROM daily_leaderboard_stats
+WHERE day_start >= %(seed_day)s AND day_start <= %(until)s
+  AND player_id %% %(shards)s = %(shard)s
+ORDER BY player_id, game_mode, region, day_start
+"""
+
+
+def series_key(row):
+    """Sort key of a row's series, in the order the cursors return them"""
+    return (
+        row[0],
+        GAME_MODE_ORDER.index(row[1]),
+        REGION_ORDER.index(row[2]),
+    )
 
-def get_db_connection():
+
+def week_of(day):
+    return day - timedelta(days=day.weekday())
+
+
+def day_games(snapshots, prev_rating):
+    """(day, games) for each day of one series' snapshots, in order"""
+    for day, rows in groupby(snapshots, key=lambda row: row[4]):
+        games = 0
+        for row in rows:
+            if prev_rating is not None and row[3] != prev_rating:
+                games += 1
+            prev_rating = row[3]
+        yield day, games
+
+
+def series_corrections(stats, snapshots, since):
     """
-    Create and return a connection to the database using environment variables
+    Recount one series. `stats` and `snapshots` are its rows in day / time
+    order; yields (day_start, games_played, weekly_games_played) for the stats
+    rows whose counts are wrong.
     """
-    return psycopg2.connect(
-        host=os.environ.get("DB_HOST"),
-        port=os.environ.get("DB_PORT", "5432"),
-        dbname=os.environ.get("DB_NAME"),
-        user=os.environ.get("DB_USER"),
-        password=os.environ.get("DB_PASSWORD"),
-        sslmode="require",
-        cursor_factory=DictCursor,
-    )
+    stats = iter(stats)
+    prev_rating = None
+    week, weekly = None, 0
 
+    # Seed from the latest row before the range
+    row = next(stats, None)
+    while row is not None and row[3] < since:
+        prev_rating, week, weekly = row[4], week_of(row[3]), row[6]
+        row = next(stats, None)
 
-def main():
-    DRY_RUN = False  # Set to False to enable writes
-    conn = get_db_connection()
-    cur = conn.cursor()
+    days = day_games(snapshots, prev_rating)
+    snapshot_day = next(days, None)
 
-    pacific = pytz.timezone("America/Los_Angeles")
-    now_pt = datetime.now(pacific)
-    week_start = (now_pt - timedelta(days=now_pt.weekday())).date()
+    def count(day, games):
+        nonlocal week, weekly
+        if week_of(day) != week:
+            week, weekly = week_of(day), 0
+        weekly += games
+        return weekly
 
-    # Step 1: Fetch relevant snapshots
-    snapshots_by_player_day = {}
-    snapshots_cursor = conn.cursor(name="snapshots_cursor", cursor_factory=DictCursor)
-    snapshots_cursor.itersize = 10000
-    snapshots_cursor.execute(
-        """
-        SELECT player_name, region, game_mode, snapshot_time, rating
-        FROM leaderboard_snapshots
-        WHERE snapshot_time >= %s
-        ORDER BY snapshot_time
-        """,
-        (datetime.combine(week_start, datetime.min.time()).astimezone(pytz.utc),),
-    )
-    for row in snapshots_cursor:
-        key = f"{row['player_name']}#{row['region']}#{row['game_mode']}"
-        pt_date = row["snapshot_time"].astimezone(pacific).date()
-        if pt_date >= week_start:
-            snapshots_by_player_day.setdefault(key, {}).setdefault(pt_date, []).append(
-                row["rating"]
-            )
-    snapshots_cursor.close()
-
-    # Step 2: Fetch daily_leaderboard_stats for this week only
-    cur.execute(
+    while row is not None:
+        day = row[3]
+        # Days with games but no stats row still count towards the week
+        while snapshot_day is not None and snapshot_day[0] < day:
+            count(*snapshot_day)
+            snapshot_day = next(days, None)
+        games = 0
+        if snapshot_day is not None and snapshot_day[0] == day:
+            games = snapshot_day[1]
+            snapshot_day = next(days, None)
+        weekly_games = count(day, games)
+        if (games, weekly_games) != (row[5], row[6]):
+            yield day, games, weekly_games
+        row = next(stats, None)
+
+
+def corrections(snapshot_rows, stats_rows, since):
+    """Merge-join both streams by series; yields one staging row per wrong stats row"""
+    snapshot_series = groupby(snapshot_rows, key=series_key)
+    current = next(snapshot_series, None)
+    for key, stats in groupby(stats_rows, key=series_key):
+        # Series with snapshots but no stats rows have nothing to correct
+        while current is not None and current[0] < key:
+            current = next(snapshot_series, None)
+        snapshots = ()
+        if current is not None and current[0] == key:
+            snapshots = current[1]
+        for day, games, weekly_games in series_corrections(stats, snapshots, since):
+            yield (key[0], GAME_MODE_ORDER[key[1]], REGION_ORDER[key[2]], day, games, weekly_games)
+        if current is not None and current[0] == key:
+            current = next(snapshot_series, None)
+
+
+def stage(cur, rows):
+    execute_values(
+        cur,
         """
-        SELECT player_name, region, game_mode, day_start, rating
-        FROM daily_leaderboard_stats
-        WHERE day_start >= %s
-        ORDER BY player_name, region, game_mode, day_start
+        INSERT INTO games_played_corrections
+          (player_id, game_mode, region, day_start, games_played, weekly_games_played)
+        VALUES %s
         """,
-        (week_start,),
+        rows,
     )
-    stats_rows = cur.fetchall()
-    stats_by_player = {}
-    for row in stats_rows:
-        key = f"{row['player_name']}#{row['region']}#{row['game_mode']}"
-        stats_by_player.setdefault(key, []).append(row)
-
-    # Step 3: Process each player
-    total_updates = 0
-    all_updates = []
-    for key, stat_list in stats_by_player.items():
-        prev_rating = None
-        prev_weekly = 0
-        snapshot_days = snapshots_by_player_day.get(key, {})
-
-        for row in stat_list:
-            day = row["day_start"]
-            today_ratings = snapshot_days.get(day, [])
-
-            if not today_ratings:
-                curr_rating = row["rating"]
-                games_played = 0
-            else:
-                games_played = 0
-                last_rating = prev_rating
-                for r in today_ratings:
-                    if last_rating is not None and r != last_rating:
-                        games_played += 1
-                    last_rating = r
-                curr_rating = last_rating
-
-            is_monday = day.weekday() == 0
-            weekly = games_played if is_monday else prev_weekly + games_played
-
-            player_name, region, game_mode = (
-                row["player_name"],
-                row["region"],
-                row["game_mode"],
-            )
-            all_updates.append(
-                (games_played, weekly, player_name, region, game_mode, day)
-            )
-            prev_rating = curr_rating
-            prev_weekly = weekly
-
-        print(
-            f"{'[DRY RUN]' if DRY_RUN else '[UPDATED]'} {key}: {len(stat_list)} rows processed"
+
+
+def backfill_shard(shard, shards, since, until, dry_run):
+    """Recount one shard in one transaction; returns (stats rows corrected, rows updated)"""
+    conn = get_db_connection()
+    try:
+        params = {
+            "start": PT.localize(datetime.combine(since, datetime.min.time())),
+            "end": PT.localize(datetime.combine(until + timedelta(days=1), datetime.min.time())),
+            "seed_day": since - timedelta(days=SEED_DAYS),
+            "until": until,
+            "shards": shards,
+            "shard": shard,
+        }
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TEMP TABLE games_played_corrections (
+              player_id INTEGER NOT NULL,
+              game_mode game_mode_enum NOT NULL,
+              region region_enum NOT NULL,
+              day_start DATE NOT NULL,
+              games_played INTEGER NOT NULL,
+              weekly_games_played INTEGER NOT NULL
+            ) ON COMMIT DROP
+            """
         )
-        total_updates += len(stat_list)
 
-    # Step 4: Perform batch update
-    if not DRY_RUN:
-        from psycopg2.extras import execute_batch
+        snapshots_cursor = conn.cursor(name=f"backfill_snapshots_{shard}")
+        snapshots_cursor.itersize = FETCH_SIZE
+        snapshots_cursor.execute(SNAPSHOTS_QUERY, params)
+        stats_cursor = conn.cursor(name=f"backfill_stats_{shard}")
+        stats_cursor.itersize = FETCH_SIZE
+        stats_cursor.execute(STATS_QUERY, params)
+
+        corrected = 0
+        batch = []
+        for correction in corrections(snapshots_cursor, stats_cursor, since):
+            batch.append(correction)
+            if len(batch) >= STAGING_BATCH:
+                stage(cur, batch)
+                corrected += len(batch)
+                batch = []
+        if batch:
+            stage(cur, batch)
+            corrected += len(batch)
+        snapshots_cursor.close()
+        stats_cursor.close()
+
+        if dry_run:
+            conn.rollback()
+            return corrected, 0
 
-        execute_batch(
-            cur,
+        cur.execute(
+            """
+            UPDATE daily_leaderboard_stats d
+            SET games_played = c.games_played,
+                weekly_games_played = c.weekly_games_played,
+                updated_at = now()
+            FROM games_played_corrections c
+            WHERE d.player_id = c.player_id
+              AND d.game_mode = c.game_mode
+              AND d.region = c.region
+              AND d.day_start = c.day_start
             """
-            UPDATE daily_leaderboard_stats
-            SET games_played = %s,
-                weekly_games_played = %s
-            WHERE player_name = %s AND region = %s AND game_mode = %s AND day_start = %s
-        """,
-            all_updates,
         )
+        updated = cur.rowcount
         conn.commit()
+        return corrected, updated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
 
-    print(f"Total rows processed: {total_updates}")
-    cur.close()
-    conn.close()
+def main():
+    now_pt = datetime.now(PT)
+    parser = argparse.ArgumentParser(description="Recount games played")
+    parser.add_argument(
+        "--since",
+        default=week_of(now_pt.date()).isoformat(),
+        help="First day to recount (YYYY-MM-DD); default: this week's Monday",
+    )
+    parser.add_argument(
+        "--until", default=now_pt.date().isoformat(), help="Last day to recount"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=1, help="Split players into this many shards"
+    )
+    parser.add_argument(
+        "--shard", type=int, help="Only run this shard (0-based); default: all, in parallel"
+    )
+    args = parser.parse_args()
+
+    since = date.fromisoformat(args.since)
+    until = date.fromisoformat(args.until)
+    shards = [args.shard] if args.shard is not None else range(args.shards)
+    print(f"{'[DRY RUN] ' if DRY_RUN else ''}Recounting {since} to {until}")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        futures = {
+            shard: pool.submit(backfill_shard, shard, args.shards, since, until, DRY_RUN)
+            for shard in shards
+        }
+        for shard, future in futures.items():
+            try:
+                corrected, updated = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"✗ shard {shard}/{args.shards}: {e}")
+                continue
+            if DRY_RUN:
+                print(f"[DRY RUN] shard {shard}/{args.shards}: would correct {corrected} rows")
+            else:
+                print(f"[UPDATED] shard {shard}/{args.shards}: corrected {updated} rows")
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
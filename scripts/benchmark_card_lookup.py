@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Time the fuzzy card lookups behind !buddy, !trinket, !hero, !minion and !spell.
+
+Usage:
+    python benchmark_card_lookup.py                   # the bot's saved catalog
+    python benchmark_card_lookup.py --cards cards.json
+
+Each catalog name gets a few random typos (fixed seed), and the queries are
+looked up three ways: scored from scratch, answered from the LRU, and through
+the parse_* function the command calls. Times are microseconds per lookup.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+from utils.buddy_fetch import (
+    get_buddy_dict,
+    get_heroes_dict,
+    get_minions_dict,
+    get_spells_dict,
+    get_trinkets_dict,
+    parse_buddy,
+    parse_card,
+    parse_trinket,
+)
+from utils.card_catalog import CardCatalog
+from utils.fuzzy_matcher import FuzzyMatcher
+
+
+def typo(name, rng):
+    chars = list(name)
+    for _ in range(rng.choice([0, 1, 1, 2])):
+        i = rng.randrange(len(chars))
+        op = rng.randrange(3)
+        if op == 0:
+            chars[i] = rng.choice(string.ascii_lowercase)
+        elif op == 1:
+            chars.insert(i, rng.choice(string.ascii_lowercase))
+        elif len(chars) > 2:
+            del chars[i]
+    return "".join(chars)
+
+
+def per_lookup(fn, queries, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            fn(query)
+    return (time.perf_counter() - started) / (rounds * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark card name lookups")
+    parser.add_argument("--cards", help="Build the catalog from this cards.json")
+    parser.add_argument("--queries", type=int, default=2000, help="Queries per kind")
+    parser.add_argument("--rounds", type=int, default=5, help="Passes over the queries")
+    args = parser.parse_args()
+
+    if args.cards:
+        with open(args.cards) as f:
+            catalog = CardCatalog.from_cards_json(json.load(f))
+    else:
+        catalog = CardCatalog.load()
+    if catalog is None:
+        print("✗ No saved catalog; run the bot once or pass --cards")
+        return 1
+
+    indexes = {
+        "buddies": get_buddy_dict(catalog),
+        "trinkets": get_trinkets_dict(catalog),
+        "heroes": get_heroes_dict(catalog),
+        "minions": get_minions_dict(catalog),
+        "spells": get_spells_dict(catalog),
+    }
+    rng = random.Random(47)
+    print(f"{'kind':<10}{'names':>7}{'uncached':>12}{'cached':>10}{'command':>10}  (µs/lookup)")
+    for kind, index in indexes.items():
+        if not index:
+            continue
+        names = list(index)
+        queries = [typo(rng.choice(names), rng) for _ in range(args.queries)]
+        matcher = FuzzyMatcher(index)
+
+        uncached = per_lookup(matcher._match, queries, 1)
+        per_lookup(matcher.match, queries, 1)  # Fill the LRU
+        cached = per_lookup(matcher.match, queries, args.rounds)
+        if kind == "buddies":
+            lookup = lambda query: parse_buddy(query, index, {}, matcher)
+        elif kind == "trinkets":
+            lookup = lambda query: parse_trinket(query, index, matcher)
+        else:
+            lookup = lambda query: parse_card(query, index, kind, matcher)
+        command = per_lookup(lookup, queries, args.rounds)
+        print(f"{kind:<10}{len(names):>7}{uncached:>12.1f}{cached:>10.2f}{command:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
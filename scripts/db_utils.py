@@ -1,6 +1,6 @@
 import os
 import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2.extras import execute_values, Json
 
 
 def get_db_connection():
@@ -15,3 +15,31 @@ def get_db_connection():
         password=os.environ.get("DB_PASSWORD"),
         sslmode="require",
     )
+
+
+def load_progress(conn, job):
+    """Saved position of a chunked job (see job_progress), or None"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT position FROM job_progress WHERE job = %s", (job,))
+        row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else None
+
+
+def save_progress(cur, job, position, rows_scanned=0, rows_changed=0):
+    """
+    Record a job's position and add to its totals; call inside the chunk's
+    transaction so the chunk and its resume point commit together
+    """
+    cur.execute(
+        """
+        INSERT INTO job_progress (job, position, rows_scanned, rows_changed)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (job) DO UPDATE SET
+          position = EXCLUDED.position,
+          rows_scanned = job_progress.rows_scanned + EXCLUDED.rows_scanned,
+          rows_changed = job_progress.rows_changed + EXCLUDED.rows_changed,
+          updated_at = now()
+        """,
+        (job, Json(position), rows_scanned, rows_changed),
+    )
@@ -1,78 +1,172 @@
 #!/usr/bin/env python3
-import boto3
-import time
-import subprocess
+"""
+Archive a finished season to Parquet and clear it from the hot tables.
+
+Usage:
+    python handle_season_transition.py --season 16                  # to SEASON_ARCHIVE_URI
+    python handle_season_transition.py --season 16 --dest s3://bucket/seasons
+    python handle_season_transition.py --season 16 --dest ./archive --keep-rows
+
+The hot tables only ever hold one season, so run this after the season ends and
+before the ingest writes the new one. Both tables are exported from one
+snapshot, streamed in row groups sorted by player/region/mode (see
+src/utils/season_archive.py), and only cleared once the row counts written
+match the table contents. The bots answer `!peak <player> s16` from the files.
+"""
+
 import os
-from pathlib import Path
-
-def archive_season(old_season, new_season):
-    """Handle full season transition"""
-    ddb = boto3.client('dynamodb', region_name='us-east-1')
-    
-    print(f"Starting season transition from {old_season} to {new_season}...")
-    
-    # 1. Check if old table exists and backup if it does
-    try:
-        # Check if table exists
-        try:
-            ddb.describe_table(TableName='HearthstoneLeaderboardV2')
-            table_exists = True
-        except ddb.exceptions.ResourceNotFoundException:
-            print("\nTable HearthstoneLeaderboardV2 not found, skipping backup")
-            table_exists = False
-        
-        if table_exists:
-            print("\nBacking up old table...")
-            # Create backup
-            backup_name = f"HearthstoneLeaderboardV2-Season{old_season}-Backup"
-            ddb.create_backup(
-                TableName='HearthstoneLeaderboardV2',
-                BackupName=backup_name
-            )
-            print(f"Created backup: {backup_name}")
-            
-            # Wait for backup to complete
-            print("Waiting for backup to complete...")
-            time.sleep(30)
-            
-            # Delete original table
-            ddb.delete_table(TableName='HearthstoneLeaderboardV2')
-            print("Deleted original table")
-            
-            # Wait for deletion
-            print("Waiting for deletion to complete...")
-            time.sleep(30)
-            
-    except Exception as e:
-        print(f"Error handling table backup/deletion: {e}")
-        return
-    
-    # 2. Deploy new infrastructure
-    print("\nDeploying new infrastructure...")
+import sys
+import argparse
+from dotenv import load_dotenv
+
+from db_utils import get_db_connection
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from utils.season_archive import (
+    SEASON_ARCHIVE_URI,
+    ARCHIVE_ROW_GROUP_SIZE,
+    ARCHIVE_TABLES,
+    archive_schemas,
+    archive_path,
+    open_archive,
+)
+
+load_dotenv()
+
+DRY_RUN = True  # Set to False to actually clear the hot tables
+
+EXPORT_QUERIES = {
+    "leaderboard_snapshots": """
+        SELECT p.player_name, ls.region::text AS region, ls.game_mode::text AS game_mode,
+               ls.rating, ls.snapshot_time
+        FROM leaderboard_snapshots ls
+        JOIN players p ON p.player_id = ls.player_id
+    """,
+    "daily_leaderboard_stats": """
+        SELECT p.player_name, d.region::text AS region, d.game_mode::text AS game_mode,
+               d.day_start, d.rating, d.rank, d.games_played, d.weekly_games_played,
+               d.day_avg::float8 AS day_avg, d.weekly_avg::float8 AS weekly_avg
+        FROM daily_leaderboard_stats d
+        JOIN players p ON p.player_id = d.player_id
+    """,
+}
+
+# Cleared with the archived tables; the rollups are rebuilt from new snapshots
+DERIVED_TABLES = ["rating_rollup_hourly", "rating_rollup_daily"]
+
+
+def export_table(conn, table, filesystem, path):
+    """Stream one table into a Parquet file, one row group per fetch; returns rows written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = archive_schemas()[table]
+    order_by = ", ".join(ARCHIVE_TABLES[table])
+    written = 0
+    with conn.cursor(name=f"archive_{table}") as cur:
+        cur.itersize = ARCHIVE_ROW_GROUP_SIZE
+        cur.execute(f"{EXPORT_QUERIES[table]} ORDER BY {order_by}")
+        with pq.ParquetWriter(
+            path, schema, filesystem=filesystem, compression="zstd"
+        ) as writer:
+            while True:
+                rows = cur.fetchmany(ARCHIVE_ROW_GROUP_SIZE)
+                if not rows:
+                    break
+                columns = [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*rows), schema)
+                ]
+                writer.write_table(
+                    pa.Table.from_arrays(columns, schema=schema),
+                    row_group_size=ARCHIVE_ROW_GROUP_SIZE,
+                )
+                written += len(rows)
+                print(f"  {table}: {written} rows")
+    return written
+
+
+def clear_hot_tables(conn, archived):
+    """
+    Truncate the archived tables, unless rows were written since the export
+    (the ingest is still running), in which case nothing is removed
+    """
+    with conn:
+        with conn.cursor() as cur:
+            tables = list(archived) + DERIVED_TABLES
+            cur.execute(f"LOCK TABLE {', '.join(tables)} IN ACCESS EXCLUSIVE MODE")
+            for table, rows in archived.items():
+                cur.execute(f"SELECT COUNT(*) FROM {table}")
+                current = cur.fetchone()[0]
+                if current != rows:
+                    raise RuntimeError(
+                        f"{table} has {current} rows but {rows} were archived; "
+                        "stop the ingest and run the archive again"
+                    )
+            cur.execute(f"TRUNCATE {', '.join(tables)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive a finished season")
+    parser.add_argument("--season", type=int, required=True, help="Season being archived")
+    parser.add_argument(
+        "--dest", default=SEASON_ARCHIVE_URI, help="Archive root, local path or s3:// URI"
+    )
+    parser.add_argument(
+        "--keep-rows", action="store_true", help="Export only; leave the hot tables alone"
+    )
+    parser.add_argument(
+        "--overwrite", action="store_true", help="Replace an existing archive of the season"
+    )
+    args = parser.parse_args()
+
+    if not args.dest:
+        print("No destination: pass --dest or set SEASON_ARCHIVE_URI")
+        return 1
+
+    from pyarrow import fs
+
+    filesystem, base = open_archive(args.dest)
+    paths = {table: archive_path(base, args.season, table) for table in ARCHIVE_TABLES}
+    existing = [
+        p for p in paths.values() if filesystem.get_file_info(p).type != fs.FileType.NotFound
+    ]
+    if existing and not args.overwrite:
+        print(f"Season {args.season} is already archived: {existing}; use --overwrite")
+        return 1
+    filesystem.create_dir(os.path.dirname(paths["leaderboard_snapshots"]), recursive=True)
+
+    conn = get_db_connection()
     try:
-        # Get path to lambda directory
-        script_dir = Path(__file__).parent
-        lambda_dir = script_dir.parent / 'lambda-loader'
-        
-        # Change to lambda directory and deploy
-        os.chdir(lambda_dir)
-        subprocess.run(['sam', 'build'], check=True)
-        subprocess.run(['sam', 'deploy'], check=True)
-        print("Infrastructure deployed")
-    except Exception as e:
-        print(f"Error deploying: {e}")
-        return
-    
-    print("\nSeason transition complete!")
-    if table_exists:
-        print(f"- Old table backed up as: {backup_name}")
-    print(f"- New table created as: HearthstoneLeaderboardV2")
-    print(f"- Lambda updated for season {new_season}")
-    print("\nPlease verify:")
-    print("1. New table is empty and ready")
-    print("2. Lambda is using correct season number")
-    if table_exists:
-        print("3. Backup is accessible for historical data")
+        # One snapshot for both tables, so they agree with each other
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        archived = {}
+        for table, path in paths.items():
+            print(f"Exporting {table} to {path}")
+            archived[table] = export_table(conn, table, filesystem, path)
+        conn.rollback()
+        conn.set_session(isolation_level="READ COMMITTED", readonly=False)
+
+        import pyarrow.parquet as pq
+
+        for table, path in paths.items():
+            in_file = pq.read_metadata(path, filesystem=filesystem).num_rows
+            if in_file != archived[table]:
+                print(f"✗ {path} has {in_file} rows, expected {archived[table]}")
+                return 1
+            print(f"✓ Archived {archived[table]} {table} rows")
+
+        if args.keep_rows:
+            return 0
+        if DRY_RUN:
+            print(f"[DRY RUN] Would truncate {list(archived) + DERIVED_TABLES}")
+            return 0
+        clear_hot_tables(conn, archived)
+        print(f"✓ Cleared season {args.season} from the hot tables")
+        return 0
+    finally:
+        conn.close()
+
 
 if __name__ == "__main__":
-    archive_season('13', '14') 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Apply pending schema migrations (see lambda-functions/leaderboard_snapshots/schema.py).
+
+Usage:
+    python migrate.py             # apply everything pending
+    python migrate.py --status    # show current and latest version
+    python migrate.py --target 3  # apply up to version 3
+"""
+
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+
+from db_utils import get_db_connection
+
+sys.path.append(
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), "..", "lambda-functions", "leaderboard_snapshots"
+        )
+    )
+)
+from schema import SCHEMA_VERSION, current_version, pending_migrations, migrate
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument(
+        "--status", action="store_true", help="Show versions and pending migrations"
+    )
+    parser.add_argument("--target", type=int, help="Stop at this version")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        print(f"Current version: {current_version(conn)}, latest: {SCHEMA_VERSION}")
+        pending = pending_migrations(conn, args.target)
+        for version, description, _ in pending:
+            print(f"  pending {version}: {description}")
+        if args.status:
+            return 0
+        if not pending:
+            print("Nothing to apply")
+            return 0
+
+        applied = migrate(conn, args.target)
+        print(f"✓ Applied migrations {applied}; now at version {current_version(conn)}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,90 +1,257 @@
-import os
-import psycopg2
+#!/usr/bin/env python3
+"""
+Prune redundant rows from leaderboard_snapshots.
+
+Usage:
+    python prune_supabase.py                      # resume where the last run stopped
+    python prune_supabase.py --since 2026-09-01   # start (again) from a date
+    python prune_supabase.py --follow             # keep pruning as new windows age
+
+The ingest only writes a snapshot when a rating changes, so a row that repeats
+the rating before it in its (player_id, game_mode, region) series carries no
+information and is deleted. The newest row of each series is always kept.
+
+The table is walked oldest window first, in chunks of --chunk-players player
+ids by --window-hours of snapshot_time (the indexes lead with player_id, so a
+chunk reads its players' rows for the whole partition; a week per window keeps
+that overhead small). Each chunk is one short transaction
+that also records the resume point in job_progress, so the script can be
+stopped at any time. Only windows older than --min-age-hours are touched,
+which keeps it clear of the rows the ingest is writing; lock and statement
+timeouts make a chunk give way rather than queue behind anything else.
+"""
+
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from psycopg2 import errors
+
+from db_utils import get_db_connection, load_progress, save_progress
 
 load_dotenv()
 
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
+DRY_RUN = True  # Set to False to actually delete rows
+JOB = "prune_snapshots"
+
+LOCK_TIMEOUT_MS = 2000
+STATEMENT_TIMEOUT_MS = 60000
+RETRY_SECONDS = 30  # Wait before retrying a chunk that timed out
 
-PRUNE_QUERY_TEMPLATE = """
-WITH recent_rows AS (
-  SELECT *
+PRUNE_CANDIDATES = """
+WITH chunk AS (
+  SELECT player_id, game_mode, region, snapshot_time, rating,
+         lag(rating) OVER series AS prev_rating,
+         lead(snapshot_time) OVER series AS next_time
   FROM leaderboard_snapshots
-  WHERE snapshot_time > '{start_time}' AND snapshot_time <= '{end_time}'
+  WHERE player_id >= %(first_id)s AND player_id < %(end_id)s
+    AND snapshot_time >= %(start)s AND snapshot_time < %(end)s
+  WINDOW series AS (PARTITION BY player_id, game_mode, region ORDER BY snapshot_time)
 ),
 
-ranked AS (
-  SELECT *,
-         ROW_NUMBER() OVER (
-           PARTITION BY player_name, game_mode, region, rating
-           ORDER BY snapshot_time ASC
-         ) AS row_asc,
-         ROW_NUMBER() OVER (
-           PARTITION BY player_name, game_mode, region, rating
-           ORDER BY snapshot_time DESC
-         ) AS row_desc,
-         RANK() OVER (
-           PARTITION BY player_name, game_mode, region
-           ORDER BY snapshot_time DESC
-         ) AS rating_rank
-  FROM recent_rows
+-- Rows repeating the previous rating; a series' first row in the window is
+-- compared with the row just before the window
+repeats AS (
+  SELECT c.player_id, c.game_mode, c.region, c.snapshot_time, c.next_time
+  FROM chunk c
+  WHERE c.rating = COALESCE(
+    c.prev_rating,
+    (
+      SELECT s.rating
+      FROM leaderboard_snapshots s
+      WHERE s.player_id = c.player_id
+        AND s.region = c.region
+        AND s.game_mode = c.game_mode
+        AND s.snapshot_time < %(start)s
+      ORDER BY s.snapshot_time DESC
+      LIMIT 1
+    )
+  )
 ),
 
+-- Keep the newest row of each series: it is when the player was last seen
 to_delete AS (
-  SELECT *
-  FROM ranked
-  WHERE
-    row_asc > 1
-    AND NOT (rating_rank = 1 AND row_desc = 1)
+  SELECT r.player_id, r.game_mode, r.region, r.snapshot_time
+  FROM repeats r
+  WHERE r.next_time IS NOT NULL
+     OR EXISTS (
+       SELECT 1
+       FROM leaderboard_snapshots s
+       WHERE s.player_id = r.player_id
+         AND s.region = r.region
+         AND s.game_mode = r.game_mode
+         AND s.snapshot_time > r.snapshot_time
+     )
+)
+"""
+
+PRUNE_CHUNK_QUERY = f"""
+{PRUNE_CANDIDATES},
+deleted AS (
+  DELETE FROM leaderboard_snapshots ls
+  USING to_delete d
+  WHERE ls.player_id = d.player_id
+    AND ls.game_mode = d.game_mode
+    AND ls.region = d.region
+    AND ls.snapshot_time = d.snapshot_time
+    AND ls.player_id >= %(first_id)s AND ls.player_id < %(end_id)s
+    AND ls.snapshot_time >= %(start)s AND ls.snapshot_time < %(end)s
+  RETURNING 1
 )
 
-DELETE FROM leaderboard_snapshots
-USING to_delete
-WHERE leaderboard_snapshots.player_name = to_delete.player_name
-  AND leaderboard_snapshots.game_mode = to_delete.game_mode
-  AND leaderboard_snapshots.region = to_delete.region
-  AND leaderboard_snapshots.snapshot_time = to_delete.snapshot_time;
+SELECT (SELECT COUNT(*) FROM chunk) AS scanned,
+       (SELECT COUNT(*) FROM deleted) AS deleted;
 """
 
+# Dry runs only read: no row locks, and no dead tuples from a rolled back DELETE
+COUNT_CHUNK_QUERY = f"""
+{PRUNE_CANDIDATES}
+SELECT (SELECT COUNT(*) FROM chunk) AS scanned,
+       (SELECT COUNT(*) FROM to_delete) AS deleted;
+"""
+
+
+def prune_chunk(conn, first_id, end_id, start, end, dry_run):
+    """
+    Prune one chunk in its own transaction and record the resume point after
+    it. Returns (rows scanned, rows deleted). A dry run only counts the rows it
+    would delete and records nothing.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SET LOCAL lock_timeout = {LOCK_TIMEOUT_MS}")
+            cur.execute(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}")
+            cur.execute(
+                COUNT_CHUNK_QUERY if dry_run else PRUNE_CHUNK_QUERY,
+                {"first_id": first_id, "end_id": end_id, "start": start, "end": end},
+            )
+            scanned, deleted = cur.fetchone()
+            if not dry_run:
+                save_progress(
+                    cur,
+                    JOB,
+                    {"window_start": start.isoformat(), "player_id": end_id},
+                    scanned,
+                    deleted,
+                )
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        return scanned, deleted
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def max_player_id(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(player_id), 0) FROM players")
+        value = cur.fetchone()[0]
+    conn.rollback()
+    return value
+
+
+def start_of_window(moment, window):
+    """Align a time to the windows, counted from the Unix epoch"""
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return epoch + ((moment - epoch) // window) * window
+
 
 def main():
-    print("Pruning redundant snapshots from the last 10 days...")
-
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        sslmode="require",
+    parser = argparse.ArgumentParser(description="Prune redundant snapshots")
+    parser.add_argument(
+        "--since", help="Start from this date (YYYY-MM-DD) instead of the saved position"
+    )
+    parser.add_argument(
+        "--chunk-players", type=int, default=2000, help="Player ids per chunk"
+    )
+    parser.add_argument(
+        "--window-hours", type=int, default=168, help="Hours of snapshots per chunk"
     )
-    now = datetime.utcnow()
+    parser.add_argument(
+        "--min-age-hours",
+        type=int,
+        default=6,
+        help="Only prune windows that ended at least this long ago",
+    )
+    parser.add_argument(
+        "--duty-cycle",
+        type=float,
+        default=0.25,
+        help="Fraction of wall time spent pruning; sleeps between chunks for the rest",
+    )
+    parser.add_argument(
+        "--follow", action="store_true", help="Wait for new windows instead of exiting"
+    )
+    args = parser.parse_args()
 
-    for i in range(20, 30):
-        end_time = now - timedelta(days=i)
-        start_time = end_time - timedelta(days=1)
+    window = timedelta(hours=args.window_hours)
+    min_age = timedelta(hours=args.min_age_hours)
+    if DRY_RUN:
+        print("[DRY RUN] Counting only; nothing is deleted or recorded")
 
-        query = PRUNE_QUERY_TEMPLATE.format(
-            start_time=start_time.isoformat(), end_time=end_time.isoformat()
-        )
+    conn = get_db_connection()
+    try:
+        position = None if args.since else load_progress(conn, JOB)
+        if position:
+            window_start = datetime.fromisoformat(position["window_start"])
+            next_id = position["player_id"]
+            print(f"Resuming at {window_start}, player_id {next_id}")
+        else:
+            since = (
+                datetime.strptime(args.since, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+                if args.since
+                else datetime.now(timezone.utc) - timedelta(days=30)
+            )
+            window_start = start_of_window(since, window)
+            next_id = 0
 
-        print(f"Pruning snapshots from {start_time} to {end_time}...")
+        total_scanned = total_deleted = 0
+        while True:
+            window_end = window_start + window
+            if window_end > datetime.now(timezone.utc) - min_age:
+                if not args.follow:
+                    break
+                time.sleep(RETRY_SECONDS)
+                continue
 
-        try:
-            with conn:
-                with conn.cursor() as cur:
-                    cur.execute(query)
-                    print(f"Pruning for {start_time.date()} completed.")
-        except Exception as e:
-            print(f"Error during pruning for {start_time.date()}: {str(e)}")
+            last_id = max_player_id(conn)
+            while next_id <= last_id:
+                end_id = next_id + args.chunk_players
+                started = time.monotonic()
+                try:
+                    scanned, deleted = prune_chunk(
+                        conn, next_id, end_id, window_start, window_end, DRY_RUN
+                    )
+                except (errors.LockNotAvailable, errors.QueryCanceled) as e:
+                    print(f"  chunk timed out, retrying in {RETRY_SECONDS}s: {e}")
+                    time.sleep(RETRY_SECONDS)
+                    continue
+                elapsed = time.monotonic() - started
 
-    conn.close()
+                total_scanned += scanned
+                total_deleted += deleted
+                print(
+                    f"{window_start:%Y-%m-%d %H:%M} players {next_id}-{end_id - 1}: "
+                    f"scanned {scanned}, {'would delete' if DRY_RUN else 'deleted'} "
+                    f"{deleted} ({elapsed:.2f}s)"
+                )
+                next_id = end_id
+                time.sleep(elapsed * (1 - args.duty_cycle) / args.duty_cycle)
+
+            window_start = window_end
+            next_id = 0
+
+        print(
+            f"✓ Caught up to {window_start:%Y-%m-%d %H:%M}: scanned {total_scanned}, "
+            f"{'would delete' if DRY_RUN else 'deleted'} {total_deleted}"
+        )
+        return 0
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
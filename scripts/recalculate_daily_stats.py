@@ -1,677 +1,411 @@
 #!/usr/bin/env python3
 """
-One-off script to recalculate day_avg and weekly_avg in daily_leaderboard_stats table
-using the updated estimate_placement function and data from leaderboard_snapshots.
-
-This script processes all rows in daily_leaderboard_stats and recalculates:
-- day_avg: Average placement for rating changes within each day (PT timezone)
-- weekly_avg: Average placement for rating changes within each week (Monday-Sunday, PT timezone)
+Recalculate day_avg and weekly_avg in daily_leaderboard_stats from
+leaderboard_snapshots, using the current estimate_placement function.
+
+Usage:
+    python recalculate_daily_stats.py                       # the whole season
+    python recalculate_daily_stats.py --since 2026-10-06    # weeks from a date on
+    python recalculate_daily_stats.py --player gaiabot --region AP --game-mode 0
+    python recalculate_daily_stats.py --workers 8 --restart
+
+- day_avg: average placement of the rating changes within the day (PT)
+- weekly_avg: average placement of the rating changes from the start of the
+  week (Monday, PT) through the day
+
+The work is split into units of one week by --chunk-players player ids and
+run across a process pool, each unit in its own transaction. A unit reads its
+week of snapshots once: placements are summed per day and the weekly averages
+are running sums over those days, so the cost is linear in the snapshots. The
+first change of each week is measured from the last rating before the week.
+
+Finished units are checkpointed in job_progress, so an interrupted run picks
+up where it stopped; the checkpoints are cleared once every unit is done. A
+dry run computes the same units and only counts the rows that would change.
 """
 
+import os
 import sys
-from psycopg2.extras import DictCursor
+import time
+import argparse
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
 
-from db_utils import get_db_connection
+from db_utils import get_db_connection, save_progress
+
+sys.path.append(
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), "..", "lambda-functions", "leaderboard_snapshots"
+        )
+    )
+)
+from schema import current_version
 
 load_dotenv()
 
 # Configuration
-DRY_RUN = False  # Set to False to enable writes
-
-# Test configuration - set to None to process all players
-TEST_PLAYER_NAME = "gaiabot"  # Set to None to process all players
-TEST_REGION = "AP"  # Set to None to process all regions
-TEST_GAME_MODE = 0  # Set to None to process all game modes (0 = solo, 1 = duo)
+DRY_RUN = True  # Set to False to enable writes
+JOB = "recalculate_averages"
+# estimate_placement (2) and job_progress (9); the script never migrates
+REQUIRED_SCHEMA_VERSION = 9
 
 # Table names
 DAILY_LEADERBOARD_STATS = "daily_leaderboard_stats"
 LEADERBOARD_SNAPSHOTS = "leaderboard_snapshots"
 PLAYERS_TABLE = "players"
 
-
-def get_player_id(cursor, player_name):
-    """Fetch player_id for a given player_name."""
-    cursor.execute(
-        f"""
-        SELECT player_id, player_name
-        FROM {PLAYERS_TABLE}
-        WHERE player_name = %s
-        """,
-        (player_name.lower(),),
+# Averages for one week of one player id range. The filters are optional:
+# NULL matches every region / game mode.
+RECALCULATE_UNIT = f"""
+WITH snapshots AS (
+    SELECT
+        ls.player_id,
+        ls.game_mode,
+        ls.region,
+        ls.rating,
+        LAG(ls.rating) OVER (
+            PARTITION BY ls.player_id, ls.game_mode, ls.region
+            ORDER BY ls.snapshot_time
+        ) AS prev_rating,
+        (ls.snapshot_time AT TIME ZONE 'America/Los_Angeles')::date AS day_start
+    FROM {LEADERBOARD_SNAPSHOTS} ls
+    WHERE ls.player_id >= %(first_id)s AND ls.player_id < %(end_id)s
+      AND ls.snapshot_time >= (%(week_start)s::timestamp AT TIME ZONE 'America/Los_Angeles')
+      AND ls.snapshot_time < (%(week_end)s::timestamp AT TIME ZONE 'America/Los_Angeles')
+      AND (%(region)s::region_enum IS NULL OR ls.region = %(region)s::region_enum)
+      AND (%(game_mode)s::game_mode_enum IS NULL OR ls.game_mode = %(game_mode)s::game_mode_enum)
+),
+with_prev AS (
+    -- The first snapshot of the week is compared with the last one before it
+    SELECT
+        s.player_id,
+        s.game_mode,
+        s.region,
+        s.day_start,
+        s.rating,
+        COALESCE(
+            s.prev_rating,
+            (
+                SELECT b.rating
+                FROM {LEADERBOARD_SNAPSHOTS} b
+                WHERE b.player_id = s.player_id
+                  AND b.region = s.region
+                  AND b.game_mode = s.game_mode
+                  AND b.snapshot_time < (%(week_start)s::timestamp AT TIME ZONE 'America/Los_Angeles')
+                ORDER BY b.snapshot_time DESC
+                LIMIT 1
+            )
+        ) AS prev_rating
+    FROM snapshots s
+),
+rating_changes AS (
+    SELECT
+        player_id,
+        game_mode,
+        region,
+        day_start,
+        estimate_placement(prev_rating, rating) AS placement
+    FROM with_prev
+    WHERE prev_rating IS NOT NULL
+      AND prev_rating IS DISTINCT FROM rating
+),
+days AS (
+    -- Every day with changes or a stats row; days without changes add nothing
+    SELECT
+        player_id,
+        game_mode,
+        region,
+        day_start,
+        SUM(placement) AS placement_sum,
+        COUNT(placement) AS games
+    FROM (
+        SELECT player_id, game_mode, region, day_start, placement
+        FROM rating_changes
+        UNION ALL
+        SELECT d.player_id, d.game_mode, d.region, d.day_start, NULL
+        FROM {DAILY_LEADERBOARD_STATS} d
+        WHERE d.player_id >= %(first_id)s AND d.player_id < %(end_id)s
+          AND d.day_start >= %(week_start)s AND d.day_start < %(week_end)s
+          AND (%(region)s::region_enum IS NULL OR d.region = %(region)s::region_enum)
+          AND (%(game_mode)s::game_mode_enum IS NULL OR d.game_mode = %(game_mode)s::game_mode_enum)
+    ) per_day
+    GROUP BY player_id, game_mode, region, day_start
+),
+averages AS (
+    SELECT
+        player_id,
+        game_mode,
+        region,
+        day_start,
+        placement_sum / NULLIF(games, 0) AS day_avg,
+        SUM(placement_sum) OVER week / NULLIF(SUM(games) OVER week, 0) AS weekly_avg
+    FROM days
+    WINDOW week AS (
+        PARTITION BY player_id, game_mode, region
+        ORDER BY day_start
     )
-    result = cursor.fetchone()
-    if result:
-        return result["player_id"]
-    return None
+),
+changed AS (
+    SELECT a.*
+    FROM averages a
+    JOIN {DAILY_LEADERBOARD_STATS} dls ON
+        dls.player_id = a.player_id
+        AND dls.game_mode = a.game_mode
+        AND dls.region = a.region
+        AND dls.day_start = a.day_start
+    WHERE dls.day_avg IS DISTINCT FROM a.day_avg
+       OR dls.weekly_avg IS DISTINCT FROM a.weekly_avg
+)
+"""
 
+APPLY_UNIT = f"""
+{RECALCULATE_UNIT},
+updated AS (
+    UPDATE {DAILY_LEADERBOARD_STATS} dls
+    SET
+        day_avg = c.day_avg,
+        weekly_avg = c.weekly_avg,
+        updated_at = now()
+    FROM changed c
+    WHERE dls.player_id = c.player_id
+      AND dls.game_mode = c.game_mode
+      AND dls.region = c.region
+      AND dls.day_start = c.day_start
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM days), (SELECT COUNT(*) FROM updated)
+"""
 
-def ensure_estimate_placement_function(cursor):
-    """Create or replace the estimate_placement PostgreSQL function."""
-    cursor.execute(
-        """
-        CREATE OR REPLACE FUNCTION estimate_placement(start_rating NUMERIC, end_rating NUMERIC)
-        RETURNS NUMERIC
-        LANGUAGE plpgsql
-        IMMUTABLE
-        AS $$
-        DECLARE
-            gain NUMERIC;
-            dex_avg NUMERIC;
-            placements NUMERIC[] := ARRAY[1, 2, 3, 3.5, 4, 4.5, 5, 5.5, 6, 6.5, 7, 7.5, 8];
-            p NUMERIC;
-            avg_opp NUMERIC;
-            delta NUMERIC;
-            best_placement NUMERIC := 1;
-            best_delta NUMERIC := 'Infinity'::NUMERIC;
-        BEGIN
-            gain := end_rating - start_rating;
-            
-            -- Calculate dexAvg
-            IF start_rating < 8200 THEN
-                dex_avg := start_rating;
-            ELSE
-                dex_avg := start_rating - 0.85 * (start_rating - 8500);
-            END IF;
-            
-            -- Find placement with smallest delta
-            FOREACH p IN ARRAY placements
-            LOOP
-                -- avgOpp-formula
-                avg_opp := start_rating - 148.1181435 * (100 - ((p - 1) * (200.0 / 7.0) + gain));
-                
-                -- Skip placements where avg_opp > 8500
-                IF avg_opp > 8500 THEN
-                    CONTINUE;
-                END IF;
-                
-                delta := ABS(dex_avg - avg_opp);
-                
-                IF delta < best_delta THEN
-                    best_delta := delta;
-                    best_placement := p;
-                END IF;
-            END LOOP;
-            
-            RETURN best_placement;
-        END;
-        $$;
-        """
-    )
-    print("✓ estimate_placement function created/updated")
+COUNT_UNIT = f"""
+{RECALCULATE_UNIT}
+SELECT (SELECT COUNT(*) FROM days), (SELECT COUNT(*) FROM changed)
+"""
+
+# One connection per worker process
+_worker_conn = None
+
+
+def _open_worker_connection():
+    global _worker_conn
+    _worker_conn = get_db_connection()
+
+
+def unit_job(prefix, week_start, first_id):
+    return f"{prefix}:{week_start.isoformat()}:{first_id}"
 
 
-def recalculate_averages(
-    conn, dry_run=False, player_id=None, region=None, game_mode=None
-):
+def recalculate_unit(unit, filters, dry_run, prefix):
     """
-    Recalculate day_avg and weekly_avg for all rows in daily_leaderboard_stats.
-
-    Strategy:
-    1. For each row in daily_leaderboard_stats, we need to:
-       - Get all snapshots for that player/region/game_mode
-       - Identify rating changes (when rating differs from previous snapshot)
-       - Calculate placements for each change
-       - Group by day_start (PT) for day_avg
-       - Group by week_start (Monday PT) for weekly_avg
-       - Calculate weighted averages
-
-    2. We'll use a SQL query that:
-       - Gets all snapshots with LAG to identify changes
-       - Calculates placements for each change
-       - Groups by day_start and week_start
-       - Joins back to daily_leaderboard_stats to update
-
-    Args:
-        conn: Database connection
-        dry_run: If True, only show what would be updated
-        player_id: Optional player_id to filter by (for testing)
-        region: Optional region to filter by (for testing)
-        game_mode: Optional game_mode to filter by (for testing)
+    Recalculate one (week, player id range) unit in its own transaction and
+    checkpoint it. Returns (days scanned, rows changed, seconds).
     """
-    cursor = conn.cursor(cursor_factory=DictCursor)
-
+    week_start, first_id, end_id = unit
+    params = {
+        "week_start": week_start,
+        "week_end": week_start + timedelta(days=7),
+        "first_id": first_id,
+        "end_id": end_id,
+        **filters,
+    }
+    started = time.monotonic()
+    conn = _worker_conn
     try:
-        # Build filter conditions for testing
-        filter_conditions = []
-        filter_params = []
-
-        if player_id is not None:
-            filter_conditions.append("player_id = %s")
-            filter_params.append(player_id)
-        if region is not None:
-            filter_conditions.append("region = %s")
-            filter_params.append(region)
-        if game_mode is not None:
-            filter_conditions.append("game_mode = %s::game_mode_enum")
-            filter_params.append(str(game_mode))
-
-        filter_clause = ""
-        if filter_conditions:
-            filter_clause = "WHERE " + " AND ".join(filter_conditions)
-            print(
-                f"Filtering by: player_id={player_id}, region={region}, game_mode={game_mode}"
-            )
+        with conn.cursor() as cursor:
+            cursor.execute(COUNT_UNIT if dry_run else APPLY_UNIT, params)
+            scanned, changed = cursor.fetchone()
+            if not dry_run:
+                save_progress(
+                    cursor,
+                    unit_job(prefix, week_start, first_id),
+                    {"week_start": week_start.isoformat(), "player_id": end_id},
+                    scanned,
+                    changed,
+                )
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return scanned, changed, time.monotonic() - started
 
-        # Step 1: Create a CTE that identifies all rating changes with their placements
-        # We'll process this in batches by date range to avoid memory issues
-        print("Fetching all daily_leaderboard_stats rows...")
+
+def week_starts(first_day, last_day):
+    """Mondays of the weeks covering first_day through last_day"""
+    week = first_day - timedelta(days=first_day.weekday())
+    weeks = []
+    while week <= last_day:
+        weeks.append(week)
+        week += timedelta(days=7)
+    return weeks
+
+
+def plan_units(conn, args):
+    """(filters, checkpoint prefix, units) for the requested recompute"""
+    cursor = conn.cursor()
+    player_id = None
+    if args.player:
         cursor.execute(
-            f"""
-            SELECT DISTINCT day_start
-            FROM {DAILY_LEADERBOARD_STATS}
-            {filter_clause}
-            ORDER BY day_start
-            """,
-            tuple(filter_params),
-        )
-        all_dates = [row["day_start"] for row in cursor.fetchall()]
-        print(f"Found {len(all_dates)} unique dates to process")
-
-        if not all_dates:
-            print("No data to process")
-            return
-
-        # Process in batches - we'll recalculate for all rows at once using a comprehensive SQL query
-        print("\nCalculating averages from leaderboard_snapshots...")
-
-        # Build filter conditions for snapshots CTE
-        snapshot_filter_conditions = []
-        snapshot_filter_params = []
-
-        if player_id is not None:
-            snapshot_filter_conditions.append("ls.player_id = %s")
-            snapshot_filter_params.append(player_id)
-        if region is not None:
-            snapshot_filter_conditions.append("ls.region = %s")
-            snapshot_filter_params.append(region)
-        if game_mode is not None:
-            snapshot_filter_conditions.append("ls.game_mode = %s::game_mode_enum")
-            snapshot_filter_params.append(str(game_mode))
-
-        snapshot_filter_clause = ""
-        if snapshot_filter_conditions:
-            snapshot_filter_clause = "WHERE " + " AND ".join(snapshot_filter_conditions)
-
-        # Main query: Calculate day_avg and weekly_avg for all rows
-        # Strategy:
-        # 1. For each row in daily_leaderboard_stats, we need:
-        #    - day_avg: average of placements for rating changes on that specific day (PT)
-        #    - weekly_avg: average of placements for rating changes from week_start (Monday PT) through that day
-        # 2. We'll use a CTE to identify all rating changes, then join back to daily_leaderboard_stats
-        #    to calculate cumulative weekly averages
-
-        update_query = f"""
-        WITH all_snapshots AS (
-            -- Get all snapshots with previous rating to identify changes
-            SELECT 
-                ls.player_id,
-                ls.game_mode,
-                ls.region,
-                ls.snapshot_time,
-                ls.rating,
-                LAG(ls.rating) OVER (
-                    PARTITION BY ls.player_id, ls.game_mode, ls.region 
-                    ORDER BY ls.snapshot_time
-                ) AS prev_rating,
-                -- Convert to PT timezone for day calculations
-                (ls.snapshot_time AT TIME ZONE 'America/Los_Angeles')::date AS day_start_pt
-            FROM {LEADERBOARD_SNAPSHOTS} ls
-            {snapshot_filter_clause}
-        ),
-        rating_changes AS (
-            -- Filter to only rating changes and calculate placements
-            SELECT 
-                player_id,
-                game_mode,
-                region,
-                day_start_pt,
-                prev_rating,
-                rating,
-                estimate_placement(prev_rating, rating) AS placement
-            FROM all_snapshots
-            WHERE prev_rating IS NOT NULL 
-              AND prev_rating IS DISTINCT FROM rating
-        ),
-        daily_stats AS (
-            -- Calculate day_avg for each day
-            SELECT 
-                player_id,
-                game_mode,
-                region,
-                day_start_pt AS day_start,
-                AVG(placement) AS day_avg
-            FROM rating_changes
-            GROUP BY player_id, game_mode, region, day_start_pt
-        ),
-        all_daily_rows AS (
-            -- Get all rows from daily_leaderboard_stats to ensure we update all rows
-            SELECT 
-                player_id,
-                game_mode,
-                region,
-                day_start,
-                -- Calculate week_start for each day
-                day_start - EXTRACT(DOW FROM day_start)::integer 
-                    + CASE WHEN EXTRACT(DOW FROM day_start) = 0 THEN -6 ELSE 1 END AS week_start
-            FROM {DAILY_LEADERBOARD_STATS}
-            {filter_clause}
-        ),
-        final_stats AS (
-            -- Join all daily rows with calculated averages
-            SELECT 
-                adr.player_id,
-                adr.game_mode,
-                adr.region,
-                adr.day_start,
-                ds.day_avg,
-                -- Calculate weekly_avg for each day from week_start through day_start
-                (SELECT AVG(rc2.placement)
-                 FROM rating_changes rc2
-                 WHERE rc2.player_id = adr.player_id
-                   AND rc2.game_mode = adr.game_mode
-                   AND rc2.region = adr.region
-                   AND rc2.day_start_pt >= adr.week_start
-                   AND rc2.day_start_pt <= adr.day_start) AS weekly_avg
-            FROM all_daily_rows adr
-            LEFT JOIN daily_stats ds ON
-                ds.player_id = adr.player_id
-                AND ds.game_mode = adr.game_mode
-                AND ds.region = adr.region
-                AND ds.day_start = adr.day_start
+            f"SELECT player_id FROM {PLAYERS_TABLE} WHERE player_name = %s",
+            (args.player.lower(),),
         )
-        UPDATE {DAILY_LEADERBOARD_STATS} dls
-        SET 
-            day_avg = fs.day_avg,
-            weekly_avg = fs.weekly_avg,
-            updated_at = now()
-        FROM final_stats fs
-        WHERE dls.player_id = fs.player_id
-          AND dls.game_mode = fs.game_mode
-          AND dls.region = fs.region
-          AND dls.day_start = fs.day_start
-          AND (
-              dls.day_avg IS DISTINCT FROM fs.day_avg 
-              OR dls.weekly_avg IS DISTINCT FROM fs.weekly_avg
-          )
-        """
-
-        # Combine parameters for the query (snapshot params first, then daily stats params)
-        # Since both use the same filters, we can reuse the same parameter list
-        query_params = tuple(snapshot_filter_params + filter_params)
+        row = cursor.fetchone()
+        if not row:
+            raise ValueError(f"Player '{args.player}' not found in database")
+        player_id = row[0]
 
-        if dry_run:
-            print("\n[DRY RUN] Would execute update query...")
-            print("To actually update, set DRY_RUN = False")
+    # day_start leads daily_leaderboard_stats_day_rank_idx: two index probes
+    cursor.execute(
+        f"SELECT MIN(day_start), MAX(day_start) FROM {DAILY_LEADERBOARD_STATS}"
+    )
+    first_day, last_day = cursor.fetchone()
+    cursor.execute(f"SELECT COALESCE(MAX(player_id), 0) FROM {PLAYERS_TABLE}")
+    last_id = cursor.fetchone()[0]
+    conn.rollback()
+
+    filters = {"region": args.region, "game_mode": args.game_mode}
+    prefix = (
+        f"{JOB}:{args.region or '*'}/{args.game_mode or '*'}/{player_id or '*'}"
+    )
+    if first_day is None:
+        return filters, prefix, []
+    if args.since:
+        first_day = max(first_day, date.fromisoformat(args.since))
+
+    if player_id is not None:
+        ranges = [(player_id, player_id + 1)]
+    else:
+        ranges = [
+            (first_id, first_id + args.chunk_players)
+            for first_id in range(0, last_id + 1, args.chunk_players)
+        ]
+    units = [
+        (week, first_id, end_id)
+        for week in week_starts(first_day, last_day)
+        for first_id, end_id in ranges
+    ]
+    return filters, prefix, units
+
+
+def checkpoint_pattern(prefix):
+    """LIKE pattern matching the checkpoints of one run's units"""
+    return prefix.replace("_", r"\_") + ":%"
+
+
+def completed_units(conn, prefix):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT job FROM job_progress WHERE job LIKE %s", (checkpoint_pattern(prefix),)
+    )
+    done = {row[0] for row in cursor.fetchall()}
+    conn.rollback()
+    return done
 
-            # For dry run, let's show what would be updated
-            cursor.execute(
-                f"""
-                WITH all_snapshots AS (
-                    SELECT 
-                        ls.player_id,
-                        ls.game_mode,
-                        ls.region,
-                        ls.snapshot_time,
-                        ls.rating,
-                        LAG(ls.rating) OVER (
-                            PARTITION BY ls.player_id, ls.game_mode, ls.region 
-                            ORDER BY ls.snapshot_time
-                        ) AS prev_rating,
-                        (ls.snapshot_time AT TIME ZONE 'America/Los_Angeles')::date AS day_start_pt
-                    FROM {LEADERBOARD_SNAPSHOTS} ls
-                    {snapshot_filter_clause}
-                ),
-                rating_changes AS (
-                    SELECT 
-                        player_id,
-                        game_mode,
-                        region,
-                        day_start_pt,
-                        prev_rating,
-                        rating,
-                        estimate_placement(prev_rating, rating) AS placement
-                    FROM all_snapshots
-                    WHERE prev_rating IS NOT NULL 
-                      AND prev_rating IS DISTINCT FROM rating
-                ),
-                daily_stats AS (
-                    SELECT 
-                        player_id,
-                        game_mode,
-                        region,
-                        day_start_pt AS day_start,
-                        AVG(placement) AS day_avg
-                    FROM rating_changes
-                    GROUP BY player_id, game_mode, region, day_start_pt
-                ),
-                daily_with_week AS (
-                    SELECT 
-                        d.player_id,
-                        d.game_mode,
-                        d.region,
-                        d.day_start,
-                        d.day_avg,
-                        d.day_start - EXTRACT(DOW FROM d.day_start)::integer 
-                            + CASE WHEN EXTRACT(DOW FROM d.day_start) = 0 THEN -6 ELSE 1 END AS week_start
-                    FROM daily_stats d
-                ),
-                all_daily_rows AS (
-                    SELECT 
-                        player_id,
-                        game_mode,
-                        region,
-                        day_start,
-                        day_start - EXTRACT(DOW FROM day_start)::integer 
-                            + CASE WHEN EXTRACT(DOW FROM day_start) = 0 THEN -6 ELSE 1 END AS week_start
-                    FROM {DAILY_LEADERBOARD_STATS}
-                    {filter_clause}
-                ),
-                final_stats AS (
-                    SELECT 
-                        adr.player_id,
-                        adr.game_mode,
-                        adr.region,
-                        adr.day_start,
-                        ds.day_avg,
-                        (SELECT AVG(rc2.placement)
-                         FROM rating_changes rc2
-                         WHERE rc2.player_id = adr.player_id
-                           AND rc2.game_mode = adr.game_mode
-                           AND rc2.region = adr.region
-                           AND rc2.day_start_pt >= adr.week_start
-                           AND rc2.day_start_pt <= adr.day_start) AS weekly_avg
-                    FROM all_daily_rows adr
-                    LEFT JOIN daily_stats ds ON
-                        ds.player_id = adr.player_id
-                        AND ds.game_mode = adr.game_mode
-                        AND ds.region = adr.region
-                        AND ds.day_start = adr.day_start
-                )
-                SELECT COUNT(*) as rows_to_update
-                FROM {DAILY_LEADERBOARD_STATS} dls
-                INNER JOIN final_stats fs ON
-                    dls.player_id = fs.player_id
-                    AND dls.game_mode = fs.game_mode
-                    AND dls.region = fs.region
-                    AND dls.day_start = fs.day_start
-                    AND (
-                        dls.day_avg IS DISTINCT FROM fs.day_avg 
-                        OR dls.weekly_avg IS DISTINCT FROM fs.weekly_avg
-                    )
-                """,
-                query_params,
-            )
-            result = cursor.fetchone()
-            rows_to_update = result["rows_to_update"] if result else 0
-            print(f"Would update {rows_to_update} rows")
 
-            # Show a sample of what would change
+def clear_checkpoints(conn, prefix):
+    with conn:
+        with conn.cursor() as cursor:
             cursor.execute(
-                f"""
-                WITH all_snapshots AS (
-                    SELECT 
-                        ls.player_id,
-                        ls.game_mode,
-                        ls.region,
-                        ls.snapshot_time,
-                        ls.rating,
-                        LAG(ls.rating) OVER (
-                            PARTITION BY ls.player_id, ls.game_mode, ls.region 
-                            ORDER BY ls.snapshot_time
-                        ) AS prev_rating,
-                                (ls.snapshot_time AT TIME ZONE 'America/Los_Angeles')::date AS day_start_pt
-                    FROM {LEADERBOARD_SNAPSHOTS} ls
-                    {snapshot_filter_clause}
-                ),
-                rating_changes AS (
-                    SELECT 
-                        player_id,
-                        game_mode,
-                        region,
-                        day_start_pt,
-                        prev_rating,
-                        rating,
-                        estimate_placement(prev_rating, rating) AS placement
-                    FROM all_snapshots
-                    WHERE prev_rating IS NOT NULL 
-                      AND prev_rating IS DISTINCT FROM rating
-                ),
-                daily_stats AS (
-                    SELECT 
-                        player_id,
-                        game_mode,
-                        region,
-                        day_start_pt AS day_start,
-                        AVG(placement) AS day_avg
-                    FROM rating_changes
-                    GROUP BY player_id, game_mode, region, day_start_pt
-                ),
-                daily_with_week AS (
-                    SELECT 
-                        d.player_id,
-                        d.game_mode,
-                        d.region,
-                        d.day_start,
-                        d.day_avg,
-                        d.day_start - EXTRACT(DOW FROM d.day_start)::integer 
-                            + CASE WHEN EXTRACT(DOW FROM d.day_start) = 0 THEN -6 ELSE 1 END AS week_start
-                    FROM daily_stats d
-                ),
-                all_daily_rows AS (
-                    SELECT 
-                        player_id,
-                        game_mode,
-                        region,
-                        day_start,
-                        day_start - EXTRACT(DOW FROM day_start)::integer 
-                            + CASE WHEN EXTRACT(DOW FROM day_start) = 0 THEN -6 ELSE 1 END AS week_start
-                    FROM {DAILY_LEADERBOARD_STATS}
-                    {filter_clause}
-                ),
-                final_stats AS (
-                    SELECT 
-                        adr.player_id,
-                        adr.game_mode,
-                        adr.region,
-                        adr.day_start,
-                        ds.day_avg,
-                        (SELECT AVG(rc2.placement)
-                         FROM rating_changes rc2
-                         WHERE rc2.player_id = adr.player_id
-                           AND rc2.game_mode = adr.game_mode
-                           AND rc2.region = adr.region
-                           AND rc2.day_start_pt >= adr.week_start
-                           AND rc2.day_start_pt <= adr.day_start) AS weekly_avg
-                    FROM all_daily_rows adr
-                    LEFT JOIN daily_stats ds ON
-                        ds.player_id = adr.player_id
-                        AND ds.game_mode = adr.game_mode
-                        AND ds.region = adr.region
-                        AND ds.day_start = adr.day_start
-                )
-                SELECT 
-                    dls.player_id,
-                    dls.game_mode,
-                    dls.region,
-                    dls.day_start,
-                    dls.day_avg AS old_day_avg,
-                    fs.day_avg AS new_day_avg,
-                    dls.weekly_avg AS old_weekly_avg,
-                    fs.weekly_avg AS new_weekly_avg,
-                    dls.games_played,
-                    dls.weekly_games_played
-                FROM {DAILY_LEADERBOARD_STATS} dls
-                INNER JOIN final_stats fs ON
-                    dls.player_id = fs.player_id
-                    AND dls.game_mode = fs.game_mode
-                    AND dls.region = fs.region
-                    AND dls.day_start = fs.day_start
-                    AND (
-                        dls.day_avg IS DISTINCT FROM fs.day_avg 
-                        OR dls.weekly_avg IS DISTINCT FROM fs.weekly_avg
-                    )
-                    AND dls.day_start IN ('2025-12-08'::date, '2025-12-09'::date, '2025-12-10'::date)
-                ORDER BY dls.day_start
-                """,
-                query_params,
+                "DELETE FROM job_progress WHERE job LIKE %s",
+                (checkpoint_pattern(prefix),),
             )
-            samples = cursor.fetchall()
-            if samples:
-                print(
-                    "\nChanges for day_start in (2025-12-08, 2025-12-09, 2025-12-10):"
-                )
-                for sample in samples:
-                    print(
-                        f"\n  player_id={sample['player_id']}, game_mode={sample['game_mode']}, "
-                        f"region={sample['region']}, day_start={sample['day_start']}"
-                    )
-                    print(
-                        f"    day_avg: {sample['old_day_avg']} -> {sample['new_day_avg']}"
-                    )
-                    print(
-                        f"    weekly_avg: {sample['old_weekly_avg']} -> {sample['new_weekly_avg']}"
-                    )
-                    if sample["day_start"] == "2025-12-10":
-                        print(f"    games_played: {sample['games_played']}")
-                        print(
-                            f"    weekly_games_played: {sample['weekly_games_played']}"
-                        )
-
-                    # Get individual placements for this day
-                    # Combine snapshot filter params with WHERE clause params
-                    placement_query_params = list(snapshot_filter_params) + [
-                        sample["player_id"],
-                        str(sample["game_mode"]),
-                        sample["region"],
-                        sample["day_start"],
-                    ]
-                    cursor.execute(
-                        f"""
-                        WITH all_snapshots AS (
-                            SELECT 
-                                ls.player_id,
-                                ls.game_mode,
-                                ls.region,
-                                ls.snapshot_time,
-                                ls.rating,
-                                LAG(ls.rating) OVER (
-                                    PARTITION BY ls.player_id, ls.game_mode, ls.region 
-                                    ORDER BY ls.snapshot_time
-                                ) AS prev_rating,
-                                (ls.snapshot_time AT TIME ZONE 'America/Los_Angeles')::date AS day_start_pt
-                            FROM {LEADERBOARD_SNAPSHOTS} ls
-                            {snapshot_filter_clause}
-                        ),
-                        rating_changes AS (
-                            SELECT 
-                                player_id,
-                                game_mode,
-                                region,
-                                day_start_pt,
-                                snapshot_time,
-                                prev_rating,
-                                rating,
-                                estimate_placement(prev_rating, rating) AS placement
-                            FROM all_snapshots
-                            WHERE prev_rating IS NOT NULL 
-                              AND prev_rating IS DISTINCT FROM rating
-                        )
-                        SELECT placement
-                        FROM rating_changes
-                        WHERE player_id = %s
-                          AND game_mode = %s::game_mode_enum
-                          AND region = %s
-                          AND day_start_pt = %s
-                        ORDER BY snapshot_time
-                        """,
-                        tuple(placement_query_params),
-                    )
-                    placements = cursor.fetchall()
-                    if placements:
-                        placement_values = [str(p["placement"]) for p in placements]
-                        print(f"    placements: {', '.join(placement_values)}")
-                    else:
-                        print("    placements: (no rating changes)")
-        else:
-            print("\nExecuting update query...")
-            cursor.execute(update_query, query_params)
-            rows_updated = cursor.rowcount
-            conn.commit()
-            print(f"✓ Updated {rows_updated} rows")
-
-    except Exception as e:
-        conn.rollback()
-        print(f"Error: {e}")
-        raise
-    finally:
-        cursor.close()
 
 
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Recalculate day_avg and weekly_avg")
+    parser.add_argument("--since", help="First day to recalculate (YYYY-MM-DD)")
+    parser.add_argument("--player", help="Only this player")
+    parser.add_argument("--region", choices=["NA", "EU", "AP", "CN"])
+    parser.add_argument("--game-mode", choices=["0", "1"])
+    parser.add_argument(
+        "--workers", type=int, default=min(8, os.cpu_count() or 1), help="Worker processes"
+    )
+    parser.add_argument(
+        "--chunk-players", type=int, default=20000, help="Player ids per unit"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoints of an earlier run"
+    )
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Recalculate daily_leaderboard_stats day_avg and weekly_avg")
     print("=" * 60)
     print(f"Mode: {'DRY RUN' if DRY_RUN else 'LIVE UPDATE'}")
     print()
 
-    conn = None
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=DictCursor)
-
-        # Ensure estimate_placement function exists
-        ensure_estimate_placement_function(cursor)
-        conn.commit()
-
-        # Handle test configuration
-        player_id = None
-        region = None
-        game_mode = None
-
-        if TEST_PLAYER_NAME:
-            player_id = get_player_id(cursor, TEST_PLAYER_NAME)
-            if not player_id:
-                print(f"Error: Player '{TEST_PLAYER_NAME}' not found in database")
-                return 1
-            print(f"Found player_id={player_id} for player_name='{TEST_PLAYER_NAME}'")
-
-        if TEST_REGION:
-            region = TEST_REGION
-            print(f"Filtering by region: {region}")
-
-        if TEST_GAME_MODE is not None:
-            game_mode = TEST_GAME_MODE
-            print(f"Filtering by game_mode: {game_mode}")
-
-        # Recalculate averages
-        recalculate_averages(
-            conn,
-            dry_run=DRY_RUN,
-            player_id=player_id,
-            region=region,
-            game_mode=game_mode,
-        )
+        version = current_version(conn)
+        if version < REQUIRED_SCHEMA_VERSION:
+            print(
+                f"Error: schema at version {version}, this script needs "
+                f"{REQUIRED_SCHEMA_VERSION}; run scripts/migrate.py first"
+            )
+            return 1
+        print(f"✓ Schema at version {version}")
+        try:
+            filters, prefix, units = plan_units(conn, args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+
+        if not DRY_RUN:
+            if args.restart:
+                clear_checkpoints(conn, prefix)
+            done = completed_units(conn, prefix)
+            units = [u for u in units if unit_job(prefix, u[0], u[1]) not in done]
+            if done:
+                print(f"Resuming: {len(done)} units already done")
+        print(f"{len(units)} units on {args.workers} workers")
+
+        started = time.monotonic()
+        total_scanned = total_changed = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_open_worker_connection
+        ) as pool:
+            futures = {
+                pool.submit(recalculate_unit, unit, filters, DRY_RUN, prefix): unit
+                for unit in units
+            }
+            for future in as_completed(futures):
+                week_start, first_id, end_id = futures[future]
+                label = f"week {week_start} players {first_id}-{end_id - 1}"
+                try:
+                    scanned, changed, elapsed = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"✗ {label}: {e}")
+                    continue
+                total_scanned += scanned
+                total_changed += changed
+                if scanned:
+                    print(
+                        f"  {label}: {scanned} days, "
+                        f"{'would update' if DRY_RUN else 'updated'} {changed} ({elapsed:.2f}s)"
+                    )
 
         print("\n" + "=" * 60)
+        print(
+            f"{total_scanned} player days, {'would update' if DRY_RUN else 'updated'} "
+            f"{total_changed} rows in {time.monotonic() - started:.1f}s"
+        )
+        if failed:
+            print(f"{failed} units failed; run again to retry them")
+            return 1
         if DRY_RUN:
             print("DRY RUN completed. Set DRY_RUN = False to apply changes.")
         else:
+            clear_checkpoints(conn, prefix)
             print("Recalculation completed successfully!")
         print("=" * 60)
-
-    except Exception as e:
-        print(f"\nError: {e}")
-        import traceback
-
-        traceback.print_exc()
-        return 1
+        return 0
     finally:
-        if conn:
-            conn.close()
-
-    return 0
+        conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Manage the monthly leaderboard_snapshots partitions.
+
+Usage:
+    python snapshot_partitions.py                        # list partitions
+    python snapshot_partitions.py --ahead 3              # create the next 3 months
+    python snapshot_partitions.py --detach-before 2026-01
+    python snapshot_partitions.py --detach-before 2026-01 --include-history --drop
+
+Detaching replaces big DELETEs when old data is retired: the detached table
+keeps its rows (archive it, e.g. with pg_dump) until it is dropped.
+"""
+
+import os
+import re
+import sys
+import argparse
+from dotenv import load_dotenv
+
+from db_utils import get_db_connection
+
+sys.path.append(
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), "..", "lambda-functions", "leaderboard_snapshots"
+        )
+    )
+)
+from schema import (
+    ensure_snapshot_partitions,
+    snapshot_partitions,
+    detach_snapshot_partition,
+)
+
+load_dotenv()
+
+DRY_RUN = True  # Set to False to actually detach / drop
+HISTORY_PARTITION = "leaderboard_snapshots_history"
+MONTH_PATTERN = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def partitions_before(partitions, before, include_history=False):
+    """Names of monthly partitions that end on or before `before` ("YYYY-MM")"""
+    cutoff = tuple(int(x) for x in before.split("-"))
+    names = []
+    for name, _ in partitions:
+        if name == HISTORY_PARTITION:
+            if include_history:
+                names.append(name)
+            continue
+        match = MONTH_PATTERN.search(name)
+        if match and (int(match.group(1)), int(match.group(2))) < cutoff:
+            names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage snapshot partitions")
+    parser.add_argument("--ahead", type=int, help="Create partitions this many months ahead")
+    parser.add_argument("--detach-before", help="Detach partitions for months before YYYY-MM")
+    parser.add_argument(
+        "--include-history",
+        action="store_true",
+        help="Also detach the pre-partitioning history partition",
+    )
+    parser.add_argument("--drop", action="store_true", help="Drop partitions after detaching")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        if args.ahead is not None:
+            created = ensure_snapshot_partitions(conn, args.ahead)
+            print(f"✓ Created {created} partitions")
+
+        partitions = snapshot_partitions(conn)
+        for name, bound in partitions:
+            print(f"  {name}: {bound}")
+
+        if args.detach_before:
+            targets = partitions_before(
+                partitions, args.detach_before, args.include_history
+            )
+            if not targets:
+                print("Nothing to detach")
+            for name in targets:
+                if DRY_RUN:
+                    print(f"[DRY RUN] Would detach {name}{' and drop it' if args.drop else ''}")
+                    continue
+                detach_snapshot_partition(conn, name)
+                print(f"✓ Detached {name}")
+                if args.drop:
+                    with conn:
+                        with conn.cursor() as cur:
+                            cur.execute(f'DROP TABLE "{name}"')
+                    print(f"✓ Dropped {name}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,7 @@ from leaderboard import LeaderboardDB
 from utils.aws_dynamodb import DynamoDBClient
 from logger import setup_logger
 from utils.supabase_channels import add_channel, delete_channel
+from utils.command_executor import CommandExecutor, CommandRejected
 
 # Load environment variables
 load_dotenv()
@@ -80,6 +81,8 @@ class DiscordBot(commands.Bot):
         # Disable the default help command before creating the bot instance
         super().__init__(command_prefix="!", intents=intents, help_command=None)
         self.db = LeaderboardDB()
+        # LeaderboardDB commands block, so they run on a bounded set of threads
+        self.executor = CommandExecutor()
         self.dynamo_client = DynamoDBClient()
         self.last_news_check = datetime.utcnow()
 
@@ -158,6 +161,22 @@ class DiscordBot(commands.Bot):
         async def duoweekly_command(ctx, *args):
             await self.process_bgweekly(ctx.send, args, game_mode="1")
 
+        @self.command(name="month", aliases=["bgmonth"])
+        async def month_command(ctx, *args):
+            await self.process_month(ctx.send, args, game_mode="0")
+
+        @self.command(name="duomonth")
+        async def duomonth_command(ctx, *args):
+            await self.process_month(ctx.send, args, game_mode="1")
+
+        @self.command(name="season", aliases=["bgseason"])
+        async def season_command(ctx, *args):
+            await self.process_season(ctx.send, args, game_mode="0")
+
+        @self.command(name="duoseason")
+        async def duoseason_command(ctx, *args):
+            await self.process_season(ctx.send, args, game_mode="1")
+
         @self.command(name="peak")
         async def peak_command(ctx, *args):
             await self.process_peak(ctx.send, args, game_mode="0")
@@ -255,9 +274,13 @@ class DiscordBot(commands.Bot):
                 await responder("Usage: !rank <player_name or rank> [region]")
                 return
 
-            response = self.db.rank(player_name, region, game_mode)
+            response = await self.executor.run(
+                "rank", self.db.rank, player_name, region, game_mode
+            )
             response = response.replace("wallii.gg", "https://wallii.gg")
             await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
         except Exception as e:
             await responder("An error occurred while processing the command.")
             logger.error(f"Error in process_bgrank: {e}")
@@ -272,9 +295,13 @@ class DiscordBot(commands.Bot):
                 await responder("Usage: !daily <player_name or rank> [region]")
                 return
 
-            response = self.db.day(player_name, region, game_mode)
+            response = await self.executor.run(
+                "day", self.db.day, player_name, region, game_mode
+            )
             response = response.replace("wallii.gg", "https://wallii.gg")
             await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
         except Exception as e:
             await responder("An error occurred while processing the command.")
             logger.error(f"Error in process_bgdaily: {e}")
@@ -289,9 +316,13 @@ class DiscordBot(commands.Bot):
                 await responder("Usage: !yesterday <player_name or rank> [region]")
                 return
 
-            response = self.db.day(player_name, region, game_mode, offset=1)
+            response = await self.executor.run(
+                "day", self.db.day, player_name, region, game_mode, offset=1
+            )
             response = response.replace("wallii.gg", "https://wallii.gg")
             await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
         except Exception as e:
             await responder("An error occurred while processing the command.")
             logger.error(f"Error in process_bgyday: {e}")
@@ -306,13 +337,59 @@ class DiscordBot(commands.Bot):
                 await responder("Usage: !weekly <player_name or rank> [region]")
                 return
 
-            response = self.db.week(player_name, region, game_mode)
+            response = await self.executor.run(
+                "week", self.db.week, player_name, region, game_mode
+            )
             response = response.replace("wallii.gg", "https://wallii.gg")
             await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
         except Exception as e:
             await responder("An error occurred while processing the command.")
             logger.error(f"Error in process_bgweekly: {e}")
 
+    async def process_month(self, responder, args, game_mode="0"):
+        """Process month command"""
+        try:
+            player_name = args[0] if args else None
+            region = args[1] if len(args) > 1 else None
+
+            if not player_name:
+                await responder("Usage: !month <player_name or rank> [region]")
+                return
+
+            response = await self.executor.run(
+                "month", self.db.month, player_name, region, game_mode
+            )
+            response = response.replace("wallii.gg", "https://wallii.gg")
+            await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
+        except Exception as e:
+            await responder("An error occurred while processing the command.")
+            logger.error(f"Error in process_month: {e}")
+
+    async def process_season(self, responder, args, game_mode="0"):
+        """Process season command"""
+        try:
+            player_name = args[0] if args else None
+            region = args[1] if len(args) > 1 else None
+
+            if not player_name:
+                await responder("Usage: !season <player_name or rank> [region]")
+                return
+
+            response = await self.executor.run(
+                "season", self.db.season, player_name, region, game_mode
+            )
+            response = response.replace("wallii.gg", "https://wallii.gg")
+            await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
+        except Exception as e:
+            await responder("An error occurred while processing the command.")
+            logger.error(f"Error in process_season: {e}")
+
     async def process_peak(self, responder, args, game_mode="0"):
         """Process peak command"""
         try:
@@ -323,9 +400,13 @@ class DiscordBot(commands.Bot):
                 await responder("Usage: !peak <player_name or rank> [region]")
                 return
 
-            response = self.db.peak(player_name, region, game_mode)
+            response = await self.executor.run(
+                "peak", self.db.peak, player_name, region, game_mode
+            )
             response = response.replace("wallii.gg", "https://wallii.gg")
             await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
         except Exception as e:
             await responder("An error occurred while processing the command.")
             logger.error(f"Error in process_peak: {e}")
@@ -335,9 +416,13 @@ class DiscordBot(commands.Bot):
         try:
             server = args[0] if args else None
 
-            response = self.db.region_stats(server, game_mode)
+            response = await self.executor.run(
+                "region_stats", self.db.region_stats, server, game_mode
+            )
             response = response.replace("wallii.gg", "https://wallii.gg")
             await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
         except Exception as e:
             await responder("An error occurred while processing the command.")
             logger.error(f"Error in process_stats: {e}")
@@ -348,13 +433,19 @@ class DiscordBot(commands.Bot):
             server = args[0] if args else None
 
             if server is None or server == "":
-                response = self.db.top10(game_mode=game_mode)
+                response = await self.executor.run(
+                    "top10", self.db.top10, game_mode=game_mode
+                )
                 response = response.replace("wallii.gg", "https://wallii.gg")
                 await responder(response)
             else:
-                response = self.db.top10(server, game_mode)
+                response = await self.executor.run(
+                    "top10", self.db.top10, server, game_mode
+                )
                 response = response.replace("wallii.gg", "https://wallii.gg")
                 await responder(response)
+        except CommandRejected as e:
+            await responder(str(e))
         except Exception as e:
             await responder("An error occurred while processing the command.")
             logger.error(f"Error in process_top: {e}")
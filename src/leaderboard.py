@@ -7,12 +7,15 @@ from collections import defaultdict
 from dotenv import load_dotenv
 import requests
 import math
-from utils.queries import parse_rank_or_player_args
+from utils.queries import parse_rank_or_player_args, find_player_at_rank
 from utils.regions import parse_server
 from utils.time_range import TimeRangeHelper
+from utils.season_archive import SeasonArchive, parse_season_arg
+from utils.name_index import NameIndex
+from logger import setup_logger
 from datetime import timedelta, date, datetime, timezone
 from psycopg2.extras import RealDictCursor
-from utils.constants import NON_CN_REGIONS, REGIONS, STATS_LIMIT
+from utils.constants import DB_POOL_SIZE, NON_CN_REGIONS, REGIONS, STATS_LIMIT
 from utils.placement_utils import calculate_average_placement, calculate_placements
 from typing import Optional, Tuple
 import aiohttp
@@ -24,14 +27,18 @@ from config import SEASON
 
 load_dotenv()
 
+logger = setup_logger("LeaderboardDB")
+
 # Cutoff date for switching from deltas to placements in day/week commands
 # After this date, non-CN regions will use placements instead of deltas
 PLACEMENTS_CUTOFF_DATE = date(2025, 12, 5)
 
 # Table names
 CURRENT_LEADERBOARD = "current_leaderboard"
+REGION_STATS = "region_stats"
 LEADERBOARD_SNAPSHOTS = "leaderboard_snapshots"
 MILESTONE_TRACKING = "milestone_tracking"
+RATING_ROLLUP_DAILY = "rating_rollup_daily"
 
 # New normalized table names
 from config import NORMALIZED_TABLES
@@ -90,12 +97,17 @@ class LeaderboardDB:
                 None  # Override patch link: (link, override_date)
             )
             self._refresh_task: Optional[asyncio.Task] = None
+            self.archive = SeasonArchive()
+            # Player names and aliases for "did you mean" suggestions
+            self.player_names = NameIndex()
+            self._player_names_through = 0  # Highest player_id indexed so far
 
             # Initial sync load
             try:
                 loop = asyncio.get_event_loop()
                 self.aliases = loop.run_until_complete(self._load_aliases())
                 self.patch_link = loop.run_until_complete(self._fetch_patch_link())
+                self._refresh_player_names()
                 # Start background tasks
                 loop.run_until_complete(self.start_background_tasks())
             except RuntimeError:
@@ -106,12 +118,14 @@ class LeaderboardDB:
                     for item in response["Items"]
                 }
                 self.patch_link = requests.get(api_url).json()
+                self._refresh_player_names()
 
     def _get_connection(self):
         if not hasattr(self, "_connection_pool"):
-            self._connection_pool = pool.SimpleConnectionPool(
+            # Commands run on worker threads, so the pool has to be thread safe
+            self._connection_pool = pool.ThreadedConnectionPool(
                 1,
-                10,  # minconn, maxconn
+                DB_POOL_SIZE,  # minconn, maxconn
                 host=os.getenv("DB_HOST"),
                 port=os.getenv("DB_PORT", "5432"),
                 dbname=os.getenv("DB_NAME"),
@@ -120,6 +134,43 @@ class LeaderboardDB:
             )
         return self._connection_pool.getconn()
 
+    def _refresh_player_names(self):
+        """
+        Index the players added since the last refresh (new ids come from the
+        ingest, so this is one primary-key range read) and the current aliases
+        """
+        conn = self._get_connection()
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"""
+                    SELECT player_id, player_name
+                    FROM {PLAYERS_TABLE}
+                    WHERE player_id > %s
+                    ORDER BY player_id
+                    """,
+                    (self._player_names_through,),
+                )
+                rows = cur.fetchall()
+            if rows:
+                self.player_names.add(row["player_name"] for row in rows)
+                self._player_names_through = rows[-1]["player_id"]
+            self.player_names.add(self.aliases)
+        except Exception as e:
+            logger.error(f"Error refreshing player names: {e}")
+        finally:
+            self._connection_pool.putconn(conn)
+
+    def _with_suggestions(self, name: str, message: str) -> str:
+        """Add "did you mean" names to a not-found message when `name` is unknown"""
+        name = name.lower()
+        if name in self.player_names:
+            return message
+        suggestions = self.player_names.suggest(name)
+        if not suggestions:
+            return message
+        return f"{message} Did you mean: {', '.join(suggestions)}?"
+
     def _get_stats_limit(self, game_mode: str) -> int:
         """
         Get the stats limit based on game mode.
@@ -214,6 +265,10 @@ class LeaderboardDB:
                 self.aliases = await self._load_aliases()
                 print("Refreshed aliases")
 
+                # Pick up players added by the ingest since the last refresh;
+                # it queries and re-indexes, so keep it off the event loop
+                await asyncio.to_thread(self._refresh_player_names)
+
                 # Refresh patch link (override will be checked inside _fetch_patch_link)
                 self.patch_link = await self._fetch_patch_link()
                 print("Refreshed patch link")
@@ -423,31 +478,7 @@ class LeaderboardDB:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
                     if region:
                         # Only query specified region
-                        if rank > 1000:
-                            # Use current_leaderboard for ranks > 1000
-                            cur.execute(
-                                f"""
-                                SELECT player_name, rating, region, rank
-                                FROM {CURRENT_LEADERBOARD}
-                                WHERE rank = %s AND region = %s AND game_mode = %s
-                                LIMIT 1;
-                                """,
-                                (rank, region, game_mode),
-                            )
-                        else:
-                            # Use daily_leaderboard_stats for ranks <= 1000
-                            cur.execute(
-                                f"""
-                                SELECT p.player_name, d.rating, d.region, d.rank
-                                FROM {DAILY_LEADERBOARD_STATS} d
-                                INNER JOIN {PLAYERS_TABLE} p ON d.player_id = p.player_id
-                                WHERE d.rank = %s AND d.region = %s AND d.game_mode = %s
-                                ORDER BY d.day_start DESC
-                                LIMIT 1;
-                                """,
-                                (rank, region, game_mode),
-                            )
-                        row = cur.fetchone()
+                        row = find_player_at_rank(rank, region, game_mode, cur)
                         if row:
                             base_message = f"{row['player_name']} is rank {row['rank']} in {row['region']} at {row['rating']}"
                             if row["rank"] <= 1000:
@@ -459,31 +490,7 @@ class LeaderboardDB:
                         # No region: return top player per region
                         results = []
                         for reg in REGIONS:
-                            if rank > 1000:
-                                # Use current_leaderboard for ranks > 1000
-                                cur.execute(
-                                    f"""
-                                    SELECT player_name, rating, region, rank
-                                    FROM {CURRENT_LEADERBOARD}
-                                    WHERE rank = %s AND region = %s AND game_mode = %s
-                                    LIMIT 1;
-                                    """,
-                                    (rank, reg, game_mode),
-                                )
-                            else:
-                                # Use daily_leaderboard_stats for ranks <= 1000
-                                cur.execute(
-                                    f"""
-                                    SELECT p.player_name, d.rating, d.region, d.rank
-                                    FROM {DAILY_LEADERBOARD_STATS} d
-                                    INNER JOIN {PLAYERS_TABLE} p ON d.player_id = p.player_id
-                                    WHERE d.rank = %s AND d.region = %s AND d.game_mode = %s
-                                    ORDER BY d.day_start DESC
-                                    LIMIT 1;
-                                    """,
-                                    (rank, reg, game_mode),
-                                )
-                            row = cur.fetchone()
+                            row = find_player_at_rank(rank, reg, game_mode, cur)
                             if row:
                                 results.append(
                                     f"{row['player_name']} is rank {row['rank']} in {row['region']} at {row['rating']}"
@@ -508,7 +515,9 @@ class LeaderboardDB:
                     rows = fetch_rank(cur, CURRENT_LEADERBOARD)
 
                 if not rows:
-                    return f"{query_params[0].lower()} can't be found."
+                    return self._with_suggestions(
+                        query_params[0], f"{query_params[0].lower()} can't be found."
+                    )
 
                 base_message = " | ".join(
                     f"{row['player_name']} is rank {row['rank']} in {row['region']} at {row['rating']}"
@@ -525,6 +534,15 @@ class LeaderboardDB:
             self._connection_pool.putconn(conn)
 
     def peak(self, arg1: str, arg2: str = None, game_mode: str = "0") -> str:
+        # "!peak <player> s16" reads a past season from the archive
+        season, player_arg = parse_season_arg(arg2), arg1
+        if season is None:
+            season, player_arg = parse_season_arg(arg1), arg2
+        if season is not None:
+            if season != SEASON:
+                return self._archived_peak(player_arg, season, game_mode)
+            arg1, arg2 = player_arg, None
+
         conn = self._get_connection()
         try:
             where_clause, query_params, rank, _ = parse_rank_or_player_args(
@@ -558,7 +576,9 @@ class LeaderboardDB:
                 rows = cur.fetchall()
 
                 if not rows:
-                    return f"{query_params[0]} is not in the top {limit}."
+                    return self._with_suggestions(
+                        query_params[0], f"{query_params[0]} is not in the top {limit}."
+                    )
 
                 return " | ".join(
                     f"{row['player_name']}'s peak rating in {row['region']} this season: {row['rating']} on {row['snapshot_time'].astimezone(TimeRangeHelper.now_la().tzinfo).strftime('%B %d, %Y %I:%M %p')} PT"
@@ -570,6 +590,31 @@ class LeaderboardDB:
         finally:
             self._connection_pool.putconn(conn)
 
+    def _archived_peak(self, player_arg: str, season: int, game_mode: str) -> str:
+        if not self.archive.enabled:
+            return "Past seasons aren't available right now."
+        if not player_arg or player_arg.strip().isdigit():
+            return f"Past seasons are looked up by player name, like !peak lii s{season}"
+
+        player_name = player_arg.lower().strip()
+        player_name = self.aliases.get(player_name, player_name)
+        try:
+            if not self.archive.has_season(season):
+                return f"Season {season} isn't archived."
+            rows = self.archive.peak(player_name, season, game_mode)
+        except Exception as e:
+            return f"Error fetching peak: {e}"
+
+        if not rows:
+            return self._with_suggestions(
+                player_name, f"{player_name} has no games recorded in season {season}."
+            )
+
+        return " | ".join(
+            f"{row['player_name']}'s peak rating in {row['region']} in season {season}: {row['rating']} on {row['snapshot_time'].astimezone(TimeRangeHelper.now_la().tzinfo).strftime('%B %d, %Y %I:%M %p')} PT"
+            for row in rows
+        )
+
     def day(
         self, arg1: str, arg2: str = None, game_mode: str = "0", offset: int = 0
     ) -> str:
@@ -765,6 +810,124 @@ class LeaderboardDB:
         finally:
             self._connection_pool.putconn(conn)
 
+    def month(
+        self, arg1: str, arg2: str = None, game_mode: str = "0", offset: int = 0
+    ) -> str:
+        start = TimeRangeHelper.start_of_month_la(offset)
+        end = TimeRangeHelper.start_of_month_la(offset - 1)
+        return self._rollup_progress(
+            arg1,
+            arg2,
+            game_mode,
+            command="month",
+            suffix=" last month" if offset > 0 else " this month",
+            date_range=(start.date(), end.date()),
+        )
+
+    def season(self, arg1: str, arg2: str = None, game_mode: str = "0") -> str:
+        # The tables only ever hold the current season
+        return self._rollup_progress(
+            arg1, arg2, game_mode, command="season", suffix=" this season"
+        )
+
+    def _rollup_progress(
+        self,
+        arg1: str,
+        arg2: str,
+        game_mode: str,
+        command: str,
+        suffix: str,
+        date_range: Optional[Tuple[date, date]] = None,
+    ) -> str:
+        """
+        Progress over a long range, read only from the daily rating rollups so
+        the cost grows with days played rather than snapshots taken.
+        """
+        conn = self._get_connection()
+        try:
+            where_clause, query_params, rank, _ = parse_rank_or_player_args(
+                arg1,
+                arg2,
+                game_mode,
+                aliases=self.aliases,
+                db_cursor=conn.cursor(cursor_factory=RealDictCursor),
+                alias="r",
+            )
+
+            if len(query_params) > 3:
+                return f"Enter a valid region with your command: like !{command} 1 NA"
+
+            limit = self._get_stats_limit(game_mode)
+
+            # Check rank limit if rank argument was provided
+            if rank is not None and rank > limit:
+                game_mode_name = "duos" if game_mode == "1" else "solo"
+                return f"This command is only supported for the top {limit} in {game_mode_name}."
+
+            date_filter = ""
+            params = query_params
+            if date_range:
+                date_filter = "AND r.day_start >= %s AND r.day_start < %s"
+                params += date_range
+
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                # The region the player was most active in over the range
+                cur.execute(
+                    f"""
+                    SELECT
+                        p.player_name,
+                        r.region,
+                        (array_agg(r.open_rating ORDER BY r.day_start))[1] AS start_rating,
+                        (array_agg(r.close_rating ORDER BY r.day_start DESC))[1] AS end_rating,
+                        MAX(r.high_rating) AS high_rating,
+                        SUM(r.games) AS games,
+                        SUM(r.placement_sum) AS placement_sum
+                    FROM {RATING_ROLLUP_DAILY} r
+                    INNER JOIN {PLAYERS_TABLE} p ON r.player_id = p.player_id
+                    {where_clause}
+                    {date_filter}
+                    GROUP BY p.player_name, r.region
+                    ORDER BY SUM(r.games) DESC
+                    LIMIT 1;
+                """,
+                    params,
+                )
+                row = cur.fetchone()
+
+        except Exception as e:
+            return f"Error fetching {command} stats: {e}"
+        finally:
+            self._connection_pool.putconn(conn)
+
+        if not row:
+            return self._with_suggestions(
+                query_params[0], f"{query_params[0]} has no games played{suffix}"
+            )
+
+        player_name = row["player_name"]
+        region = row["region"]
+        start_rating, end_rating = row["start_rating"], row["end_rating"]
+        games = row["games"]
+        view_link = f" wallii.gg/stats/{player_name}"
+
+        if not games:
+            return f"{player_name} is at {end_rating} in {region} with no games played{suffix}{view_link}"
+
+        total_delta = end_rating - start_rating
+        adjective = "climbed" if total_delta >= 0 else "fell"
+        emote = "liiHappyCat" if total_delta >= 0 else "liiCat"
+
+        # Placements are estimated from rating changes, which don't apply to CN
+        avg_placement_str = ""
+        if region.upper() != "CN":
+            avg_placement_str = f" with {row['placement_sum'] / games:.2f} average"
+
+        return (
+            f"{player_name} {adjective} from {start_rating} to {end_rating} "
+            f"({'+' if total_delta >= 0 else ''}{total_delta}) in {region} over {games} games{suffix}"
+            f"{avg_placement_str}, peaking at {row['high_rating']} {emote}{view_link}"
+        )
+
     def _summarize_progress(
         self,
         rows,
@@ -816,7 +979,9 @@ class LeaderboardDB:
                 self._connection_pool.putconn(conn)
 
             if not fallback_rows:
-                return f"{query_params[0]} is not in the top {limit}."
+                return self._with_suggestions(
+                    query_params[0], f"{query_params[0]} is not in the top {limit}."
+                )
 
             # Just use the first row since we only need one result
             row = fallback_rows[0]
@@ -1036,45 +1201,39 @@ class LeaderboardDB:
             self._connection_pool.putconn(conn)
 
     def region_stats(self, region: str = None, game_mode: str = "0") -> str:
+        """Ladder aggregates published by the current leaderboard refresh"""
         conn = self._get_connection()
         try:
             region = parse_server(region)
             regions = REGIONS if region is None else [region.upper()]
-            results = []
 
-            for reg in regions:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    # Count the number of players in the region
-                    cur.execute(
-                        f"""
-                        SELECT COUNT(DISTINCT player_name) AS player_count
-                        FROM {CURRENT_LEADERBOARD}
-                        WHERE region = %s AND game_mode = %s
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"""
+                    SELECT region, player_count, top25_avg, top100_avg,
+                           p50_rating, p99_rating
+                    FROM {REGION_STATS}
+                    WHERE game_mode = %s AND region = ANY(%s::char(2)[])
                     """,
-                        (reg, game_mode),
-                    )
-                    player_count = cur.fetchone()["player_count"]
+                    (game_mode, regions),
+                )
+                rows = {row["region"]: row for row in cur.fetchall()}
 
-                    # Calculate the average rating of the top 25 players
-                    cur.execute(
-                        f"""
-                        SELECT AVG(rating) AS avg_rating
-                        FROM (
-                            SELECT rating
-                            FROM {CURRENT_LEADERBOARD}
-                            WHERE region = %s AND game_mode = %s
-                            ORDER BY rating DESC
-                            LIMIT 25
-                        ) AS top_25
-                    """,
-                        (reg, game_mode),
+            results = []
+            for reg in regions:
+                row = rows.get(reg)
+                if row is None or row["top25_avg"] is None:
+                    continue
+                summary = (
+                    f"{reg} has {row['player_count']} players and Top 25 avg is "
+                    f"{int(row['top25_avg'])}"
+                )
+                if region is not None:
+                    summary += (
+                        f", Top 100 avg is {int(row['top100_avg'])}, "
+                        f"top 1% is {row['p99_rating']}+ and the median is {row['p50_rating']}"
                     )
-                    avg_rating = cur.fetchone()["avg_rating"]
-
-                    if avg_rating is not None:
-                        results.append(
-                            f"{reg} has {player_count} players and Top 25 avg is {int(avg_rating)}"
-                        )
+                results.append(summary)
 
             return " | ".join(results)
 
@@ -1,15 +1,11 @@
 # managers/channel_manager.py
 
-import os
-import aiohttp
 import asyncio
-import boto3
 from typing import Set
 from logger import setup_logger
-import re
-from utils.supabase_channels import get_all_live_channels
+from utils.supabase_channels import get_live_streams
 
-VALID_TWITCH_USERNAME = re.compile(r"^[a-zA-Z0-9_]{4,25}$")
+HEARTHSTONE_GAME_ID = "138585"
 logger = setup_logger("ChannelManager")
 
 
@@ -17,79 +13,36 @@ class ChannelManager:
     def __init__(self, priority_channels: Set[str]):
         self.priority_channels = priority_channels
         self.all_channels = set()
-        self.joined_channels = set()
         self.hearthstone_channels = set()
 
-        # Setup AWS DynamoDB client
-        aws_kwargs = {
-            "region_name": "us-east-1",
-            "aws_access_key_id": os.environ.get("AWS_ACCESS_KEY_ID"),
-            "aws_secret_access_key": os.environ.get("AWS_SECRET_ACCESS_KEY"),
-        }
-        self.dynamodb = boto3.resource("dynamodb", **aws_kwargs)
-        self.channel_table = self.dynamodb.Table("channel-table")
-
         # Load channels immediately
         self.load_channels()
 
     def load_channels(self):
+        """
+        Read the live channels twitch_live_check recorded. The previous state
+        is kept if the read fails.
+        """
         try:
-            self.all_channels = get_all_live_channels()
-            logger.info(f"Loaded {len(self.all_channels)} channels from Supabase")
+            streams = get_live_streams()
         except Exception as e:
-            logger.error(f"Failed to load channels from Supabase: {e}")
-            self.all_channels = {"liihs"}
+            logger.error(f"Failed to load live channels from Supabase: {e}")
+            if not self.all_channels:
+                self.all_channels = {"liihs"}
+            return
+        self.all_channels = set(streams)
+        self.hearthstone_channels = {
+            channel
+            for channel, (game_id, game_name) in streams.items()
+            if game_id == HEARTHSTONE_GAME_ID
+            or (game_name or "").lower() == "hearthstone"
+        }
+        logger.info(
+            f"Loaded {len(self.all_channels)} live channels from Supabase, "
+            f"{len(self.hearthstone_channels)} playing Hearthstone"
+        )
 
     async def get_live_channels(self) -> Set[str]:
-        # Reload channels from DynamoDB to get any new additions
-        self.load_channels()
-
-        if not self.all_channels:
-            return set()
-
-        try:
-            headers = {
-                "Client-ID": os.environ["TWITCH_CLIENT_ID"],
-                "Authorization": f'Bearer {os.environ["TWITCH_TOKEN"]}',
-            }
-        except KeyError as e:
-            logger.error(f"Missing environment variable: {e}")
-            return set()
-
-        async with aiohttp.ClientSession() as session:
-            live_channels = set()
-            self.hearthstone_channels = set()
-            channel_list = [c for c in list(self.all_channels) if c and c.strip()]
-
-            for i in range(0, len(channel_list), 50):
-                batch = channel_list[i : i + 50]
-                query_params = "&".join([f"user_login={channel}" for channel in batch])
-                url = f"https://api.twitch.tv/helix/streams?{query_params}"
-
-                try:
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            for stream in data["data"]:
-                                channel_name = stream["user_login"].lower()
-                                live_channels.add(channel_name)
-                                if (
-                                    stream.get("game_id") == "138585"
-                                    or stream.get("game_name", "").lower()
-                                    == "hearthstone"
-                                ):
-                                    self.hearthstone_channels.add(channel_name)
-                        else:
-                            error_text = await response.text()
-                            logger.warning(
-                                f"Batch failed: {response.status} - {error_text}"
-                            )
-                except Exception as e:
-                    logger.error(f"Batch error: {e}")
-
-                # Add a delay between batches to avoid rate limits
-                await asyncio.sleep(0.5)
-
-        logger.info(f"Live channels: {live_channels}")
-        logger.info(f"Hearthstone channels: {self.hearthstone_channels}")
-        return live_channels
+        # One indexed read; the Lambda does the Helix polling
+        await asyncio.to_thread(self.load_channels)
+        return set(self.all_channels)
@@ -0,0 +1,187 @@
+# managers/channel_reconciler.py
+
+"""
+Keeps the bot's joined channels in step with a target set.
+
+The reconciler diffs the target against the channels Twitch has confirmed
+(event_join / event_part) and sends JOINs in batches as large as Twitch's
+JOIN limit allows: at most JOIN_LIMIT per JOIN_WINDOW seconds, counted over
+a sliding window. A JOIN that isn't confirmed within JOIN_TIMEOUT, or that
+raises, is retried after an exponential backoff per channel.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Tuple
+
+from logger import setup_logger
+
+logger = setup_logger("ChannelReconciler")
+
+# Twitch allows 20 JOINs per 10 seconds for an unverified bot
+JOIN_LIMIT = 20
+JOIN_WINDOW = 10.0
+JOIN_TIMEOUT = 15.0  # Unconfirmed joins count as failed after this long
+PART_BATCH = 50
+RETRY_BASE = 5.0
+RETRY_MAX = 300.0
+
+
+class ChannelReconciler:
+    def __init__(
+        self,
+        join: Callable[[List[str]], Awaitable],
+        part: Callable[[List[str]], Awaitable],
+        always: Iterable[str] = (),
+        clock=time.monotonic,
+    ):
+        self.join = join
+        self.part = part
+        self.clock = clock
+        # Joined first, and never parted
+        self.always = set(always)
+
+        self.target: Set[str] = set(self.always)
+        self.confirmed: Set[str] = set()
+        self.pending: Dict[str, float] = {}  # channel -> when its JOIN was sent
+        self.parting: Set[str] = set()
+        self.retries: Dict[str, Tuple[int, float]] = {}  # channel -> (failures, retry at)
+        self._sent = deque()  # When each JOIN in the current window was sent
+        self._wakeup = asyncio.Event()
+
+        self.joins_sent = 0
+        self.joins_failed = 0
+        self.parts_sent = 0
+
+    # --- State updates ---
+
+    def set_target(self, channels: Iterable[str], always: Iterable[str] = None):
+        """always replaces the always-joined set, e.g. after a shard rebalance"""
+        if always is not None:
+            self.always = {c.lower() for c in always}
+        self.target = {c.lower() for c in channels} | self.always
+        for channel in list(self.retries):
+            if channel not in self.target:
+                del self.retries[channel]
+        self._wakeup.set()
+
+    def confirm_join(self, channel: str):
+        channel = channel.lower()
+        self.pending.pop(channel, None)
+        self.retries.pop(channel, None)
+        self.confirmed.add(channel)
+        self._wakeup.set()
+
+    def confirm_part(self, channel: str):
+        channel = channel.lower()
+        self.parting.discard(channel)
+        self.confirmed.discard(channel)
+        self._wakeup.set()
+
+    def sync(self, connected: Iterable[str]):
+        """Take the channels the connection reports as joined as the truth"""
+        connected = {c.lower() for c in connected}
+        for channel in connected:
+            self.pending.pop(channel, None)
+            self.retries.pop(channel, None)
+        self.confirmed = connected
+        # PARTs still outstanding are sent again
+        self.parting = set()
+        self._wakeup.set()
+
+    def status(self) -> dict:
+        return {
+            "target": len(self.target),
+            "joined": len(self.confirmed),
+            "pending": len(self.pending),
+            "backing_off": len(self.retries),
+            "joins_sent": self.joins_sent,
+            "joins_failed": self.joins_failed,
+            "parts_sent": self.parts_sent,
+        }
+
+    # --- Reconciling ---
+
+    def _fail(self, channels: Iterable[str], now: float):
+        for channel in channels:
+            self.pending.pop(channel, None)
+            failures = self.retries.get(channel, (0, 0))[0] + 1
+            delay = min(RETRY_MAX, RETRY_BASE * 2 ** (failures - 1))
+            self.retries[channel] = (failures, now + delay)
+            self.joins_failed += 1
+            logger.warning(
+                f"Join of {channel} failed {failures} time(s), retrying in {delay:.0f}s"
+            )
+
+    def _expire(self, now: float):
+        while self._sent and now - self._sent[0] >= JOIN_WINDOW:
+            self._sent.popleft()
+        self._fail(
+            [c for c, sent in self.pending.items() if now - sent >= JOIN_TIMEOUT], now
+        )
+
+    def _to_join(self, now: float) -> List[str]:
+        """Channels to join now, the always-joined ones first"""
+        wanted = self.target - self.confirmed - set(self.pending)
+        ready = [c for c in wanted if self.retries.get(c, (0, 0))[1] <= now]
+        return sorted(ready, key=lambda c: (c not in self.always, c))
+
+    def _next_wake(self, now: float) -> float:
+        """Seconds until a window slot, a join timeout or a retry comes due"""
+        deadlines = [sent + JOIN_TIMEOUT for sent in self.pending.values()]
+        if len(self._sent) >= JOIN_LIMIT:
+            deadlines.append(self._sent[0] + JOIN_WINDOW)
+        else:
+            deadlines += [
+                at
+                for c, (_, at) in self.retries.items()
+                if c in self.target and c not in self.pending
+            ]
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    async def step(self):
+        """Send whatever the limits allow right now"""
+        now = self.clock()
+        self._expire(now)
+
+        to_part = sorted(self.confirmed - self.target - self.always - self.parting)
+        for i in range(0, len(to_part), PART_BATCH):
+            batch = to_part[i : i + PART_BATCH]
+            try:
+                await self.part(batch)
+                self.parting.update(batch)
+                self.parts_sent += len(batch)
+                logger.info(f"Leaving {len(batch)} channels: {', '.join(batch)}")
+            except Exception as e:
+                logger.error(f"Error leaving {', '.join(batch)}: {e}")
+
+        slots = JOIN_LIMIT - len(self._sent)
+        batch = self._to_join(now)[:slots]
+        if not batch:
+            return
+        self._sent.extend([now] * len(batch))
+        for channel in batch:
+            self.pending[channel] = now
+        self.joins_sent += len(batch)
+        logger.info(f"Joining {len(batch)} channels: {', '.join(batch)}")
+        try:
+            await self.join(batch)
+        except Exception as e:
+            logger.error(f"Error joining {', '.join(batch)}: {e}")
+            self._fail(batch, self.clock())
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.step()
+            except Exception:
+                logger.exception("Error reconciling channels")
+            wait = self._next_wake(self.clock())
+            if wait == 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,124 @@
+# managers/shard_coordinator.py
+
+"""
+Splits the channels between bot shards.
+
+Each shard runs its own Twitch connection and heartbeats into bot_shards.
+The shards that heartbeated within SHARD_TTL form a consistent-hash ring,
+and a shard joins and answers only the channels the ring gives it. There is
+no leader to fail over: every shard reads the same table and computes the
+same ring, so when a shard stops heartbeating the others take its channels
+on their next pass, and a shard that shuts down cleanly removes itself so
+they take them at once. The heartbeats share one database connection,
+replaced only after an error.
+"""
+
+import asyncio
+import threading
+from typing import Iterable, Set
+
+from logger import setup_logger
+from utils import bot_shards
+from utils.hash_ring import HashRing
+
+logger = setup_logger("ShardCoordinator")
+
+HEARTBEAT_SECONDS = 10.0
+# A shard that misses three heartbeats is taken off the ring
+SHARD_TTL = 35.0
+
+
+class ShardCoordinator:
+    def __init__(self, shard_id: str, store=bot_shards):
+        self.shard_id = shard_id
+        self.store = store
+        # This shard is always on its own ring, even if the table can't be read
+        self.shards: Set[str] = {shard_id}
+        self.ring = HashRing(self.shards)
+        self.owned = 0  # Channels in the last assignment
+        self.rebalances = 0
+        self.heartbeat_failures = 0
+        self._conn = None
+        # Heartbeats run on a worker thread; leave() may run alongside one
+        self._conn_lock = threading.Lock()
+        # Set when the ring changes, so the channel loop re-targets at once
+        self.changed = asyncio.Event()
+
+    def owns(self, channel: str) -> bool:
+        return self.ring.owner(channel.lower()) == self.shard_id
+
+    def assign(self, channels: Iterable[str]) -> Set[str]:
+        """The channels of this shard out of all the bot's channels"""
+        owned = {c.lower() for c in channels if self.owns(c)}
+        self.owned = len(owned)
+        return owned
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self.store.connect()
+        return self._conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def heartbeat(self) -> bool:
+        """
+        Record this shard as alive and rebuild the ring from the live shards.
+        Returns True if the ring changed. On a database error the last ring
+        is kept and the connection is reopened on the next heartbeat.
+        """
+        with self._conn_lock:
+            try:
+                conn = self._connection()
+                self.store.heartbeat_shard(conn, self.shard_id, self.owned)
+                shards = set(self.store.get_live_shards(conn, SHARD_TTL))
+                shards.add(self.shard_id)
+                if min(shards) == self.shard_id:
+                    # One shard is enough to clean up after the others
+                    self.store.prune_shards(conn, SHARD_TTL)
+            except Exception as e:
+                self._disconnect()
+                self.heartbeat_failures += 1
+                logger.error(f"Shard {self.shard_id} heartbeat failed: {e}")
+                return False
+        if shards == self.shards:
+            return False
+        joined, left = shards - self.shards, self.shards - shards
+        logger.info(
+            f"Rebalancing shard {self.shard_id}: "
+            f"joined {sorted(joined)}, left {sorted(left)}, now {sorted(shards)}"
+        )
+        self.shards = shards
+        self.ring = HashRing(shards)
+        self.rebalances += 1
+        return True
+
+    def leave(self):
+        with self._conn_lock:
+            try:
+                self.store.remove_shard(self._connection(), self.shard_id)
+                logger.info(f"Shard {self.shard_id} left the ring")
+            except Exception as e:
+                logger.error(f"Shard {self.shard_id} could not leave the ring: {e}")
+            finally:
+                self._disconnect()
+
+    def status(self) -> dict:
+        return {
+            "shard": self.shard_id,
+            "shards": len(self.shards),
+            "owned": self.owned,
+            "rebalances": self.rebalances,
+            "heartbeat_failures": self.heartbeat_failures,
+        }
+
+    async def run(self):
+        while True:
+            if await asyncio.to_thread(self.heartbeat):
+                self.changed.set()
+            await asyncio.sleep(HEARTBEAT_SECONDS)
@@ -0,0 +1,176 @@
+import sys
+import os
+import json
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import buddy
+from utils.buddy_fetch import (
+    fetch_cards,
+    get_buddy_dict,
+    get_heroes_dict,
+    get_minions_dict,
+    get_spells_dict,
+    parse_card,
+)
+from utils.card_catalog import CardCatalog
+
+CARDS = [
+    {
+        "id": "TB_BaconShop_HERO_93",
+        "dbfId": 10,
+        "name": "Cookie the Cook",
+        "type": "HERO",
+        "armor": 5,
+        "heroPowerDbfId": 11,
+        "battlegroundsBuddyDbfId": 12,
+        "flavor": "Not kept in the catalog",
+    },
+    {
+        "id": "TB_BaconShop_HERO_93_SKIN_A",
+        "dbfId": 13,
+        "name": "Cookie the Cook",
+        "type": "HERO",
+        "battlegroundsBuddyDbfId": 12,
+    },
+    {
+        "id": "TB_BaconShop_HP_105",
+        "dbfId": 11,
+        "name": "Stir the Pot",
+        "type": "HERO_POWER",
+        "set": "BATTLEGROUNDS",
+        "cost": 1,
+        "text": "Throw a minion into the pot.",
+    },
+    {
+        "id": "TB_BaconShop_HERO_93_Buddy",
+        "dbfId": 12,
+        "name": "Sous Chef",
+        "isBattlegroundsBuddy": True,
+        "techLevel": 2,
+        "attack": 2,
+        "health": 3,
+        "text": "Gain <b>Taunt</b>.",
+    },
+    {
+        "id": "BG26_001",
+        "dbfId": 20,
+        "name": "Sewer Rat",
+        "type": "MINION",
+        "isBattlegroundsPoolMinion": True,
+        "techLevel": 1,
+        "attack": 3,
+        "health": 2,
+        "races": ["BEAST"],
+        "text": "<b>Deathrattle:</b> Summon a 2/3 Turtle.",
+    },
+    {
+        "id": "BG28_500",
+        "dbfId": 21,
+        "name": "Tavern Coin",
+        "type": "BATTLEGROUND_SPELL",
+        "techLevel": 1,
+        "cost": 0,
+        "text": "Gain 1 Gold.",
+    },
+    {"id": "CORE_CS2_231", "dbfId": 22, "name": "Wisp", "type": "MINION"},
+    {
+        "id": "BG30_MagicItem_001",
+        "dbfId": 30,
+        "name": "Lucky Tabby",
+        "type": "BATTLEGROUND_TRINKET",
+        "spellSchool": "LESSER_TRINKET",
+        "cost": 3,
+        "text": "Draw a card.",
+    },
+]
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+def test_fetch_revalidates_with_the_cached_validators(tmp_path):
+    cache = str(tmp_path / "cards.json")
+    body = json.dumps(CARDS).encode()
+    session = FakeSession(
+        [
+            FakeResponse(200, body, {"ETag": '"v1"', "Last-Modified": "Mon, 19 Oct 2026"}),
+            FakeResponse(304),
+        ]
+    )
+
+    assert fetch_cards(cache, session)[0] == body
+    assert fetch_cards(cache, session) == (None, None)
+    assert session.requests[0] == {}
+    assert session.requests[1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 19 Oct 2026",
+    }
+
+
+def test_catalog_keeps_only_battlegrounds_cards(tmp_path):
+    cards = CardCatalog.from_cards_json(CARDS, "abc")
+    assert "CORE_CS2_231" not in cards.by_id
+    assert "flavor" not in cards.by_dbf_id[10]
+    assert [hero["dbfId"] for hero in cards.heroes()] == [10]
+
+    path = str(tmp_path / "catalog.json")
+    cards.save(path)
+    loaded = CardCatalog.load(path)
+    assert loaded.sha256 == "abc"
+    assert loaded.cards == cards.cards
+
+
+def test_card_texts():
+    cards = CardCatalog.from_cards_json(CARDS)
+    heroes = get_heroes_dict(cards)
+    assert heroes["cookie"] == (
+        "Cookie the Cook has 5 armor. Hero Power: Stir the Pot (1): "
+        "Throw a minion into the pot. Buddy: Sous Chef."
+    )
+    assert heroes["cookiethecook"] == heroes["cookie"]
+    assert get_minions_dict(cards)["sewerrat"] == (
+        "Sewer Rat is a Tier 1 3/2 Beast. Ability: Deathrattle: Summon a 2/3 Turtle."
+    )
+    assert parse_card("tavern coin", get_spells_dict(cards), "spell") == (
+        "Tavern Coin is a Tier 1 spell that costs 0: Gain 1 Gold."
+    )
+    assert get_buddy_dict(cards)["cookie"][1].startswith("Sous Chef is a Tier 2 2/3")
+
+
+def test_catalog_is_rebuilt_only_when_the_content_changes():
+    body = json.dumps(CARDS).encode()
+    empty = buddy.Catalog(None, {}, {}, {}, {}, {}, {})
+    with patch.object(buddy, "catalog", empty), patch.object(CardCatalog, "save"):
+        with patch.object(buddy, "fetch_cards", return_value=(body, "abc")):
+            assert buddy.refresh_catalog()
+            first = buddy.catalog
+            # Same content served again without a 304
+            assert not buddy.refresh_catalog()
+        assert buddy.catalog is first
+        assert first.buddies["cookie"][0] == "Cookie the Cook"
+        assert "Lucky Tabby" in first.trinkets
+        assert "sewerrat" in first.minions
+
+        with patch.object(buddy, "fetch_cards", return_value=(None, None)):
+            assert not buddy.refresh_catalog()
+        assert buddy.catalog is first
@@ -0,0 +1,81 @@
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from managers.channel_manager import ChannelManager
+from utils import supabase_channels
+
+STREAMS = {
+    "liihs": ("138585", "Hearthstone"),
+    "dogdog": (None, "Hearthstone"),
+    "jeefhs": ("509658", "Just Chatting"),
+}
+
+
+def test_live_channels_come_from_the_live_flags():
+    with patch("managers.channel_manager.get_live_streams", return_value=STREAMS):
+        manager = ChannelManager({"liihs"})
+
+    assert manager.all_channels == {"liihs", "dogdog", "jeefhs"}
+    assert manager.hearthstone_channels == {"liihs", "dogdog"}
+
+
+def test_failed_read_keeps_the_last_live_set():
+    with patch("managers.channel_manager.get_live_streams", return_value=STREAMS):
+        manager = ChannelManager({"liihs"})
+    with patch(
+        "managers.channel_manager.get_live_streams", side_effect=RuntimeError("down")
+    ):
+        manager.load_channels()
+
+    assert manager.all_channels == {"liihs", "dogdog", "jeefhs"}
+    assert manager.hearthstone_channels == {"liihs", "dogdog"}
+
+
+class FakeConn:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.closed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        if self.fail:
+            raise ConnectionError("server closed the connection")
+
+    def fetchall(self):
+        return [("LiiHS ", "138585", "Hearthstone")]
+
+    def close(self):
+        self.closed = 1
+
+
+def test_live_reads_reuse_one_connection():
+    connections = [FakeConn(), FakeConn()]
+    with patch(
+        "utils.supabase_channels.get_db_connection", side_effect=connections
+    ), patch("utils.supabase_channels._live_conn", None):
+        assert supabase_channels.get_live_streams() == {
+            "liihs": ("138585", "Hearthstone")
+        }
+        supabase_channels.get_live_streams()
+        assert supabase_channels._live_conn is connections[0]
+
+        # A dropped connection is closed and replaced on the next read
+        connections[0].fail = True
+        with pytest.raises(ConnectionError):
+            supabase_channels.get_live_streams()
+        assert connections[0].closed
+        supabase_channels.get_live_streams()
+        assert supabase_channels._live_conn is connections[1]
@@ -0,0 +1,110 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from managers.channel_reconciler import (
+    JOIN_LIMIT,
+    JOIN_TIMEOUT,
+    JOIN_WINDOW,
+    RETRY_BASE,
+    ChannelReconciler,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeConnection:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.joins = []
+        self.parts = []
+
+    async def join(self, channels):
+        self.joins.append(list(channels))
+        if self.fail & set(channels):
+            raise RuntimeError("join failed")
+
+    async def part(self, channels):
+        self.parts.append(list(channels))
+
+
+def step(reconciler):
+    # A private loop, so the current one other tests use is left alone
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(reconciler.step())
+    finally:
+        loop.close()
+
+
+def make(clock, connection=None, always=("liihs",)):
+    connection = connection or FakeConnection()
+    return ChannelReconciler(connection.join, connection.part, always, clock), connection
+
+
+def test_joins_are_batched_to_the_window():
+    clock = FakeClock()
+    reconciler, connection = make(clock)
+    channels = [f"streamer{i:03}" for i in range(JOIN_LIMIT * 2 + 5)]
+    reconciler.set_target(channels)
+
+    step(reconciler)
+    assert len(connection.joins) == 1
+    assert len(connection.joins[0]) == JOIN_LIMIT
+    assert connection.joins[0][0] == "liihs"  # Always-joined channels go first
+
+    # Nothing more until the window has passed
+    step(reconciler)
+    assert len(connection.joins) == 1
+    assert reconciler._next_wake(clock()) == JOIN_WINDOW
+
+    for channel in connection.joins[0]:
+        reconciler.confirm_join(channel)
+    clock.now += JOIN_WINDOW
+    step(reconciler)
+    assert len(connection.joins[1]) == JOIN_LIMIT
+
+
+def test_unconfirmed_joins_are_retried_with_backoff():
+    clock = FakeClock()
+    reconciler, connection = make(clock, always=())
+    reconciler.set_target(["dogdog"])
+    step(reconciler)
+
+    clock.now += JOIN_TIMEOUT
+    step(reconciler)
+    assert reconciler.retries["dogdog"][0] == 1
+    assert len(connection.joins) == 1
+
+    clock.now += RETRY_BASE
+    step(reconciler)
+    assert connection.joins[-1] == ["dogdog"]
+    reconciler.confirm_join("dogdog")
+    assert reconciler.status()["joined"] == 1
+    assert "dogdog" not in reconciler.retries
+
+
+def test_failed_batch_backs_off_and_parts_non_target_channels():
+    clock = FakeClock()
+    connection = FakeConnection(fail={"jeefhs"})
+    reconciler, _ = make(clock, connection)
+    reconciler.sync(["liihs", "rdulive"])
+    reconciler.set_target(["jeefhs"])
+
+    step(reconciler)
+    assert connection.parts == [["rdulive"]]  # liihs is always joined
+    assert connection.joins == [["jeefhs"]]
+    assert reconciler.status()["joins_failed"] == 1
+
+    # Backing off: the next attempt is RETRY_BASE away, not immediate
+    step(reconciler)
+    assert len(connection.joins) == 1
+    assert reconciler._next_wake(clock()) == RETRY_BASE
@@ -0,0 +1,75 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.command_cache import DEFAULT_COOLDOWN, CommandCache, parse_cooldowns
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_repeats_in_one_channel_are_answered_once():
+    clock = FakeClock()
+    cache = CommandCache({"rank": 10}, clock=clock)
+    assert cache.claim(cache.key("Lii", "rank", "LII", None, "0"))
+    clock.now = 3
+    # Same question, differently typed
+    assert not cache.claim(cache.key("lii", "rank", " lii ", None, "0"))
+    # A different channel, player or mode is a different question
+    assert cache.claim(cache.key("dogdog", "rank", "lii", None, "0"))
+    assert cache.claim(cache.key("lii", "rank", "jeef", None, "0"))
+    assert cache.claim(cache.key("lii", "rank", "lii", None, "1"))
+    clock.now = 10
+    assert cache.claim(cache.key("lii", "rank", "lii", None, "0"))
+
+    stats = cache.stats()
+    assert stats["answered"] == 5 and stats["suppressed"] == 1
+    assert stats["suppressed_by_command"] == {"rank": 1}
+    assert stats["absorbed_pct"] == round(100 / 6, 1)
+
+
+def test_cooldowns_are_per_command():
+    clock = FakeClock()
+    cache = CommandCache({"top10": 60}, clock=clock)
+    top = cache.key("lii", "top10", "na", "0")
+    unknown = cache.key("lii", "something", "na")
+    assert cache.claim(top) and cache.claim(unknown)
+    clock.now = DEFAULT_COOLDOWN
+    assert cache.claim(unknown)
+    assert not cache.claim(top)
+
+
+def test_kwargs_are_part_of_the_key():
+    cache = CommandCache(clock=FakeClock())
+    assert cache.claim(cache.key("lii", "day", "lii", None, "0"))
+    assert cache.claim(cache.key("lii", "day", "lii", None, "0", offset=1))
+    assert not cache.claim(cache.key("lii", "day", "lii", None, "0", offset=1))
+
+
+def test_released_claims_can_be_asked_again():
+    cache = CommandCache(clock=FakeClock())
+    key = cache.key("lii", "season", "lii", None, "0")
+    assert cache.claim(key)
+    cache.release(key)
+    assert cache.claim(key)
+
+
+def test_expired_entries_are_pruned():
+    clock = FakeClock()
+    cache = CommandCache({"rank": 5}, clock=clock)
+    for player in ("a", "b", "c"):
+        cache.claim(cache.key("lii", "rank", player))
+    clock.now = 1000
+    cache.claim(cache.key("lii", "rank", "d"))
+    assert cache.stats()["entries"] == 1
+
+
+def test_parse_cooldowns():
+    assert parse_cooldowns("rank=5, top10=120,bad,=") == {"rank": 5.0, "top10": 120.0}
+    assert parse_cooldowns("") == {}
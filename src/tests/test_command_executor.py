@@ -0,0 +1,92 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.command_executor import (
+    BUSY_MESSAGE,
+    TIMEOUT_MESSAGE,
+    CommandExecutor,
+    CommandRejected,
+)
+
+
+def run(coro):
+    # A private loop, so the current one other tests use is left alone
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_result_and_metrics():
+    executor = CommandExecutor(workers=2, max_queued=2)
+    assert run(executor.run("rank", lambda name: f"{name} is rank 1", "lii")) == (
+        "lii is rank 1"
+    )
+    stats = executor.stats()
+    assert stats["completed"] == 1 and stats["in_flight"] == 0
+    assert stats["commands"]["rank"]["run_time_p50"] is not None
+    executor.shutdown()
+
+
+def test_saturated_executor_sheds_new_commands():
+    executor = CommandExecutor(workers=1, max_queued=1)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [
+            asyncio.ensure_future(executor.run("rank", release.wait, deadline=5))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.05)
+        with pytest.raises(CommandRejected, match=BUSY_MESSAGE):
+            await executor.run("rank", lambda: "too many")
+        release.set()
+        return await asyncio.gather(*blocked)
+
+    assert run(scenario()) == [True, True]
+    assert executor.stats()["shed"] == {"saturated": 1}
+    executor.shutdown()
+
+
+def test_deadline_stops_waiting_and_drops_queued_work():
+    executor = CommandExecutor(workers=1, max_queued=4)
+    ran = []
+
+    async def scenario():
+        slow = asyncio.ensure_future(
+            executor.run("season", time.sleep, 0.3, deadline=0.1)
+        )
+        queued = asyncio.ensure_future(
+            executor.run("rank", ran.append, "queued", deadline=0.1)
+        )
+        for task in (slow, queued):
+            with pytest.raises(CommandRejected, match=TIMEOUT_MESSAGE):
+                await task
+
+    run(scenario())
+    time.sleep(0.4)
+    assert ran == []  # Cancelled before a worker picked it up
+    stats = executor.stats()
+    assert stats["shed"] == {"timeout": 2}
+    assert stats["in_flight"] == 0
+    executor.shutdown()
+
+
+def test_command_errors_propagate():
+    executor = CommandExecutor(workers=1, max_queued=1)
+
+    def broken():
+        raise ValueError("bad query")
+
+    with pytest.raises(ValueError):
+        run(executor.run("rank", broken))
+    assert executor.stats()["failed"] == 1
+    executor.shutdown()
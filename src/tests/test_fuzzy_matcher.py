@@ -0,0 +1,44 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.buddy_fetch import parse_buddy, parse_trinket
+from utils.fuzzy_matcher import DIRECT_HIT_SCORE, SUGGEST_SCORE, FuzzyMatcher
+
+TRINKETS = {
+    "Lucky Tabby": "Lucky Tabby is a LESSER_TRINKET that costs 3: Draw a card.",
+    "Tavern Coin": "Tavern Coin is a GREATER_TRINKET that costs 5: Gain 1 Gold.",
+    "Eternal Portrait": "Eternal Portrait is a GREATER_TRINKET that costs 4: ...",
+}
+BUDDIES = {
+    "cookie": ("Cookie the Cook", "Sous Chef ...", "Golden Sous Chef ..."),
+    "ratking": ("The Rat King", "Pigeon Lord ...", "Golden Pigeon Lord ..."),
+}
+
+
+def test_typo_is_a_direct_hit():
+    matcher = FuzzyMatcher(TRINKETS)
+    name, score = matcher.match("lucky tabbby")[0]
+    assert name == "Lucky Tabby" and score >= DIRECT_HIT_SCORE
+    assert parse_trinket("lucky tabbby", TRINKETS, matcher) == TRINKETS["Lucky Tabby"]
+
+
+def test_suggestions_and_misses():
+    matcher = FuzzyMatcher(BUDDIES)
+    suggestions = matcher.match("cokz")
+    assert suggestions and all(
+        SUGGEST_SCORE <= score < DIRECT_HIT_SCORE for _, score in suggestions
+    )
+    assert parse_buddy("cokz", BUDDIES, {}, matcher)[1] == (
+        "cokz is not a valid hero, try again with cookie"
+    )
+    assert matcher.match("zzzzzz") == ()
+    assert parse_buddy("zzzzzz", BUDDIES, {}, matcher)[0] is None
+
+
+def test_repeated_queries_come_from_the_cache():
+    matcher = FuzzyMatcher(TRINKETS)
+    first = matcher.match("tavrn coin")
+    assert matcher.match("tavrn coin") is first
+    assert matcher.match.cache_info().hits == 1
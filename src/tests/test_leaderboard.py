@@ -2,7 +2,7 @@ import sys
 import os
 import csv
 from datetime import datetime, date
-from unittest.mock import patch, MagicMock
+from unittest.mock import DEFAULT, patch, MagicMock
 
 sys.path.insert(
     0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src"))
@@ -10,6 +10,7 @@ sys.path.insert(
 
 import pytest
 from leaderboard import LeaderboardDB
+from utils.name_index import NameIndex
 
 
 def load_csv_data(csv_file_path):
@@ -84,13 +85,28 @@ def create_mock_db_response(region, game_mode, day_start=None):
 
 @pytest.fixture
 def mock_postgres():
-    with patch("psycopg2.pool.SimpleConnectionPool") as mock_pool:
+    with patch("psycopg2.pool.ThreadedConnectionPool") as mock_pool:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
 
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
         mock_pool.return_value.getconn.return_value = mock_conn
 
+        # The player name index reads player_rows; every other query gets
+        # whatever the test set as fetchall's return value
+        mock_cursor.player_rows = [
+            {"player_id": int(row["player_id"]), "player_name": row["player_name"]}
+            for row in get_mock_players_data()
+        ]
+
+        def fetchall():
+            sql = mock_cursor.execute.call_args.args[0]
+            if "SELECT player_id, player_name" in " ".join(sql.split()):
+                return mock_cursor.player_rows
+            return DEFAULT
+
+        mock_cursor.fetchall.side_effect = fetchall
+
         yield mock_cursor
 
 
@@ -823,3 +839,128 @@ class TestRank:
         print(f"\nRANK (NA, 2):")
         print(f"Result: {result}")
         print("-" * 40)
+
+
+class TestMonthSeason:
+    """Test suite for the rollup-backed month and season commands"""
+
+    def test_month_climb(self, mock_postgres, mock_time_range_helper):
+        mock_postgres.fetchone.return_value = {
+            "player_name": "beterbabbit",
+            "region": "NA",
+            "start_rating": 15000,
+            "end_rating": 17306,
+            "high_rating": 17500,
+            "games": 100,
+            "placement_sum": 350,
+        }
+
+        db = LeaderboardDB()
+        result = db.month("beterbabbit", "NA")
+
+        assert result == (
+            "beterbabbit climbed from 15000 to 17306 (+2306) in NA over 100 games "
+            "this month with 3.50 average, peaking at 17500 liiHappyCat "
+            "wallii.gg/stats/beterbabbit"
+        )
+
+    def test_season_no_games(self, mock_postgres, mock_time_range_helper):
+        mock_postgres.fetchone.return_value = None
+
+        db = LeaderboardDB()
+        result = db.season("beterbabbit")
+
+        assert result == "beterbabbit has no games played this season"
+
+
+class TestArchivedPeak:
+    """Past-season peaks are routed to the season archive"""
+
+    def test_peak_past_season_without_archive(self, mock_postgres, mock_time_range_helper):
+        db = LeaderboardDB()
+        db.archive.root = ""
+        mock_postgres.reset_mock()
+
+        assert db.peak("beterbabbit", "s1") == "Past seasons aren't available right now."
+        mock_postgres.execute.assert_not_called()
+
+    def test_peak_past_season_needs_player_name(self, mock_postgres, mock_time_range_helper):
+        db = LeaderboardDB()
+        db.archive.root = "s3://archive/seasons"
+
+        assert db.peak("s1", "2") == "Past seasons are looked up by player name, like !peak lii s1"
+
+
+class TestPlayerSuggestions:
+    """Unknown player names get "did you mean" suggestions from the name index"""
+
+    def test_refresh_reads_only_new_players(self, mock_postgres, mock_time_range_helper):
+        db = LeaderboardDB()
+        db.aliases = {"jeefhs": "jeef"}
+        db.player_names = NameIndex()
+        db._player_names_through = 0
+        mock_postgres.player_rows = [
+            {"player_id": 1, "player_name": "beterbabbit"},
+            {"player_id": 7, "player_name": "lii"},
+        ]
+        db._refresh_player_names()
+
+        assert "lii" in db.player_names
+        assert "jeefhs" in db.player_names  # aliases are indexed too
+        assert db._player_names_through == 7
+        mock_postgres.player_rows = []
+        db._refresh_player_names()
+        assert mock_postgres.execute.call_args[0][1] == (7,)
+
+    def test_rank_unknown_player_suggests(self, mock_postgres, mock_time_range_helper):
+        db = LeaderboardDB()
+        db.player_names = NameIndex(["beterbabbit", "lii"])
+        mock_postgres.fetchall.return_value = []
+
+        assert db.rank("beterbabit", "NA") == (
+            "beterbabit can't be found. Did you mean: beterbabbit?"
+        )
+
+    def test_known_player_gets_no_suggestions(self, mock_postgres, mock_time_range_helper):
+        db = LeaderboardDB()
+        db.player_names = NameIndex(["beterbabbit", "beterbabbit2"])
+        mock_postgres.fetchone.return_value = None
+
+        assert db.season("beterbabbit") == "beterbabbit has no games played this season"
+
+
+class TestRegionStats:
+    """!stats reads the aggregates published with the current leaderboard"""
+
+    def test_region_stats_single_region(self, mock_postgres, mock_time_range_helper):
+        db = LeaderboardDB()
+        mock_postgres.fetchall.return_value = [
+            {
+                "region": "NA",
+                "player_count": 25000,
+                "top25_avg": 17120.4,
+                "top100_avg": 15010.9,
+                "p50_rating": 6400,
+                "p99_rating": 11000,
+            }
+        ]
+
+        assert db.region_stats("NA") == (
+            "NA has 25000 players and Top 25 avg is 17120, Top 100 avg is 15010, "
+            "top 1% is 11000+ and the median is 6400"
+        )
+
+    def test_region_stats_skips_missing_regions(self, mock_postgres, mock_time_range_helper):
+        db = LeaderboardDB()
+        mock_postgres.fetchall.return_value = [
+            {
+                "region": "EU",
+                "player_count": 20000,
+                "top25_avg": 16500,
+                "top100_avg": 14000,
+                "p50_rating": 6200,
+                "p99_rating": 10500,
+            }
+        ]
+
+        assert db.region_stats() == "EU has 20000 players and Top 25 avg is 16500"
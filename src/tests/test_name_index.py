@@ -0,0 +1,22 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.name_index import NameIndex
+
+
+def test_suggests_close_names():
+    index = NameIndex(["beterbabbit", "jeef", "lii", "beterbunny"])
+
+    assert "Jeef" in index
+    assert index.suggest("beterbabit")[0] == "beterbabbit"
+    assert index.suggest("beterbabit", limit=1) == ["beterbabbit"]
+    assert index.suggest("zzzzzz") == []
+
+
+def test_add_is_incremental():
+    index = NameIndex(["lii"])
+    index.add(["LII", "jeef"])
+
+    assert len(index) == 2
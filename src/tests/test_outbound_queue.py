@@ -0,0 +1,95 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.outbound_queue import (
+    ANNOUNCEMENT,
+    ANNOUNCEMENT_RESERVE,
+    MAX_AGE,
+    REPLY,
+    OutboundQueue,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeChannel:
+    def __init__(self, name):
+        self.name = name
+        self.sent = []
+
+    async def send(self, text):
+        self.sent.append(text)
+
+
+def test_replies_go_before_announcements():
+    queue = OutboundQueue(FakeClock())
+    channel = FakeChannel("liihs")
+    queue.put(channel, "BGs update: patch notes", ANNOUNCEMENT)
+    queue.put(channel, "lii is rank 1", REPLY)
+
+    message, _ = queue._next_ready()
+    assert message.text == "lii is rank 1"
+
+
+def test_channel_bucket_spaces_messages():
+    clock = FakeClock()
+    queue = OutboundQueue(clock)
+    channel = FakeChannel("liihs")
+    queue.put(channel, "first")
+    queue._channel_bucket("liihs").take()
+
+    message, wait = queue._next_ready()
+    assert message is None and wait > 0
+    clock.now += wait
+    message, _ = queue._next_ready()
+    assert message.text == "first"
+
+
+def test_announcements_leave_tokens_for_replies():
+    queue = OutboundQueue(FakeClock())
+    queue.connection_bucket.tokens = ANNOUNCEMENT_RESERVE
+    queue.put(FakeChannel("a"), "news", ANNOUNCEMENT)
+
+    message, wait = queue._next_ready()
+    assert message is None and wait > 0
+    queue.put(FakeChannel("b"), "reply")
+    message, _ = queue._next_ready()
+    assert message.text == "reply"
+
+
+def test_stale_replies_are_dropped_and_counted():
+    clock = FakeClock()
+    queue = OutboundQueue(clock)
+    queue.put(FakeChannel("liihs"), "too late")
+    clock.now += MAX_AGE[REPLY] + 1
+    queue._drop_stale()
+
+    assert queue.depth()[REPLY] == 0
+    assert queue.dropped == 1
+
+
+def test_backlog_is_coalesced_into_one_message():
+    async def scenario():
+        queue = OutboundQueue()
+        channel = FakeChannel("liihs")
+        for text in ["a is rank 1", "b is rank 2", "a is rank 1", "c is rank 3"]:
+            queue.put(channel, text)
+        queue.start()
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return queue, channel
+
+    queue, channel = asyncio.run(scenario())
+    assert channel.sent == ["a is rank 1 | b is rank 2 | c is rank 3"]
+    stats = queue.stats()
+    assert stats["sent"] == 1 and stats["coalesced"] == 3
+    assert stats["depth"] == {REPLY: 0, ANNOUNCEMENT: 0}
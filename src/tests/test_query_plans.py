@@ -0,0 +1,320 @@
+"""
+Plan regression tests for the SQL behind every LeaderboardDB command and the
+snapshot ingest.
+
+These need a disposable Postgres database, given by TEST_DATABASE_URL (e.g.
+postgresql://postgres@localhost/wallii_test), and are skipped without one.
+The schema migrations are applied, a small season is seeded, and the
+statements each command runs are captured and EXPLAINed with sequential
+scans disabled. A Seq Scan left in a plan, or an index scan that doesn't
+constrain the index's leading column, means no index fits the query.
+"""
+
+import sys
+import os
+import re
+import json
+import functools
+from datetime import datetime, timezone
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../src"))
+)
+sys.path.append(
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), "../../lambda-functions/leaderboard_snapshots"
+        )
+    )
+)
+
+import pytest
+import psycopg2
+import psycopg2.extensions
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set"
+)
+
+from leaderboard import LeaderboardDB
+from utils.name_index import NameIndex
+import schema
+
+# Tables that must never be read with a sequential scan (partitions included)
+GUARDED_TABLES = (
+    "leaderboard_snapshots",
+    "daily_leaderboard_stats",
+    "players",
+    "current_leaderboard",
+    "milestone_tracking",
+    "rating_rollup",
+    "current_ranks",
+    "region_stats",
+)
+
+SEED_SQL = """
+TRUNCATE players, leaderboard_snapshots, daily_leaderboard_stats,
+         current_leaderboard, milestone_tracking, region_stats RESTART IDENTITY CASCADE;
+
+-- 800 players spread over every region/mode
+INSERT INTO players (player_name)
+SELECT 'player' || g FROM generate_series(1, 800) g;
+
+CREATE TEMP TABLE seed_ladder ON COMMIT DROP AS
+SELECT player_id,
+       (ARRAY['NA', 'EU', 'AP', 'CN'])[player_id % 4 + 1]::region_enum AS region,
+       ((player_id / 4) % 2)::text::game_mode_enum AS game_mode,
+       9000 - player_id AS base_rating
+FROM players;
+
+-- Two weeks of daily stats, ranked per region/mode/day
+INSERT INTO daily_leaderboard_stats
+  (player_id, game_mode, region, day_start, rating, rank, games_played, weekly_games_played)
+SELECT s.player_id, s.game_mode, s.region, d::date,
+       s.base_rating + (extract(doy FROM d)::int % 7) * 10,
+       row_number() OVER (PARTITION BY s.region, s.game_mode, d ORDER BY s.base_rating DESC),
+       5, 20
+FROM seed_ladder s
+CROSS JOIN generate_series(current_date - 14, current_date + 1, interval '1 day') d;
+
+-- A change point every two hours
+INSERT INTO leaderboard_snapshots (player_id, game_mode, region, rating, snapshot_time)
+SELECT s.player_id, s.game_mode, s.region,
+       s.base_rating + (extract(epoch FROM t)::bigint / 7200 % 9)::int * 15, t
+FROM seed_ladder s
+CROSS JOIN generate_series(now() - interval '14 days', now(), interval '2 hours') t;
+
+-- A player with no games since last week, for the day/week fallback
+INSERT INTO players (player_name) VALUES ('dormant');
+INSERT INTO leaderboard_snapshots (player_id, game_mode, region, rating, snapshot_time)
+SELECT player_id, '0', 'NA', 8500, now() - interval '20 days' FROM players
+WHERE player_name = 'dormant';
+
+-- Current leaderboard deep enough for rank lookups past the stats limit
+INSERT INTO current_leaderboard (player_name, game_mode, region, rank, rating)
+SELECT 'ladder' || r || '_' || g || '_' || rank, g, r, rank, 9000 - rank
+FROM unnest(ARRAY['NA', 'EU', 'AP', 'CN']) r,
+     unnest(ARRAY['0', '1']) g,
+     generate_series(1, 1200) rank;
+
+-- Aggregates published with it
+INSERT INTO region_stats
+  (region, game_mode, player_count, top25_avg, top100_avg, p50_rating, p90_rating,
+   p99_rating, max_rating)
+SELECT r, g, 1200, 8987, 8949.5, 8400, 8880, 8988, 8999
+FROM unnest(ARRAY['NA', 'EU', 'AP', 'CN']) r,
+     unnest(ARRAY['0', '1']) g;
+
+-- Today's ranks
+INSERT INTO current_ranks (region, game_mode, rank, player_id, rating)
+SELECT region, game_mode, rank, player_id, rating
+FROM daily_leaderboard_stats
+WHERE day_start = current_date;
+
+-- Daily rollups over the same two weeks
+INSERT INTO rating_rollup_daily
+  (player_id, game_mode, region, day_start, open_rating, high_rating, low_rating,
+   close_rating, games, placement_sum)
+SELECT player_id, game_mode, region, day_start, rating - 20, rating + 10, rating - 30,
+       rating, games_played, games_played * 4.5
+FROM daily_leaderboard_stats;
+
+INSERT INTO milestone_tracking (season, game_mode, region, milestone, player_name, timestamp, rating)
+SELECT {season}, g::game_mode_enum, r::region_enum, m, 'player1', now(), m
+FROM unnest(ARRAY['NA', 'EU', 'AP', 'CN']) r,
+     unnest(ARRAY['0', '1']) g,
+     generate_series(8000, 9000, 1000) m;
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def recording_cursor(base):
+    """Subclass of a cursor class that records every statement it executes"""
+
+    class RecordingCursor(base):
+        def execute(self, query, vars=None):
+            self.connection.statements.append(self.mogrify(query, vars).decode())
+            return super().execute(query, vars)
+
+    return RecordingCursor
+
+
+class RecordingConnection(psycopg2.extensions.connection):
+    """Connection whose cursors record statements, whatever cursor_factory is used"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = []
+
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        base = cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(*args, cursor_factory=recording_cursor(base), **kwargs)
+
+
+class SingleConnectionPool:
+    """Stands in for LeaderboardDB's pool so every command uses one connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        pass
+
+
+@pytest.fixture(scope="module")
+def conn():
+    from config import SEASON
+
+    conn = psycopg2.connect(TEST_DATABASE_URL, connection_factory=RecordingConnection)
+    schema.migrate(conn)
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(SEED_SQL.format(season=SEASON))
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE")
+        # With seq scans priced out, one only survives when no index applies
+        cur.execute("SET enable_seqscan = off")
+    conn.autocommit = False
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def db(conn):
+    """LeaderboardDB wired to the test database, without aliases or patch link"""
+    db = LeaderboardDB.__new__(LeaderboardDB)
+    db.aliases = {}
+    db.player_names = NameIndex()
+    db._connection_pool = SingleConnectionPool(conn)
+    conn.statements.clear()
+    yield db
+    conn.rollback()
+
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+
+def index_leading_column(cur, index_name):
+    """Leading column of an index, or None when its table is empty"""
+    cur.execute(
+        """
+        SELECT a.attname, t.reltuples
+        FROM pg_class i
+        JOIN pg_index x ON x.indexrelid = i.oid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = x.indkey[0]
+        WHERE i.relname = %s
+        """,
+        (index_name,),
+    )
+    column, rows = cur.fetchone()
+    return column if rows > 0 else None
+
+
+def unbounded_scans(cur, plan):
+    """
+    Reads of guarded tables in an EXPLAIN JSON plan that aren't narrowed by an
+    index: Seq Scans, and index scans whose condition skips the leading column
+    (a full walk of the index). Empty partitions are ignored, since any plan
+    is as good as another for them.
+    """
+    found = []
+    node = plan.get("Node Type")
+    relation = plan.get("Relation Name") or ""
+    index = plan.get("Index Name") or ""
+    if node == "Seq Scan" and relation.startswith(GUARDED_TABLES):
+        found.append(f"Seq Scan on {relation}")
+    elif node in INDEX_SCANS and index.startswith(GUARDED_TABLES):
+        column = index_leading_column(cur, index)
+        if column and not re.search(rf"\b{column}\b", plan.get("Index Cond", "")):
+            found.append(f"{node} on {index} without a condition on {column}")
+    for child in plan.get("Plans", []):
+        found.extend(unbounded_scans(cur, child))
+    return found
+
+
+def assert_indexed(conn, statements):
+    """EXPLAIN each captured query and fail on any unbounded read of a guarded table"""
+    assert statements, "command ran no SQL"
+    failures = []
+    with psycopg2.extensions.cursor(conn) as cur:
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT")):
+                continue
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql)
+            plan = cur.fetchone()[0][0]["Plan"]
+            scans = unbounded_scans(cur, plan)
+            if scans:
+                failures.append(f"{scans} in:\n{sql}\n{json.dumps(plan, indent=1)}")
+    assert not failures, "\n\n".join(failures)
+
+
+COMMANDS = {
+    "top10_global": lambda db: db.top10(),
+    "top10_region": lambda db: db.top10("NA"),
+    "top10_duos": lambda db: db.top10("EU", "1"),
+    "rank_player": lambda db: db.rank("player8"),
+    "rank_player_region": lambda db: db.rank("player8", "NA"),
+    "rank_number": lambda db: db.rank("3"),
+    "rank_number_region": lambda db: db.rank("3", "NA"),
+    "rank_past_stats_limit": lambda db: db.rank("1100", "NA"),
+    "rank_unknown_player": lambda db: db.rank("nobody"),
+    "peak_player": lambda db: db.peak("player8"),
+    "peak_rank": lambda db: db.peak("2", "NA"),
+    "day_player": lambda db: db.day("player8"),
+    "day_player_yesterday": lambda db: db.day("player8", offset=1),
+    "day_rank": lambda db: db.day("1", "NA"),
+    "day_no_games": lambda db: db.day("dormant"),
+    "week_player": lambda db: db.week("player8"),
+    "week_rank_last_week": lambda db: db.week("1", "NA", offset=1),
+    "week_no_games": lambda db: db.week("dormant"),
+    "month_player": lambda db: db.month("player8"),
+    "month_rank_last_month": lambda db: db.month("1", "NA", offset=1),
+    "season_player": lambda db: db.season("player8", "NA"),
+    "season_rank": lambda db: db.season("2"),
+    "milestone": lambda db: db.milestone("8000"),
+    "milestone_region": lambda db: db.milestone("9k", "NA"),
+    "region_stats": lambda db: db.region_stats(),
+    "region_stats_region": lambda db: db.region_stats("NA"),
+}
+
+
+@pytest.mark.parametrize("command", COMMANDS.keys())
+def test_command_plans_use_indexes(db, conn, command):
+    result = COMMANDS[command](db)
+    assert not result.startswith("Error"), result
+    assert_indexed(conn, list(conn.statements))
+
+
+def test_ingest_plans_use_indexes(conn):
+    import lambda_function as ingest
+
+    conn.statements.clear()
+    now = datetime.now(timezone.utc).isoformat()
+    players = [
+        {
+            "player_name": f"player{i}",
+            "game_mode": (i // 4) % 2,
+            "region": ["NA", "EU", "AP", "CN"][i % 4],
+            "rank": i,
+            "rating": 9100 - i,
+            "snapshot_time": now,
+        }
+        for i in range(1, 200)
+    ]
+    try:
+        with conn.cursor() as cur:
+            ingest.create_staging_tables(cur)
+            id_by_name = ingest.stage_ladder(cur, players)
+            ingest.apply_staged_ladders(cur, players, id_by_name)
+        # Staging tables only live until the transaction ends
+        assert_indexed(conn, list(conn.statements))
+    finally:
+        conn.rollback()
+        ingest.MILESTONES.invalidate()
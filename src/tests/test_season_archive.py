@@ -0,0 +1,137 @@
+import sys
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../scripts"))
+)
+
+import pyarrow.parquet as pq
+
+import handle_season_transition
+from utils.season_archive import SeasonArchive, archive_path, open_archive
+from handle_season_transition import clear_hot_tables, export_table
+
+
+def at(day, hour=0):
+    return datetime(2025, 3, day, hour, tzinfo=timezone.utc)
+
+
+# (player_name, region, game_mode, rating, snapshot_time), in export order
+SEASON_16 = [
+    ("beterbabbit", "EU", "0", 12000, at(1)),
+    ("lii", "EU", "0", 9000, at(1)),
+    ("lii", "EU", "0", 9900, at(2)),
+    ("lii", "NA", "0", 11000, at(1)),
+    ("lii", "NA", "0", 12500, at(2)),
+    ("lii", "NA", "0", 12500, at(3)),  # Tie: the earlier time is the peak
+    ("lii", "NA", "0", 12100, at(4)),
+    ("lii", "NA", "1", 14000, at(2)),
+]
+SEASON_15 = [("lii", "NA", "0", 16000, at(5))]
+
+
+class FakeCursor:
+    """A server-side cursor over already sorted export rows"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        assert "ORDER BY player_name, region, game_mode, snapshot_time" in sql
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, name=None):
+        return FakeCursor(self.rows)
+
+
+def write_season(root, season, rows):
+    filesystem, base = open_archive(root)
+    path = archive_path(base, season, "leaderboard_snapshots")
+    filesystem.create_dir(path.rsplit("/", 1)[0])
+    written = export_table(FakeConn(rows), "leaderboard_snapshots", filesystem, path)
+    return written, path
+
+
+def test_export_then_peak_round_trip(tmp_path, monkeypatch):
+    # Several row groups, so the filter has groups to skip
+    monkeypatch.setattr(handle_season_transition, "ARCHIVE_ROW_GROUP_SIZE", 3)
+    root = str(tmp_path)
+    written, path = write_season(root, 16, SEASON_16)
+    assert written == len(SEASON_16)
+    assert pq.ParquetFile(path).metadata.num_rows == len(SEASON_16)
+    write_season(root, 15, SEASON_15)
+
+    archive = SeasonArchive(root)
+    assert archive.has_season(16) and not archive.has_season(14)
+
+    peaks = archive.peak("lii", 16)
+    assert [(p["region"], p["rating"], p["snapshot_time"]) for p in peaks] == [
+        ("NA", 12500, at(2)),
+        ("EU", 9900, at(2)),
+    ]
+    # The region, mode and season filters each exclude the other rows
+    assert [p["region"] for p in archive.peak("lii", 16, region="EU")] == ["EU"]
+    assert archive.peak("lii", 16, region="AP") == []
+    assert [p["rating"] for p in archive.peak("lii", 16, game_mode="1")] == [14000]
+    assert [p["rating"] for p in archive.peak("lii", 15)] == [16000]
+    assert archive.peak("nobody", 16) == []
+
+
+class CountingConn:
+    """Answers COUNT(*) with the table's current size and records statements"""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.statements = []
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.statements.append(sql)
+        if sql.startswith("SELECT COUNT(*) FROM "):
+            self.row = (self.counts[sql.rsplit(" ", 1)[1]],)
+
+    def fetchone(self):
+        return self.row
+
+
+def test_hot_tables_are_only_cleared_when_the_counts_match(tmp_path):
+    written, _ = write_season(str(tmp_path), 16, SEASON_16)
+
+    conn = CountingConn({"leaderboard_snapshots": written + 1})
+    with pytest.raises(RuntimeError, match="stop the ingest"):
+        clear_hot_tables(conn, {"leaderboard_snapshots": written})
+    assert not any(sql.startswith("TRUNCATE") for sql in conn.statements)
+
+    conn = CountingConn({"leaderboard_snapshots": written})
+    clear_hot_tables(conn, {"leaderboard_snapshots": written})
+    assert conn.statements[-1].startswith("TRUNCATE leaderboard_snapshots")
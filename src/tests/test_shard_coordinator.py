@@ -0,0 +1,188 @@
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from managers.shard_coordinator import ShardCoordinator
+from utils.hash_ring import HashRing
+from utils.shared_results import SharedResultCache
+
+CHANNELS = [f"channel{i}" for i in range(2000)]
+
+
+class FakeShardConn:
+    closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeStore:
+    def __init__(self):
+        self.shards = set()
+        self.fail = False
+        self.pruned = 0
+        self.connections = []
+
+    def connect(self):
+        self.connections.append(FakeShardConn())
+        return self.connections[-1]
+
+    def heartbeat_shard(self, conn, shard_id, channels):
+        assert not conn.closed
+        if self.fail:
+            raise ConnectionError("database is down")
+        self.shards.add(shard_id)
+
+    def get_live_shards(self, conn, ttl):
+        return set(self.shards)
+
+    def remove_shard(self, conn, shard_id):
+        self.shards.discard(shard_id)
+
+    def prune_shards(self, conn, ttl):
+        self.pruned += 1
+
+
+def test_ring_spreads_channels_and_moves_few_on_a_change():
+    ring = HashRing(["0", "1", "2"])
+    owners = {c: ring.owner(c) for c in CHANNELS}
+    counts = [list(owners.values()).count(shard) for shard in "012"]
+    assert min(counts) > len(CHANNELS) / 3 * 0.7
+
+    # Only the departed shard's channels move
+    smaller = HashRing(["0", "1"])
+    moved = [c for c in CHANNELS if smaller.owner(c) != owners[c]]
+    assert all(owners[c] == "2" for c in moved)
+
+    with pytest.raises(ValueError):
+        HashRing([])
+
+
+def test_shards_split_channels_and_rebalance_when_one_dies():
+    store = FakeStore()
+    shards = [ShardCoordinator(str(i), store) for i in range(3)]
+    for shard in shards:
+        shard.heartbeat()
+    for shard in shards:
+        shard.heartbeat()
+    assigned = [shard.assign(CHANNELS) for shard in shards]
+    assert set().union(*assigned) == set(CHANNELS)
+    assert sum(len(a) for a in assigned) == len(CHANNELS)
+    assert all(shard.owns(c) for shard, a in zip(shards, assigned) for c in a)
+
+    store.remove_shard(None, "2")
+    assert shards[0].heartbeat() and shards[1].heartbeat()
+    after = [shard.assign(CHANNELS) for shard in shards[:2]]
+    assert after[0] | after[1] == set(CHANNELS)
+    # Survivors keep what they had and split the dead shard's channels
+    assert assigned[0] <= after[0] and assigned[1] <= after[1]
+    # Only the lowest live shard prunes
+    assert store.pruned == 3
+
+
+def test_database_errors_keep_the_last_ring():
+    store = FakeStore()
+    store.shards = {"0", "1"}
+    shard = ShardCoordinator("0", store)
+    assert shard.heartbeat()
+    owned = shard.assign(CHANNELS)
+    store.fail = True
+    assert not shard.heartbeat()
+    assert shard.assign(CHANNELS) == owned
+    assert shard.status()["heartbeat_failures"] == 1
+
+
+def test_heartbeats_hold_one_connection():
+    store = FakeStore()
+    shard = ShardCoordinator("0", store)
+    shard.heartbeat()
+    shard.heartbeat()
+    assert len(store.connections) == 1
+
+    # A failed heartbeat closes the connection and the next one reconnects
+    store.fail = True
+    shard.heartbeat()
+    assert store.connections[0].closed
+    store.fail = False
+    shard.heartbeat()
+    assert len(store.connections) == 2
+
+    shard.leave()
+    assert store.shards == set() and store.connections[1].closed
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        if self.db.down:
+            raise ConnectionError("database is down")
+        if sql.strip().startswith("SELECT"):
+            result = self.db.results.get(params[0])
+            self.row = (result,) if result is not None else None
+        else:
+            self.db.results[params[0]] = params[1]
+
+    def fetchone(self):
+        return self.row
+
+
+class FakeDB:
+    """Stands in for two shards' LeaderboardDB over one command_results table"""
+
+    def __init__(self):
+        self.results = {}
+        self.down = False
+        self._connection_pool = self
+
+    def _get_connection(self):
+        return self
+
+    def putconn(self, conn):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_shards_share_results():
+    db = FakeDB()
+    calls = []
+
+    def rank(player, region=None, game_mode="0"):
+        calls.append(player)
+        return f"{player} is rank 1 in NA"
+
+    first, second = SharedResultCache(db), SharedResultCache(db)
+    assert first.get_or_run("rank", rank, "Lii", None, "0") == "Lii is rank 1 in NA"
+    # Another shard asking the same thing, typed differently, reads it back
+    result = second.get_or_run("rank", rank, "LII ", None, "0")
+    assert result == "Lii is rank 1 in NA"
+    assert calls == ["Lii"]
+    assert second.stats()["hits"] == 1
+
+    # Errors aren't shared, and a broken cache falls back to the query
+    assert first.get_or_run("day", lambda p: "Error fetching day stats", "x") == (
+        "Error fetching day stats"
+    )
+    assert len(db.results) == 1
+    db.down = True
+    assert second.get_or_run("rank", rank, "jeef") == "jeef is rank 1 in NA"
+    assert second.stats()["errors"] == 2
@@ -6,18 +6,29 @@ import psycopg2
 import sys
 import os
 import asyncio
+import functools
 import time
 from twitchio.ext import commands
 from leaderboard import LeaderboardDB
 from managers.channel_manager import ChannelManager
+from managers.channel_reconciler import ChannelReconciler
+from managers.shard_coordinator import ShardCoordinator
 from utils.buddy import (
     get_buddy_text,
     get_trinket_text,
     get_buddy_gold_tier_message,
-    update_buddy_dict_and_trinket_dict,
+    get_hero_text,
+    get_minion_text,
+    get_spell_text,
+    refresh_catalog_forever,
 )
 from utils.aws_dynamodb import DynamoDBClient
 from utils.regions import is_server
+from utils.season_archive import parse_season_arg
+from utils.outbound_queue import OutboundQueue, ANNOUNCEMENT
+from utils.command_executor import CommandExecutor, CommandRejected
+from utils.command_cache import CommandCache
+from utils.shared_results import SharedResultCache
 from utils.supabase_channels import (
     add_channel,
     delete_channel,
@@ -25,9 +36,16 @@ from utils.supabase_channels import (
     update_youtube,
 )
 
+LIVE_POLL_SECONDS = 15
+# Set to run as one of several shards, e.g. SHARD_ID=0 .. SHARD_ID=2
+SHARD_ID = os.environ.get("SHARD_ID")
+
 
 class TwitchBot(commands.Bot):
     async def event_message(self, message):
+        if self.coordinator and not self.coordinator.owns(message.channel.name):
+            # Rebalanced to another shard, which answers here from now on
+            return
         await self.handle_commands(message)
 
         if message.channel.name == "dogdog" and not message.content.lower().startswith(
@@ -38,7 +56,7 @@ class TwitchBot(commands.Bot):
                 now = time.time()
                 last_trigger = self.last_patch_trigger.get(message.channel.name, 0)
                 if now - last_trigger >= 30:
-                    await message.channel.send(self.db.patch_link)
+                    self.outbound.put(message.channel, self.db.patch_link)
                     self.last_patch_trigger[message.channel.name] = now
 
     priority_channels = (
@@ -59,19 +77,37 @@ class TwitchBot(commands.Bot):
     )  # These channels are always joined
 
     def __init__(self):
+        always = set(self.priority_channels)
+        self.coordinator = None
+        if SHARD_ID:
+            # Join the ring first so the shard starts with its own channels
+            self.coordinator = ShardCoordinator(SHARD_ID)
+            self.coordinator.heartbeat()
+            always = self.coordinator.assign(always)
         # Initialize the bot with the necessary credentials
         super().__init__(
             token=os.environ["TMI_TOKEN"],
             prefix=os.environ.get("BOT_PREFIX", "!"),
-            initial_channels=list(self.priority_channels),
+            initial_channels=list(always),
         )
         self.channel_manager = ChannelManager(self.priority_channels)
         self.db = LeaderboardDB()
+        # Every message the bot sends goes through the rate-limited queue
+        self.outbound = OutboundQueue()
+        # LeaderboardDB commands block, so they run on a bounded set of threads
+        self.executor = CommandExecutor()
+        # Repeats of a command a channel was just answered are dropped
+        self.recent_commands = CommandCache()
+        # Shards answer repeated questions from each other's results
+        self.shared_results = SharedResultCache(self.db) if self.coordinator else None
         self.bg_task = None
         self.dynamo_client = DynamoDBClient()
 
-        # Track joined channels to avoid duplicate join/leave attempts
-        self.currently_joined = set(self.priority_channels)
+        # Joins and parts channels as the live set changes
+        self.reconciler = ChannelReconciler(
+            self.join_channels, self.part_channels, always=always
+        )
+        self.reconcile_task = None
         self.last_patch_trigger = {}
         # Global dictionary to track posted news: {created_at: {"title": ..., "slug": ..., "first_post_time": datetime, "last_sent": {channel: datetime}}}
         self.posted_news = {}
@@ -82,10 +118,15 @@ class TwitchBot(commands.Bot):
             f"Logged in as | {self.nick} at {datetime.datetime.now().isoformat()}"
         )
         logger.info(f"Initial channel list: {self.channel_manager.all_channels}")
+        self.outbound.start()
         # Start the background task to check live channels
         self.bg_task = asyncio.create_task(self.channel_check_loop())
         # Start the news announcer background task
         self.news_task = asyncio.create_task(self.news_announcer())
+        # Keep the buddy and trinket data current
+        self.catalog_task = asyncio.create_task(refresh_catalog_forever())
+        if self.coordinator:
+            self.shard_task = asyncio.create_task(self.coordinator.run())
 
     async def channel_check_loop(self):
         """Background task to periodically check for live channels"""
@@ -93,81 +134,52 @@ class TwitchBot(commands.Bot):
             logger.info("Running in test mode — skipping channel check loop.")
             return
 
+        self.reconcile_task = asyncio.create_task(self.reconciler.run())
         while True:
             logger.info(
                 f"channel_check_loop iteration start at {datetime.datetime.now().isoformat()}"
             )
-            # Refresh the currently_joined set from Twitch's actual connection state
-            actual_connected = {
+            # Correct for any JOIN or PART confirmation we missed
+            self.reconciler.sync(
                 ch.name for ch in getattr(self, "connected_channels", [])
-            }
-            logger.debug(f"Fetched connected_channels from library: {actual_connected}")
-            self.currently_joined = set(actual_connected)
+            )
             try:
                 # Get live channels from the channel manager
                 live_channels = await self.channel_manager.get_live_channels()
-
-                # Combine with priority channels
-                channels_to_join = live_channels.union(self.priority_channels)
-
-                # Determine which channels to join and leave
-                to_join = channels_to_join - self.currently_joined
-                to_leave = self.currently_joined - channels_to_join
-
-                # Join new channels
-                if to_join:
-                    logger.info(
-                        f"Attempting to join {len(to_join)} channels: {', '.join(to_join)}"
+                if self.coordinator:
+                    # Only this shard's share, priority channels included
+                    owned = self.coordinator.assign(
+                        live_channels | self.priority_channels
                     )
-                    for channel in to_join:
-                        try:
-                            # Join channels one by one to better handle errors
-                            await self.join_channels([channel])
-                            # self.currently_joined.add(channel)  # Now handled by refresh at top of loop
-                            # Small delay to avoid rate limits
-                            await asyncio.sleep(0.5)
-                        except Exception as e:
-                            logger.error(f"Error joining {channel}: {e}")
-                    # Debug/log: Currently joined after join
-                    logger.debug(
-                        f"Currently joined after join: {self.currently_joined}"
+                    self.reconciler.set_target(
+                        owned, always=owned & self.priority_channels
                     )
-                    # Verify actual Twitch connection state against internal state
-                    actual_connected = {
-                        ch.name for ch in getattr(self, "connected_channels", [])
-                    }
-                    missing_joins = to_join - actual_connected
-                    if missing_joins:
-                        logger.warning(
-                            f"Channels reported joined but not in Twitch connection list: {', '.join(missing_joins)}"
-                        )
-
-                # Leave channels that are no longer live (except priority channels)
-                if to_leave:
-                    to_leave_non_priority = to_leave - self.priority_channels
-                    if to_leave_non_priority:
-                        logger.info(
-                            f"Leaving {len(to_leave_non_priority)} channels: {', '.join(to_leave_non_priority)}"
-                        )
-                        for channel in to_leave_non_priority:
-                            try:
-                                await self.part_channels([channel])
-                                # self.currently_joined.remove(channel)  # Now handled by refresh at top of loop
-                                logger.info(f"Left channel: {channel}")
-                                # Small delay to avoid rate limits
-                                await asyncio.sleep(0.5)
-                            except Exception as e:
-                                logger.error(f"Error leaving {channel}: {e}")
-
+                else:
+                    # Priority channels are always part of the target
+                    self.reconciler.set_target(live_channels)
             except Exception as e:
                 logger.exception("Error in channel check loop")
-
-            # Check every minute
-            await asyncio.sleep(60)
+            logger.info(f"Channel reconciler: {self.reconciler.status()}")
+
+            # twitch_live_check updates the live flags every minute; reading
+            # them is one indexed query, so poll often to pick changes up fast
+            if not self.coordinator:
+                await asyncio.sleep(LIVE_POLL_SECONDS)
+                continue
+            logger.info(f"Shard: {self.coordinator.status()}")
+            # A rebalance re-targets at once rather than on the next poll
+            try:
+                await asyncio.wait_for(
+                    self.coordinator.changed.wait(), timeout=LIVE_POLL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+            self.coordinator.changed.clear()
 
     async def event_join(self, channel, user):
         """Log when the bot has successfully joined a channel."""
         if user.name.lower() == self.nick.lower():
+            self.reconciler.confirm_join(channel.name)
             logger.info(
                 f"Confirmed bot joined channel: {channel.name} at {datetime.datetime.now().isoformat()}"
             )
@@ -175,6 +187,7 @@ class TwitchBot(commands.Bot):
     async def event_part(self, channel, user):
         """Log when the bot has successfully left a channel."""
         if user.name.lower() == self.nick.lower():
+            self.reconciler.confirm_part(channel.name)
             logger.info(
                 f"Confirmed bot left channel: {channel.name} at {datetime.datetime.now().isoformat()}"
             )
@@ -266,9 +279,6 @@ class TwitchBot(commands.Bot):
                     # Prepare per-post messages and send to live hearthstone channels every 2h until 24h elapse
                     # Build the message once per post
                     for k, post in self.posted_news.items():
-                        # Check for new buddies and trinkets:
-                        update_buddy_dict_and_trinket_dict()
-
                         first_post = post["first_post_time"]
                         # Skip if more than 24h since first post
                         if (now - first_post).total_seconds() > 24 * 3600:
@@ -291,11 +301,8 @@ class TwitchBot(commands.Bot):
                                     None,
                                 )
                                 if ch_obj:
-                                    try:
-                                        await ch_obj.send(msg)
-                                        post["last_sent"][channel] = now
-                                    except Exception as e:
-                                        print(f"Error sending news to {channel}: {e}")
+                                    self.outbound.put(ch_obj, msg, ANNOUNCEMENT)
+                                    post["last_sent"][channel] = now
             except Exception as exc:
                 print(f"Error in news_announcer: {exc}")
             finally:
@@ -320,6 +327,37 @@ class TwitchBot(commands.Bot):
 
         return cleaned
 
+    def first_ask(self, ctx, command, *args, **kwargs):
+        """
+        The cache key if this command should be answered, or None if the
+        channel was just answered the same thing
+        """
+        key = self.recent_commands.key(ctx.channel.name, command, *args, **kwargs)
+        return key if self.recent_commands.claim(key) else None
+
+    async def answer(self, ctx, method, *args, **kwargs):
+        """Run a LeaderboardDB method on the command executor and reply"""
+        command = method.__name__
+        key = self.first_ask(ctx, command, *args, **kwargs)
+        if key is None:
+            return
+        if self.shared_results:
+            method = functools.partial(self.shared_results.get_or_run, command, method)
+        try:
+            response = await self.executor.run(command, method, *args, **kwargs)
+        except CommandRejected as e:
+            # Not an answer; let the next ask try again
+            self.recent_commands.release(key)
+            response = str(e)
+        except Exception:
+            self.recent_commands.release(key)
+            raise
+        self.reply(ctx, response)
+
+    def reply(self, ctx, text):
+        """Queue a command reply; replies go out ahead of announcements"""
+        self.outbound.put(ctx.channel, text)
+
     def get_command_name(self, ctx):
         return ctx.message.content.split()[0].lstrip("!")
 
@@ -336,10 +374,9 @@ class TwitchBot(commands.Bot):
         """Get player rank, defaulting to channel name if no player specified"""
         arg1, arg2 = self.process_args(arg1, arg2, ctx.channel.name)
         game_mode = "1" if self.get_command_name(ctx) == "duorank" else "0"
-        response = self.db.rank(
-            self.clean_input(arg1), self.clean_input(arg2), game_mode
+        await self.answer(
+            ctx, self.db.rank, self.clean_input(arg1), self.clean_input(arg2), game_mode
         )
-        await ctx.send(response)
 
     @commands.command(name="day", aliases=["bgdaily", "daily", "duoday", "duodaily"])
     async def day_command(self, ctx, arg1=None, arg2=None):
@@ -351,10 +388,9 @@ class TwitchBot(commands.Bot):
             or self.get_command_name(ctx) == "duoday"
             else "0"
         )
-        response = self.db.day(
-            self.clean_input(arg1), self.clean_input(arg2), game_mode
+        await self.answer(
+            ctx, self.db.day, self.clean_input(arg1), self.clean_input(arg2), game_mode
         )
-        await ctx.send(response)
 
     @commands.command(
         name="yesterday", aliases=["bgyesterday", "duoyesterday", "yday", "duoyday"]
@@ -368,20 +404,26 @@ class TwitchBot(commands.Bot):
             or self.get_command_name(ctx) == "duoyday"
             else "0"
         )
-        response = self.db.day(
-            self.clean_input(arg1), self.clean_input(arg2), game_mode, offset=1
+        await self.answer(
+            ctx,
+            self.db.day,
+            self.clean_input(arg1),
+            self.clean_input(arg2),
+            game_mode,
+            offset=1,
         )
-        await ctx.send(response)
 
     @commands.command(name="peak", aliases=["duopeak"])
     async def peak_command(self, ctx, arg1=None, arg2=None):
-        """Get player's peak rating this season"""
+        """Get player's peak rating this season, or a past one with s<number>"""
+        if parse_season_arg(arg1) is not None and not arg2:
+            # "!peak s16" is the channel's own peak in that season
+            arg1, arg2 = ctx.channel.name, arg1
         arg1, arg2 = self.process_args(arg1, arg2, ctx.channel.name)
         game_mode = "1" if self.get_command_name(ctx) == "duopeak" else "0"
-        response = self.db.peak(
-            self.clean_input(arg1), self.clean_input(arg2), game_mode
+        await self.answer(
+            ctx, self.db.peak, self.clean_input(arg1), self.clean_input(arg2), game_mode
         )
-        await ctx.send(response)
 
     @commands.command(
         name="week", aliases=["bgweek", "bgweekly", "duoweek", "duoweekly"]
@@ -395,10 +437,9 @@ class TwitchBot(commands.Bot):
             or self.get_command_name(ctx) == "duoweekly"
             else "0"
         )
-        response = self.db.week(
-            self.clean_input(arg1), self.clean_input(arg2), game_mode
+        await self.answer(
+            ctx, self.db.week, self.clean_input(arg1), self.clean_input(arg2), game_mode
         )
-        await ctx.send(response)
 
     @commands.command(
         name="lastweek", aliases=["bglastweek", "duolastweek", "lweek", "duolweek"]
@@ -412,44 +453,90 @@ class TwitchBot(commands.Bot):
             or self.get_command_name(ctx) == "duolweek"
             else "0"
         )
-        response = self.db.week(
-            self.clean_input(arg1), self.clean_input(arg2), game_mode, offset=1
+        await self.answer(
+            ctx,
+            self.db.week,
+            self.clean_input(arg1),
+            self.clean_input(arg2),
+            game_mode,
+            offset=1,
+        )
+
+    @commands.command(name="month", aliases=["bgmonth", "duomonth"])
+    async def month_command(self, ctx, arg1=None, arg2=None):
+        """Get player's progress this month"""
+        arg1, arg2 = self.process_args(arg1, arg2, ctx.channel.name)
+        game_mode = "1" if self.get_command_name(ctx) == "duomonth" else "0"
+        await self.answer(
+            ctx,
+            self.db.month,
+            self.clean_input(arg1),
+            self.clean_input(arg2),
+            game_mode,
+        )
+
+    @commands.command(name="lastmonth", aliases=["bglastmonth", "duolastmonth"])
+    async def lastmonth_command(self, ctx, arg1=None, arg2=None):
+        """Get player's progress last month"""
+        arg1, arg2 = self.process_args(arg1, arg2, ctx.channel.name)
+        game_mode = "1" if self.get_command_name(ctx) == "duolastmonth" else "0"
+        await self.answer(
+            ctx,
+            self.db.month,
+            self.clean_input(arg1),
+            self.clean_input(arg2),
+            game_mode,
+            offset=1,
+        )
+
+    @commands.command(name="season", aliases=["bgseason", "duoseason"])
+    async def season_command(self, ctx, arg1=None, arg2=None):
+        """Get player's progress this season"""
+        arg1, arg2 = self.process_args(arg1, arg2, ctx.channel.name)
+        game_mode = "1" if self.get_command_name(ctx) == "duoseason" else "0"
+        await self.answer(
+            ctx,
+            self.db.season,
+            self.clean_input(arg1),
+            self.clean_input(arg2),
+            game_mode,
         )
-        await ctx.send(response)
 
     @commands.command(name="top", aliases=["bgtop", "duotop"])
     async def top_command(self, ctx, region=None):
         """Get top 10 players for a region or globally"""
         game_mode = "1" if self.get_command_name(ctx) == "duotop" else "0"
-        response = self.db.top10(self.clean_input(region), game_mode)
-        await ctx.send(response)
+        await self.answer(ctx, self.db.top10, self.clean_input(region), game_mode)
 
     @commands.command(name="stats", aliases=["bgstats", "duostats"])
     async def stats_command(self, ctx, region=None, game_mode="0"):
         """Get region stats"""
         game_mode = "1" if self.get_command_name(ctx) == "duostats" else "0"
-        response = self.db.region_stats(self.clean_input(region), game_mode)
-        await ctx.send(response)
+        await self.answer(ctx, self.db.region_stats, self.clean_input(region), game_mode)
 
     @commands.command(name="milestone")
     async def milestone_command(self, ctx, milestone=None, region=None):
         """Get milestone information"""
         if not milestone:
-            await ctx.send("Please specify a milestone (e.g., !milestone 13k)")
+            self.reply(ctx, "Please specify a milestone (e.g., !milestone 13k)")
             return
-        response = self.db.milestone(
-            self.clean_input(milestone), self.clean_input(region)
+        await self.answer(
+            ctx,
+            self.db.milestone,
+            self.clean_input(milestone),
+            self.clean_input(region),
         )
-        await ctx.send(response)
 
     @commands.command(name="buddy")
     async def buddy(self, ctx):
         args = ctx.message.content.split(" ")
         if len(args) < 2:
             return
+        if not self.first_ask(ctx, "buddy", args[1]):
+            return
         result = get_buddy_text(args[1])
         if result:
-            await ctx.send(result[1])
+            self.reply(ctx, result[1])
 
     @commands.command(name="goldenbuddy")
     async def goldenbuddy(self, ctx):
@@ -458,33 +545,64 @@ class TwitchBot(commands.Bot):
         args = ctx.message.content.split(" ")
         if len(args) < 2:
             return
+        if not self.first_ask(ctx, "goldenbuddy", args[1]):
+            return
         result = get_buddy_text(args[1])
         if result:
-            await ctx.send(result[2])
+            self.reply(ctx, result[2])
 
     @commands.command(name="trinket")
     async def trinket(self, ctx):
         args = ctx.message.content.split(" ")
         if len(args) < 2:
             return
+        if not self.first_ask(ctx, "trinket", " ".join(args[1:])):
+            return
         result = get_trinket_text(" ".join(args[1:]))
         if result:
-            await ctx.send(result)
+            self.reply(ctx, result)
+
+    @commands.command(name="hero")
+    async def hero(self, ctx):
+        args = ctx.message.content.split(" ")
+        if len(args) < 2:
+            return
+        if not self.first_ask(ctx, "hero", " ".join(args[1:])):
+            return
+        self.reply(ctx, get_hero_text(" ".join(args[1:])))
+
+    @commands.command(name="minion")
+    async def minion(self, ctx):
+        args = ctx.message.content.split(" ")
+        if len(args) < 2:
+            return
+        if not self.first_ask(ctx, "minion", " ".join(args[1:])):
+            return
+        self.reply(ctx, get_minion_text(" ".join(args[1:])))
+
+    @commands.command(name="spell")
+    async def spell(self, ctx):
+        args = ctx.message.content.split(" ")
+        if len(args) < 2:
+            return
+        if not self.first_ask(ctx, "spell", " ".join(args[1:])):
+            return
+        self.reply(ctx, get_spell_text(" ".join(args[1:])))
 
     @commands.command(name="buddygold")
     async def buddygold(self, ctx):
         args = ctx.message.content.split(" ")
         if len(args) < 2:
-            await ctx.send("Add a tier between 1 and 6 like !buddygold 3")
+            self.reply(ctx, "Add a tier between 1 and 6 like !buddygold 3")
             return
         message = get_buddy_gold_tier_message(args[1])
-        await ctx.send(message)
+        self.reply(ctx, message)
 
     @commands.command(name="patch")
     async def patch_command(self, ctx):
         """Get the current patch link"""
         response = self.db.patch_link
-        await ctx.send(response)
+        self.reply(ctx, response)
 
     @commands.command(name="addpatch")
     async def addpatch_command(self, ctx, *args):
@@ -493,15 +611,16 @@ class TwitchBot(commands.Bot):
             return
 
         if not args:
-            await ctx.send("Usage: !addpatch <link>")
+            self.reply(ctx, "Usage: !addpatch <link>")
             return
 
         link = " ".join(args).strip()
         if self.db.set_override_patch_link(link):
-            await ctx.send(f"Override patch link set: {link}")
+            self.reply(ctx, f"Override patch link set: {link}")
         else:
-            await ctx.send(
-                "Failed: Current date must be greater than the most recent patch date."
+            self.reply(
+                ctx,
+                "Failed: Current date must be greater than the most recent patch date.",
             )
 
     @commands.command(name="addchannel")
@@ -513,7 +632,7 @@ class TwitchBot(commands.Bot):
         if not player_name:
             player_name = username
         response = add_channel(username, player_name)
-        await ctx.send(response)
+        self.reply(ctx, response)
 
     @commands.command(name="addname")
     async def addname_command(self, ctx, player_name=None):
@@ -522,13 +641,13 @@ class TwitchBot(commands.Bot):
             return
 
         if not player_name:
-            await ctx.send("Usage: !addname <player_name>")
+            self.reply(ctx, "Usage: !addname <player_name>")
             return
 
         username = ctx.author.name.lower()
         response = self.dynamo_client.add_alias(username, player_name)
         response = update_player(username, player_name)
-        await ctx.send(response)
+        self.reply(ctx, response)
 
     @commands.command(name="addyoutube")
     async def addyoutube_command(self, ctx, youtube_channel=None):
@@ -537,12 +656,12 @@ class TwitchBot(commands.Bot):
             return
 
         if not youtube_channel:
-            await ctx.send("Usage: !addyoutube <youtube_channel_name>")
+            self.reply(ctx, "Usage: !addyoutube <youtube_channel_name>")
             return
 
         username = ctx.author.name.lower()
         response = update_youtube(username, youtube_channel)
-        await ctx.send(response)
+        self.reply(ctx, response)
 
     @commands.command(name="deletechannel")
     async def deletechannel_command(self, ctx):
@@ -551,29 +670,35 @@ class TwitchBot(commands.Bot):
             return
         username = ctx.author.name.lower()
         response = delete_channel(username)
-        await ctx.send(response)
+        self.reply(ctx, response)
 
     @commands.command(name="help", aliases=["commands", "wall_lii"])
     async def help_command(self, ctx, command_name=None):
         """Display help info"""
-        await ctx.send(
-            "Use !rank, !day, !week, !top, !patch + more — day resets on 00:00 PST, week resets on Mon. More info: wallii.gg/help"
+        self.reply(
+            ctx,
+            "Use !rank, !day, !week, !top, !patch + more — day resets on 00:00 PST, week resets on Mon. More info: wallii.gg/help",
         )
 
     @commands.command(name="goodbot")
     async def goodbot(self, ctx):
         """Respond to praise with a robotic acknowledgment"""
-        await ctx.send("MrDestructoid Just doing my job MrDestructoid")
+        self.reply(ctx, "MrDestructoid Just doing my job MrDestructoid")
 
     @commands.command(name="bgdailii")
     async def bgdailii(self, ctx):
         """Respond to criticism with a robotic acknowledgment"""
-        await ctx.send(self.db.day("lii", None, "0"))
+        await self.answer(ctx, self.db.day, "lii", None, "0")
 
 
 def main():
     bot = TwitchBot()
-    bot.run()
+    try:
+        bot.run()
+    finally:
+        if bot.coordinator:
+            # Hand the channels to the other shards without waiting out the TTL
+            bot.coordinator.leave()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+from typing import Set
+
+from utils.db_utils import get_db_connection
+
+
+def connect():
+    """The connection a shard holds for its heartbeats; see ShardCoordinator"""
+    return get_db_connection()
+
+
+def heartbeat_shard(conn, shard_id: str, channels: int):
+    """Record that this shard is alive and how many channels it holds"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO bot_shards (shard_id, channels)
+                VALUES (%s, %s)
+                ON CONFLICT (shard_id) DO UPDATE
+                  SET heartbeat_at = now(), channels = EXCLUDED.channels
+                """,
+                (shard_id, channels),
+            )
+
+
+def get_live_shards(conn, ttl: float) -> Set[str]:
+    """Shards that have sent a heartbeat within the last ttl seconds"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT shard_id FROM bot_shards
+                WHERE heartbeat_at > now() - make_interval(secs => %s)
+                """,
+                (ttl,),
+            )
+            return {row[0] for row in cur.fetchall()}
+
+
+def remove_shard(conn, shard_id: str):
+    """Drop a shard that is shutting down so the others take its channels now"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM bot_shards WHERE shard_id = %s", (shard_id,))
+
+
+def prune_shards(conn, ttl: float):
+    """Forget long-dead shards and expired shared command results"""
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM bot_shards
+                WHERE heartbeat_at < now() - make_interval(secs => %s)
+                """,
+                (10 * ttl,),
+            )
+            cur.execute("DELETE FROM command_results WHERE expires_at < now()")
@@ -1,23 +1,140 @@
 # buddy_utils.py
+import asyncio
+import json
+from collections import namedtuple
+
+from logger import setup_logger
 from .buddies import easter_egg_buddies_dict
-from .buddy_fetch import get_buddy_dict, get_trinkets_dict, parse_buddy, parse_trinket
+from .buddy_fetch import (
+    fetch_cards,
+    get_buddy_dict,
+    get_heroes_dict,
+    get_minions_dict,
+    get_spells_dict,
+    get_trinkets_dict,
+    load_cached_cards,
+    parse_buddy,
+    parse_card,
+    parse_trinket,
+)
+from .card_catalog import CardCatalog
+from .fuzzy_matcher import FuzzyMatcher
+
+logger = setup_logger("CardCatalog")
+
+CATALOG_REFRESH_SECONDS = 600
+
+# Swapped in one assignment, so a lookup never sees one index from the old
+# cards.json and the other from the new one
+Catalog = namedtuple(
+    "Catalog",
+    ["sha256", "buddies", "trinkets", "heroes", "minions", "spells", "matchers"],
+)
+catalog = Catalog(None, {}, {}, {}, {}, {}, {})
+
+
+def _use(cards: CardCatalog):
+    global catalog
+    indexes = {
+        "buddies": get_buddy_dict(cards),
+        "trinkets": get_trinkets_dict(cards),
+        "heroes": get_heroes_dict(cards),
+        "minions": get_minions_dict(cards),
+        "spells": get_spells_dict(cards),
+    }
+    matchers = {kind: FuzzyMatcher(index) for kind, index in indexes.items()}
+    catalog = Catalog(cards.sha256, matchers=matchers, **indexes)
+    logger.info(
+        f"Card catalog {(cards.sha256 or '')[:12]}: {len(catalog.buddies)} buddies, "
+        f"{len(catalog.trinkets)} trinkets, {len(catalog.heroes)} hero names, "
+        f"{len(catalog.minions)} minions, {len(catalog.spells)} spells"
+    )
+
+
+def _build(body, sha256):
+    """Compact a downloaded cards.json, save it and swap it in"""
+    cards = CardCatalog.from_cards_json(json.loads(body), sha256)
+    try:
+        cards.save()
+    except OSError as e:
+        logger.error(f"Could not save the card catalog: {e}")
+    _use(cards)
+
+
+def load_cached_catalog():
+    """
+    Load the saved compact catalog, or build it from the cached cards.json;
+    never touches the network
+    """
+    cards = CardCatalog.load()
+    if cards is not None:
+        _use(cards)
+        return
+    body, sha256 = load_cached_cards()
+    if body is not None:
+        try:
+            _build(body, sha256)
+        except ValueError as e:
+            logger.error(f"Ignoring unreadable card cache: {e}")
 
-# Initialize dictionaries once
-buddy_dict = get_buddy_dict()
-trinket_dict = get_trinkets_dict()
 
-def update_buddy_dict_and_trinket_dict():
-    global buddy_dict, trinket_dict
-    buddy_dict = get_buddy_dict()
-    trinket_dict = get_trinkets_dict()
+def refresh_catalog():
+    """
+    Revalidate cards.json and rebuild the indexes if its content changed.
+    Blocking; returns True if the catalog was replaced.
+    """
+    body, sha256 = fetch_cards()
+    if body is None and catalog.sha256 is None:
+        # Not modified, but nothing loaded yet
+        body, sha256 = load_cached_cards()
+    if body is None or sha256 == catalog.sha256:
+        return False
+    _build(body, sha256)
+    return True
+
+
+async def refresh_catalog_forever(interval=CATALOG_REFRESH_SECONDS):
+    """Background task: refresh in a worker thread, off the event loop"""
+    while True:
+        try:
+            await asyncio.to_thread(refresh_catalog)
+        except Exception as e:
+            logger.error(f"Card catalog refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+
+load_cached_catalog()
+
 
 def get_buddy_text(name: str):
-    results = parse_buddy(name.lower(), buddy_dict, easter_egg_buddies_dict)
+    current = catalog  # One catalog for the whole lookup, even mid-swap
+    results = parse_buddy(
+        name.lower(),
+        current.buddies,
+        easter_egg_buddies_dict,
+        current.matchers.get("buddies"),
+    )
     return results if results else None
 
 
 def get_trinket_text(name: str):
-    return parse_trinket(name.lower(), trinket_dict)
+    current = catalog
+    return parse_trinket(name.lower(), current.trinkets, current.matchers.get("trinkets"))
+
+
+def get_hero_text(name: str):
+    current = catalog
+    return parse_card(name, current.heroes, "hero", current.matchers.get("heroes"))
+
+
+def get_minion_text(name: str):
+    current = catalog
+    return parse_card(name, current.minions, "minion", current.matchers.get("minions"))
+
+
+def get_spell_text(name: str):
+    current = catalog
+    return parse_card(name, current.spells, "spell", current.matchers.get("spells"))
 
 
 def get_buddy_gold_tier_message(tier: str) -> str:
@@ -1,11 +1,73 @@
+import hashlib
 import json
+import os
 
 import requests
-from fuzzywuzzy import process as fuzzysearch
+from .constants import DATA_DIR
+from .fuzzy_matcher import FuzzyMatcher
 
 url = "https://api.hearthstonejson.com/v1/latest/enUS/cards.json"
-response = requests.get(url)
-data_json = json.loads(response.text)
+# Last downloaded cards.json, and the validators to revalidate it with
+CACHE_PATH = os.environ.get(
+    "CARD_CACHE_PATH", os.path.join(DATA_DIR, "wallii_cards.json")
+)
+REQUEST_TIMEOUT = 30
+
+
+def _write_atomic(path, data: bytes):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"  # Shards may share the directory
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_cached_cards(cache_path=CACHE_PATH):
+    """(body, sha256) of the cached cards.json, or (None, None)"""
+    try:
+        with open(cache_path, "rb") as f:
+            body = f.read()
+    except OSError:
+        return None, None
+    return body, hashlib.sha256(body).hexdigest()
+
+
+def fetch_cards(cache_path=CACHE_PATH, session=requests):
+    """
+    Revalidate the cached cards.json with If-None-Match / If-Modified-Since.
+    Returns (body, sha256) when a new copy was downloaded and cached, or
+    (None, None) when the cached one is still current.
+    """
+    meta_path = f"{cache_path}.meta"
+    headers = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return None, None
+    response.raise_for_status()
+
+    body = response.content
+    _write_atomic(cache_path, body)
+    _write_atomic(
+        meta_path,
+        json.dumps(
+            {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+        ).encode(),
+    )
+    return body, hashlib.sha256(body).hexdigest()
 
 difficult_shortened_names = {
     "Death Speaker Blackthorn": "blackthorn",
@@ -65,33 +127,27 @@ def get_shortened_name(full_hero_name):
     return "".join(c.lower() for c in first_word if c.isalnum())
 
 
-def get_buddy_dict():
-    # dictionary to hold hero ID's and their names
-    _heroes = {}
+def get_buddy_dict(catalog):
     # Variable of the final dictionary
     buddies = {}
+    # Hero ID's of the playable heroes, skins excluded
+    heroes = {hero["id"] for hero in catalog.heroes()}
 
-    # Loop through the heroes in data_json, and find their ID's and names
-    for hero in filter(lambda card: "battlegroundsBuddyDbfId" in card, data_json):
-        id_words = hero["id"].split("_")
-        # verify that the card is not a skin
-        if len(id_words) >= 2 and id_words[-2] == "HERO" and id_words[-1].isnumeric():
-            _heroes[hero["id"]] = hero["name"]
-
-    # Loop through the buddies in data_json and find their heroes
-    for buddy in filter(lambda card: "isBattlegroundsBuddy" in card, data_json):
+    # Loop through the buddies and find their heroes
+    for buddy in catalog.of_kind("buddy"):
         # examples of `buddy["id"]`: "TB_BaconShop_HERO_93_Buddy", "TB_BaconShop_HERO_93_Buddy_G"
         hero_id, _buddy_is_golden = buddy["id"].split("_Buddy")
         buddy_is_golden = bool(_buddy_is_golden)
 
-        if hero_id in _heroes:
+        if hero_id in heroes:
+            hero = catalog.by_id[hero_id]["name"]
             b = buddy
             buddy_string = f"{b['name']} is a Tier {b['techLevel']} {b['attack']}/{b['health']}. Ability: {filterText(b['text'])}"
-            hero_name = get_shortened_name(_heroes[hero_id])
+            hero_name = get_shortened_name(hero)
 
             if not buddy_is_golden:
                 buddies[hero_name] = (
-                    _heroes[hero_id],
+                    hero,
                     buddy_string,
                 )
             else:
@@ -100,14 +156,83 @@ def get_buddy_dict():
                     buddies[hero_name] += (golden_buddy_string,)
                 else:
                     buddies[hero_name] = (
-                        _heroes[hero_id],
+                        hero,
                         golden_buddy_string,
                     )
 
     return buddies
 
 
-def parse_buddy(name, buddies={}, eggs={}):
+def card_key(name):
+    """Lookup key of a card name: lowercase letters and digits only"""
+    return "".join(c for c in name.lower() if c.isalnum())
+
+
+def get_heroes_dict(catalog):
+    heroes = {}
+    for hero in catalog.heroes():
+        parts = [f"{hero['name']}"]
+        if hero.get("armor"):
+            parts[0] += f" has {hero['armor']} armor"
+        power = catalog.by_dbf_id.get(hero.get("heroPowerDbfId"))
+        if power and power.get("text"):
+            cost = f" ({power['cost']})" if "cost" in power else ""
+            parts.append(f"Hero Power: {power['name']}{cost}: {filterText(power['text'])}")
+        buddy = catalog.by_dbf_id.get(hero.get("battlegroundsBuddyDbfId"))
+        if buddy:
+            parts.append(f"Buddy: {buddy['name']}")
+        text = " ".join(part if part.endswith(".") else f"{part}." for part in parts)
+        heroes[card_key(hero["name"])] = text
+        heroes.setdefault(get_shortened_name(hero["name"]), text)
+    return heroes
+
+
+def get_minions_dict(catalog):
+    minions = {}
+    for minion in catalog.of_kind("minion"):
+        if "techLevel" not in minion:
+            continue
+        races = " ".join(
+            race.title() for race in minion.get("races", []) if race != "INVALID"
+        )
+        text = f"{minion['name']} is a Tier {minion['techLevel']} {minion.get('attack', 0)}/{minion.get('health', 0)}"
+        if races:
+            text += f" {races}"
+        if minion.get("text"):
+            text += f". Ability: {filterText(minion['text'])}"
+        minions[card_key(minion["name"])] = text
+    return minions
+
+
+def get_spells_dict(catalog):
+    spells = {}
+    for spell in catalog.of_kind("spell"):
+        if "text" not in spell:
+            continue
+        tier = f"Tier {spell['techLevel']} " if "techLevel" in spell else ""
+        spells[card_key(spell["name"])] = (
+            f"{spell['name']} is a {tier}spell that costs {spell.get('cost', 0)}: {filterText(spell['text'])}"
+        )
+    return spells
+
+
+def parse_card(name, cards, kind, matcher=None):
+    """Text of the card `name` among `cards`, built by the get_*_dict above"""
+    key = card_key(name)
+    if key in cards:
+        return cards[key]
+    matcher = matcher or FuzzyMatcher(cards)
+    goodScores = matcher.match(key)
+    hit = matcher.direct_hit(key)
+    if hit is not None:
+        return cards[hit]
+    if len(goodScores) > 0:
+        goodScoresNames = " or ".join(name_scored for name_scored, _ in goodScores)
+        return f"{name} is not a valid {kind}, try again with {goodScoresNames}"
+    return f"{name} is not a valid {kind} or close to one"
+
+
+def parse_buddy(name, buddies={}, eggs={}, matcher=None):
     if name in eggs:
         return eggs[name]
 
@@ -115,13 +240,11 @@ def parse_buddy(name, buddies={}, eggs={}):
         return buddies[name]
 
     else:
-        buddyOptions = list(buddies.keys())
-        goodScores = fuzzysearch.extractBests(
-            query=name, choices=buddyOptions, score_cutoff=65, limit=3
-        )
-        for name_scored, ratio_scored in goodScores:
-            if ratio_scored >= 85:
-                return buddies[name_scored]
+        matcher = matcher or FuzzyMatcher(buddies)
+        goodScores = matcher.match(name)
+        hit = matcher.direct_hit(name)
+        if hit is not None:
+            return buddies[hit]
 
         if len(goodScores) > 0:
             ## create a fake entry for no valid hero
@@ -142,18 +265,16 @@ def parse_buddy(name, buddies={}, eggs={}):
             )
 
 
-def parse_trinket(name, trinkets={}):
+def parse_trinket(name, trinkets={}, matcher=None):
     name.replace("\U000e0000", "")
     if name in trinkets:
         return trinkets[name]
     else:
-        trinketOptions = list(trinkets.keys())
-        goodScores = fuzzysearch.extractBests(
-            query=name, choices=trinketOptions, score_cutoff=65, limit=3
-        )
-        for name_scored, ratio_scored in goodScores:
-            if ratio_scored >= 85:
-                return trinkets[name_scored]
+        matcher = matcher or FuzzyMatcher(trinkets)
+        goodScores = matcher.match(name)
+        hit = matcher.direct_hit(name)
+        if hit is not None:
+            return trinkets[hit]
 
         if len(goodScores) > 0:
             ## create a fake entry for no valid trinket
@@ -165,12 +286,9 @@ def parse_trinket(name, trinkets={}):
             return f"{name} is not a valid trinket or close to one"
 
 
-def get_trinkets_dict():
+def get_trinkets_dict(catalog):
     trinkets = {}
-    for trinket in filter(
-        lambda card: "type" in card and card["type"] == "BATTLEGROUND_TRINKET",
-        data_json,
-    ):
+    for trinket in catalog.of_kind("trinket"):
         if (
             trinket
             and "name" in trinket
@@ -183,6 +301,3 @@ def get_trinkets_dict():
             )
 
     return trinkets
-
-
-get_trinkets_dict()
@@ -0,0 +1,121 @@
+"""
+Compact catalog of the Battlegrounds cards in HearthstoneJSON's cards.json.
+
+cards.json holds every Hearthstone card, many megabytes of it. One pass keeps
+only the cards the bot answers about (heroes, their hero powers and buddies,
+pool minions, tavern spells and trinkets) and only the fields their texts
+use. The result is a few hundred kilobytes, saved next to the cards.json
+cache so the bot starts from it without parsing the full file.
+"""
+
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .constants import DATA_DIR
+
+CATALOG_PATH = os.environ.get(
+    "CARD_CATALOG_PATH", os.path.join(DATA_DIR, "wallii_catalog.json")
+)
+# Bumped when the kept fields or kinds change, so old files are rebuilt
+CATALOG_FORMAT = 1
+
+FIELDS = (
+    "id",
+    "dbfId",
+    "name",
+    "text",
+    "techLevel",
+    "attack",
+    "health",
+    "cost",
+    "armor",
+    "spellSchool",
+    "races",
+    "heroPowerDbfId",
+    "battlegroundsBuddyDbfId",
+)
+
+# Real heroes end in HERO_<number>; skins add a suffix
+HERO_ID = re.compile(r"_HERO_\d+$")
+
+
+def card_kind(card) -> Optional[str]:
+    """The catalog kind of a card, or None if the bot never looks it up"""
+    card_type = card.get("type")
+    if card_type == "BATTLEGROUND_TRINKET":
+        return "trinket"
+    if card_type == "BATTLEGROUND_SPELL":
+        return "spell"
+    if "isBattlegroundsBuddy" in card:
+        return "buddy"
+    if "battlegroundsBuddyDbfId" in card:
+        return "hero"
+    if card_type == "MINION" and card.get("isBattlegroundsPoolMinion"):
+        return "minion"
+    if card_type == "HERO_POWER" and card.get("set") == "BATTLEGROUNDS":
+        return "hero_power"
+    return None
+
+
+def compact(card, kind) -> dict:
+    kept = {field: card[field] for field in FIELDS if field in card}
+    if "races" not in kept and "race" in card:
+        kept["races"] = [card["race"]]
+    kept["kind"] = kind
+    return kept
+
+
+class CardCatalog:
+    def __init__(self, cards: List[dict], sha256: Optional[str] = None):
+        # sha256 of the cards.json the catalog was built from
+        self.sha256 = sha256
+        self.cards = cards
+        self.by_dbf_id: Dict[int, dict] = {}
+        self.by_id: Dict[str, dict] = {}
+        self.by_kind: Dict[str, List[dict]] = defaultdict(list)
+        for card in cards:
+            self.by_dbf_id[card["dbfId"]] = card
+            self.by_id[card["id"]] = card
+            self.by_kind[card["kind"]].append(card)
+
+    @classmethod
+    def from_cards_json(cls, data_json, sha256=None) -> "CardCatalog":
+        cards = []
+        for card in data_json:
+            kind = card_kind(card)
+            if kind is not None and "dbfId" in card and "name" in card:
+                cards.append(compact(card, kind))
+        return cls(cards, sha256)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH) -> Optional["CardCatalog"]:
+        """The saved catalog, or None if there is none in the current format"""
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get("format") != CATALOG_FORMAT:
+            return None
+        return cls(saved["cards"], saved["sha256"])
+
+    def save(self, path=CATALOG_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"  # Shards may share the directory
+        with open(tmp, "w") as f:
+            json.dump(
+                {"format": CATALOG_FORMAT, "sha256": self.sha256, "cards": self.cards},
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp, path)
+
+    def of_kind(self, kind) -> List[dict]:
+        return self.by_kind.get(kind, [])
+
+    def heroes(self) -> List[dict]:
+        """Playable heroes, without their skins"""
+        return [hero for hero in self.of_kind("hero") if HERO_ID.search(hero["id"])]
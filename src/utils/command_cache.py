@@ -0,0 +1,142 @@
+"""
+Per-channel dedupe of repeated chat commands.
+
+Chat often sends the same !rank or !day several times within seconds. The
+first one is answered; identical ones in the same channel during the
+command's cooldown (including while the first is still being looked up)
+are suppressed, since the answer is already in chat. Commands are compared
+after normalising their arguments, so "!rank LII" and "!rank lii" are the
+same question.
+"""
+
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional
+
+from logger import setup_logger
+
+logger = setup_logger("CommandCache")
+
+# Seconds an answered command suppresses identical ones in its channel
+DEFAULT_COOLDOWN = 10.0
+COOLDOWNS = {
+    "rank": 10.0,
+    "day": 10.0,
+    "week": 15.0,
+    "month": 30.0,
+    "season": 30.0,
+    "peak": 30.0,
+    # The same for everyone until the next leaderboard refresh
+    "top10": 60.0,
+    "region_stats": 60.0,
+    "milestone": 60.0,
+    "buddy": 30.0,
+    "goldenbuddy": 30.0,
+    "trinket": 30.0,
+    "hero": 30.0,
+    "minion": 30.0,
+    "spell": 30.0,
+}
+
+MAX_ENTRIES = 10000
+STATS_LOG_SECONDS = 60
+
+
+def parse_cooldowns(spec: str) -> Dict[str, float]:
+    """'rank=5,top10=120' -> {"rank": 5.0, "top10": 120.0}; bad entries are skipped"""
+    cooldowns = {}
+    for entry in spec.split(","):
+        command, _, seconds = entry.partition("=")
+        try:
+            cooldowns[command.strip()] = float(seconds)
+        except ValueError:
+            if entry.strip():
+                logger.warning(f"Ignoring command cooldown {entry!r}")
+    return cooldowns
+
+
+# Overrides without a deploy, e.g. COMMAND_COOLDOWNS="rank=5,top10=120"
+COOLDOWNS.update(parse_cooldowns(os.environ.get("COMMAND_COOLDOWNS", "")))
+
+
+def normalize(value):
+    if value is None:
+        return None
+    return " ".join(str(value).lower().split())
+
+
+class CommandCache:
+    def __init__(
+        self, cooldowns: Optional[Dict[str, float]] = None, clock=time.monotonic
+    ):
+        self.cooldowns = {**COOLDOWNS, **(cooldowns or {})}
+        self.clock = clock
+        # (channel, command, args) -> when it was last answered, oldest first
+        self._answered = OrderedDict()
+        self._max_cooldown = max([DEFAULT_COOLDOWN, *self.cooldowns.values()])
+
+        self.answered = defaultdict(int)
+        self.suppressed = defaultdict(int)
+        self._logged = clock()
+
+    def key(self, channel: str, command: str, *args, **kwargs):
+        """Identical questions in one channel share a key"""
+        return (
+            channel.lower(),
+            command,
+            tuple(normalize(arg) for arg in args),
+            tuple(sorted((name, normalize(value)) for name, value in kwargs.items())),
+        )
+
+    def claim(self, key) -> bool:
+        """
+        True if this command should be answered, and starts its cooldown;
+        False if an identical one was answered too recently
+        """
+        now = self.clock()
+        self._prune(now)
+        command = key[1]
+        answered = self._answered.get(key)
+        if answered is not None and now - answered < self.cooldowns.get(
+            command, DEFAULT_COOLDOWN
+        ):
+            self.suppressed[command] += 1
+            self._maybe_log(now)
+            return False
+        self._answered[key] = now
+        self._answered.move_to_end(key)
+        self.answered[command] += 1
+        self._maybe_log(now)
+        return True
+
+    def release(self, key):
+        """Forget a claim whose command got no real answer, so it can be asked again"""
+        self._answered.pop(key, None)
+
+    def _prune(self, now):
+        while self._answered:
+            answered = next(iter(self._answered.values()))
+            if (
+                now - answered < self._max_cooldown
+                and len(self._answered) <= MAX_ENTRIES
+            ):
+                break
+            self._answered.popitem(last=False)
+
+    def stats(self) -> dict:
+        answered = sum(self.answered.values())
+        suppressed = sum(self.suppressed.values())
+        total = answered + suppressed
+        return {
+            "answered": answered,
+            "suppressed": suppressed,
+            "absorbed_pct": round(100 * suppressed / total, 1) if total else 0.0,
+            "suppressed_by_command": dict(self.suppressed),
+            "entries": len(self._answered),
+        }
+
+    def _maybe_log(self, now):
+        if now - self._logged >= STATS_LOG_SECONDS:
+            self._logged = now
+            logger.info(f"Command cache: {self.stats()}")
@@ -0,0 +1,164 @@
+"""
+Runs the blocking LeaderboardDB commands off the event loop.
+
+A fixed set of worker threads, a couple fewer than the database pool has
+connections (the refresh tasks use the rest), so a command never waits on
+the pool itself. Commands past what the workers and a short queue can hold
+are turned away at once, a queued command that has waited past its deadline
+is dropped without touching the database, and a caller stops waiting once
+the deadline passes. Queue wait and run time are sampled per command.
+"""
+
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from logger import setup_logger
+from utils.constants import DB_POOL_SIZE
+
+logger = setup_logger("CommandExecutor")
+
+# Connections left to the refresh tasks that run on the event loop
+POOL_RESERVE = 2
+WORKERS = DB_POOL_SIZE - POOL_RESERVE
+# Commands waiting for a worker before new ones are turned away
+MAX_QUEUED = 2 * WORKERS
+
+# Seconds a command may take from submission to answer
+DEFAULT_DEADLINE = 5.0
+DEADLINES = {
+    # Read the season's rollups or an archive file
+    "season": 10.0,
+    "month": 10.0,
+    "peak": 10.0,
+}
+
+SAMPLES = 500
+STATS_LOG_SECONDS = 60
+
+BUSY_MESSAGE = "The bot is busy right now, try again in a few seconds"
+TIMEOUT_MESSAGE = "That took too long to look up, try again in a few seconds"
+
+
+class CommandRejected(Exception):
+    """A command that was shed or timed out; str() is the reply for the user"""
+
+
+class _Expired(Exception):
+    pass
+
+
+def _percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+
+class CommandExecutor:
+    def __init__(self, workers: int = WORKERS, max_queued: int = MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="command")
+        self._lock = threading.Lock()
+        self._in_flight = 0  # Queued or running
+
+        self.completed = 0
+        self.failed = 0
+        self.shed = defaultdict(int)  # reason -> count
+        self._queue_wait = defaultdict(lambda: deque(maxlen=SAMPLES))
+        self._run_time = defaultdict(lambda: deque(maxlen=SAMPLES))
+        self._logged = time.monotonic()
+
+    def _finished(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _shed(self, reason: str, command: str):
+        with self._lock:
+            self.shed[reason] += 1
+        logger.warning(f"Shed {command}: {reason}")
+
+    async def run(self, command: str, fn: Callable, *args, deadline=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) on a worker and return its result. Raises
+        CommandRejected if it was turned away, dropped or timed out.
+        """
+        deadline = deadline or DEADLINES.get(command, DEFAULT_DEADLINE)
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queued:
+                saturated = True
+            else:
+                saturated = False
+                self._in_flight += 1
+        if saturated:
+            self._shed("saturated", command)
+            raise CommandRejected(BUSY_MESSAGE)
+
+        submitted = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            wait = started - submitted
+            with self._lock:
+                self._queue_wait[command].append(wait)
+            if wait >= deadline:
+                # The caller has given up; don't spend a connection on it
+                raise _Expired()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._run_time[command].append(time.monotonic() - started)
+
+        future = self._pool.submit(job)
+        future.add_done_callback(self._finished)
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=deadline)
+        except asyncio.TimeoutError:
+            # Still queued: cancelled. Already running: finishes unobserved.
+            self._shed("timeout", command)
+            raise CommandRejected(TIMEOUT_MESSAGE)
+        except _Expired:
+            self._shed("expired", command)
+            raise CommandRejected(TIMEOUT_MESSAGE)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            self._maybe_log()
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "shed": dict(self.shed),
+                "commands": {
+                    command: {
+                        "queue_wait_p50": _percentile(self._queue_wait[command], 0.5),
+                        "queue_wait_p95": _percentile(self._queue_wait[command], 0.95),
+                        "run_time_p50": _percentile(self._run_time[command], 0.5),
+                        "run_time_p95": _percentile(self._run_time[command], 0.95),
+                    }
+                    for command in list(self._queue_wait)
+                },
+            }
+
+    def _maybe_log(self):
+        now = time.monotonic()
+        if now - self._logged >= STATS_LOG_SECONDS:
+            self._logged = now
+            logger.info(f"Command executor: {self.stats()}")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,3 +1,14 @@
+import os
+
 REGIONS = ["NA", "EU", "AP", "CN"]
 NON_CN_REGIONS = ["NA", "EU", "AP"]
 STATS_LIMIT = 1000
+# Connections in LeaderboardDB's pool, shared by the command threads and the
+# refresh tasks
+DB_POOL_SIZE = 10
+# Files kept across restarts (the card catalog and its download cache). Mount
+# a volume here in containers; the default is data/ at the repo root
+DATA_DIR = os.environ.get(
+    "WALLII_DATA_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data")),
+)
@@ -0,0 +1,64 @@
+"""
+Fuzzy lookup of card names for !buddy, !trinket and the other card commands.
+
+Scores are rapidfuzz's WRatio, the compiled version of the fuzzywuzzy scorer
+that extractBests used, rounded to whole points the way fuzzywuzzy did, so the
+DIRECT_HIT_SCORE / SUGGEST_SCORE thresholds mean what they always have. The
+names are normalised once when the matcher is built, and chat repeats the
+same typos all the time, so results are kept in an LRU per matcher; a new
+catalog comes with new matchers and so with fresh caches.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+from rapidfuzz import fuzz, process, utils
+
+# A fuzzy match scoring at least this is answered as if typed exactly
+DIRECT_HIT_SCORE = 85
+# Matches scoring at least this are offered as suggestions
+SUGGEST_SCORE = 65
+SUGGESTIONS = 3
+CACHE_SIZE = 4096
+
+
+class FuzzyMatcher:
+    def __init__(self, names: Iterable[str], cache_size: int = CACHE_SIZE):
+        self.names = list(names)
+        self._choices = [utils.default_process(name) for name in self.names]
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, query: str) -> Tuple[Tuple[str, int], ...]:
+        """
+        Up to SUGGESTIONS (name, score) pairs scoring at least SUGGEST_SCORE,
+        best first; ties keep the catalog order
+        """
+        processed = utils.default_process(query)
+        if not processed:
+            return ()
+        results = process.extract(
+            processed,
+            self._choices,
+            scorer=fuzz.WRatio,
+            processor=None,
+            # Anything that rounds up to the cut-off counts
+            score_cutoff=SUGGEST_SCORE - 0.5,
+            limit=None,
+        )
+        # Rank on the rounded scores, as fuzzywuzzy did, so equal scores keep
+        # the catalog order
+        scored = sorted(
+            (-int(round(score)), index) for _, score, index in results
+        )
+        return tuple(
+            (self.names[index], -score)
+            for score, index in scored[:SUGGESTIONS]
+            if -score >= SUGGEST_SCORE
+        )
+
+    def direct_hit(self, query: str):
+        """The best name if it scores DIRECT_HIT_SCORE or more, else None"""
+        for name, score in self.match(query):
+            if score >= DIRECT_HIT_SCORE:
+                return name
+        return None
@@ -0,0 +1,37 @@
+"""
+Consistent hashing of channels onto bot shards.
+
+Each shard is placed on the ring at REPLICAS points, and a channel belongs to
+the first shard point at or after its own hash. Adding or removing a shard
+only moves the channels on the arcs it gains or loses, about 1/N of them, so
+the other shards keep their channels joined through a rebalance.
+
+Hashes come from md5 rather than hash(), which is salted per process, so
+every shard computes the same ring.
+"""
+
+import hashlib
+from bisect import bisect_left
+from typing import Iterable
+
+REPLICAS = 100
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[str], replicas: int = REPLICAS):
+        self.nodes = frozenset(nodes)
+        if not self.nodes:
+            raise ValueError("A hash ring needs at least one node")
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        i = bisect_left(self._hashes, _hash(key))
+        return self._nodes[i % len(self._nodes)]
@@ -0,0 +1,80 @@
+"""
+In-memory trigram index over player names for "did you mean" suggestions.
+
+Each name is split into padded trigrams (the same scheme as Postgres pg_trgm)
+and every trigram keeps a posting list of the names containing it. A query only
+counts hits over its rarest trigrams, up to MAX_POSTINGS entries, so the work
+is bounded however common its other trigrams are; the best-counted candidates
+are then scored exactly with the Dice coefficient of the two trigram sets.
+"""
+
+from collections import Counter
+from typing import Iterable, List
+
+# Posting entries counted per query, and candidates scored exactly
+MAX_POSTINGS = 4000
+MAX_CANDIDATES = 20
+# Minimum Dice similarity for a name to be suggested
+MIN_SIMILARITY = 0.35
+
+
+def trigrams(name: str) -> set:
+    padded = f"  {name.lower()} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    def __init__(self, names: Iterable[str] = ()):
+        self._names: List[str] = []
+        self._ids = {}
+        self._postings = {}
+        self.add(names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._ids
+
+    def add(self, names: Iterable[str]):
+        """Index new names; already indexed ones are skipped"""
+        for name in names:
+            key = name.lower()
+            if key in self._ids:
+                continue
+            name_id = len(self._names)
+            self._names.append(key)
+            self._ids[key] = name_id
+            for gram in trigrams(key):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = []
+                postings.append(name_id)
+
+    def suggest(self, query: str, limit: int = 3) -> List[str]:
+        """Up to `limit` indexed names closest to `query`, best first"""
+        query_grams = trigrams(query)
+        lists = sorted(
+            (self._postings[g] for g in query_grams if g in self._postings), key=len
+        )
+
+        hits = Counter()
+        counted = 0
+        for postings in lists:
+            if counted and counted + len(postings) > MAX_POSTINGS:
+                break
+            hits.update(postings)
+            counted += len(postings)
+
+        scored = []
+        candidates = sorted(hits, key=hits.__getitem__, reverse=True)
+        for name_id in candidates[:MAX_CANDIDATES]:
+            name = self._names[name_id]
+            name_grams = trigrams(name)
+            similarity = (
+                2 * len(query_grams & name_grams) / (len(query_grams) + len(name_grams))
+            )
+            if similarity >= MIN_SIMILARITY:
+                scored.append((-similarity, abs(len(name) - len(query)), name))
+        scored.sort()
+        return [name for _, _, name in scored[:limit]]
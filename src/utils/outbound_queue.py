@@ -0,0 +1,253 @@
+"""
+Rate-limited outbound chat queue for the Twitch bot.
+
+Twitch drops messages silently once a connection or a channel goes over its
+rate limit, so every message goes through one sender task that spends tokens
+from two buckets: one for the connection and one per channel. Command replies
+are sent before announcements. When replies back up, the pending replies to a
+channel are joined into one message (up to Twitch's 500 characters) rather
+than waiting for a token each, identical pending messages are sent once, and
+replies too old to be useful are dropped and counted instead of arriving
+minutes late.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from logger import setup_logger
+
+logger = setup_logger("OutboundQueue")
+
+# Priorities, most urgent first
+REPLY = 0
+ANNOUNCEMENT = 1
+
+# Twitch limits for an account that isn't a channel moderator: 20 messages per
+# 30 seconds per connection, and about one message per second per channel
+CONNECTION_RATE = 20 / 30
+CONNECTION_BURST = 20
+CHANNEL_RATE = 1 / 1.1
+CHANNEL_BURST = 1
+# Connection tokens announcements leave for replies
+ANNOUNCEMENT_RESERVE = 5
+
+MAX_MESSAGE_LENGTH = 500
+JOIN_SEPARATOR = " | "
+# Pending messages older than this are dropped instead of sent
+MAX_AGE = {REPLY: 30.0, ANNOUNCEMENT: 600.0}
+# Pending messages kept per channel; the oldest lowest-priority one goes first
+MAX_PENDING_PER_CHANNEL = 20
+LATENCY_SAMPLES = 500
+STATS_LOG_SECONDS = 60
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+@dataclass
+class OutboundMessage:
+    channel: object  # Anything with .name and an async .send(text)
+    text: str
+    priority: int
+    enqueued: float
+    # Enqueue times of the messages folded into this one
+    parts: List[float] = field(default_factory=list)
+
+
+class OutboundQueue:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.connection_bucket = TokenBucket(CONNECTION_RATE, CONNECTION_BURST, clock)
+        self._channel_buckets: Dict[str, TokenBucket] = {}
+        # channel name -> one deque per priority
+        self._pending: Dict[str, List[deque]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def put(self, channel, text: str, priority: int = REPLY):
+        """Queue a message for a channel; never blocks"""
+        if not text:
+            return
+        queues = self._pending.setdefault(
+            channel.name, [deque() for _ in MAX_AGE]
+        )
+        queue = queues[priority]
+        if any(message.text == text for message in queue):
+            # Twitch would drop the repeat anyway
+            self.coalesced += 1
+            return
+        now = self.clock()
+        queue.append(OutboundMessage(channel, text, priority, now, [now]))
+        if sum(len(q) for q in queues) > MAX_PENDING_PER_CHANNEL:
+            victim = next(q for q in reversed(queues) if q)
+            victim.popleft()
+            self.dropped += 1
+            logger.warning(f"Outbound queue for {channel.name} is full, dropped a message")
+        self._wakeup.set()
+
+    def depth(self) -> Dict[int, int]:
+        """Pending messages per priority"""
+        depth = {priority: 0 for priority in MAX_AGE}
+        for queues in self._pending.values():
+            for priority, queue in enumerate(queues):
+                depth[priority] += len(queue)
+        return depth
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {
+            "depth": self.depth(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+        }
+
+    def _channel_bucket(self, name: str) -> TokenBucket:
+        bucket = self._channel_buckets.get(name)
+        if bucket is None:
+            bucket = self._channel_buckets[name] = TokenBucket(
+                CHANNEL_RATE, CHANNEL_BURST, self.clock
+            )
+        return bucket
+
+    def _drop_stale(self):
+        now = self.clock()
+        for name, queues in list(self._pending.items()):
+            for priority, queue in enumerate(queues):
+                while queue and now - queue[0].enqueued > MAX_AGE[priority]:
+                    queue.popleft()
+                    self.dropped += 1
+            if not any(queues):
+                del self._pending[name]
+
+    def _next_ready(self):
+        """
+        (message, 0) for the most urgent message whose channel has a token,
+        or (None, seconds until one does)
+        """
+        best = None
+        wait = None
+        self.connection_bucket.delay()  # Refill before reading its tokens
+        reserve_wait = (
+            1 + ANNOUNCEMENT_RESERVE - self.connection_bucket.tokens
+        ) / self.connection_bucket.rate
+        for name, queues in self._pending.items():
+            head = next(q[0] for q in queues if q)
+            delay = self._channel_bucket(name).delay()
+            if head.priority != REPLY:
+                delay = max(delay, reserve_wait)
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            if best is None or (head.priority, head.enqueued) < (best.priority, best.enqueued):
+                best = head
+        return best, wait
+
+    def _take(self, message: OutboundMessage) -> OutboundMessage:
+        """
+        Remove a message from its queue, folding the channel's other pending
+        messages of the same priority into it while they fit
+        """
+        queue = self._pending[message.channel.name][message.priority]
+        queue.popleft()
+        text, parts = message.text, list(message.parts)
+        while queue:
+            joined = f"{text}{JOIN_SEPARATOR}{queue[0].text}"
+            if len(joined) > MAX_MESSAGE_LENGTH:
+                break
+            text = joined
+            parts.extend(queue.popleft().parts)
+            self.coalesced += 1
+        return OutboundMessage(message.channel, text, message.priority, message.enqueued, parts)
+
+    async def run(self):
+        """Sender loop; one per connection"""
+        logged = self.clock()
+        while True:
+            if self.clock() - logged >= STATS_LOG_SECONDS:
+                logged = self.clock()
+                logger.info(f"Outbound queue: {self.stats()}")
+            self._drop_stale()
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            connection_delay = self.connection_bucket.delay()
+            if connection_delay > 0:
+                await asyncio.sleep(connection_delay)
+                continue
+
+            message, wait = self._next_ready()
+            if message is None:
+                # Every channel with work is cooling down; a new message for
+                # another channel may be sendable sooner
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            message = self._take(message)
+            self.connection_bucket.take()
+            self._channel_bucket(message.channel.name).take()
+            try:
+                await message.channel.send(message.text)
+                self.sent += 1
+                now = self.clock()
+                self._latencies.extend(now - enqueued for enqueued in message.parts)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error sending to {message.channel.name}: {e}")
@@ -12,68 +12,52 @@ from config import NORMALIZED_TABLES
 DAILY_LEADERBOARD_STATS = NORMALIZED_TABLES["daily_leaderboard_stats"]
 LEADERBOARD_SNAPSHOTS = NORMALIZED_TABLES["leaderboard_snapshots"]
 CURRENT_LEADERBOARD = "current_leaderboard"  # Keep old name for now
+CURRENT_RANKS = "current_ranks"
 PLAYERS_TABLE = NORMALIZED_TABLES["players"]
 
 
+def find_player_at_rank(rank: int, region: str, game_mode: str, db_cursor):
+    """
+    Row (player_name, rating, region, rank) for whoever holds `rank` in one
+    region/mode right now, or None. current_ranks covers the ladders the
+    snapshot ingest fetches (one primary-key probe); deeper ranks, or ones it
+    doesn't have yet, come from current_leaderboard's rank index.
+    """
+    if rank <= STATS_LIMIT:
+        db_cursor.execute(
+            f"""
+            SELECT p.player_name, r.rating, r.region, r.rank
+            FROM {CURRENT_RANKS} r
+            INNER JOIN {PLAYERS_TABLE} p ON r.player_id = p.player_id
+            WHERE r.region = %s AND r.game_mode = %s AND r.rank = %s;
+            """,
+            (region, game_mode, rank),
+        )
+        row = db_cursor.fetchone()
+        if row:
+            return row
+
+    db_cursor.execute(
+        f"""
+        SELECT player_name, rating, region, rank
+        FROM {CURRENT_LEADERBOARD}
+        WHERE region = %s AND game_mode = %s AND rank = %s
+        LIMIT 1;
+        """,
+        (region, game_mode, rank),
+    )
+    return db_cursor.fetchone()
+
+
 def resolve_players_from_rank(
     rank: int, region: Optional[str], game_mode: str, db_cursor
 ) -> List[str]:
-    if rank > STATS_LIMIT:
-        # Use current_leaderboard for ranks > 1000
-        table_name = CURRENT_LEADERBOARD
-        table_alias = "cl"
-
-        if region:
-            db_cursor.execute(
-                f"""
-                SELECT player_name
-                FROM {table_name} {table_alias}
-                WHERE {table_alias}.game_mode = %s AND {table_alias}.rank = %s AND {table_alias}.region = %s
-                LIMIT 1;
-                """,
-                (game_mode, rank, region),
-            )
-            row = db_cursor.fetchone()
-            return [row["player_name"]] if row else []
-        else:
-            db_cursor.execute(
-                f"""
-                SELECT DISTINCT ON ({table_alias}.region) player_name
-                FROM {table_name} {table_alias}
-                WHERE {table_alias}.game_mode = %s AND {table_alias}.rank = %s
-                ORDER BY {table_alias}.region DESC;
-                """,
-                (game_mode, rank),
-            )
-            return [r["player_name"] for r in db_cursor.fetchall()]
-    else:
-        # Use daily_leaderboard_stats for ranks <= 1000
-        if region:
-            db_cursor.execute(
-                f"""
-                SELECT p.player_name
-                FROM {DAILY_LEADERBOARD_STATS} d
-                INNER JOIN {PLAYERS_TABLE} p ON d.player_id = p.player_id
-                WHERE d.game_mode = %s AND d.rank = %s AND d.region = %s
-                ORDER BY d.day_start DESC
-                LIMIT 1;
-                """,
-                (game_mode, rank, region),
-            )
-            row = db_cursor.fetchone()
-            return [row["player_name"]] if row else []
-        else:
-            db_cursor.execute(
-                f"""
-                SELECT DISTINCT ON (d.region) p.player_name
-                FROM {DAILY_LEADERBOARD_STATS} d
-                INNER JOIN {PLAYERS_TABLE} p ON d.player_id = p.player_id
-                WHERE d.game_mode = %s AND d.rank = %s
-                ORDER BY d.region, d.day_start DESC;
-                """,
-                (game_mode, rank),
-            )
-            return [r["player_name"] for r in db_cursor.fetchall()]
+    player_names = []
+    for reg in [region] if region else REGIONS:
+        row = find_player_at_rank(rank, reg, game_mode, db_cursor)
+        if row:
+            player_names.append(row["player_name"])
+    return player_names
 
 
 def parse_rank_or_player_args(
@@ -82,7 +66,13 @@ def parse_rank_or_player_args(
     game_mode: str = "0",
     aliases: Optional[dict] = None,
     db_cursor=None,
+    alias: str = "ls",
 ):
+    """
+    (WHERE clause, params, rank, region) for a player name, alias or rank with
+    an optional region. The clause filters game_mode and region on the table
+    aliased as alias, joined to players as p.
+    """
     region = None
     search_term = None
 
@@ -111,10 +101,12 @@ def parse_rank_or_player_args(
             raise ValueError(f"No players found at rank {search_term}")
 
         placeholders = ", ".join(["%s"] * len(player_names))
-        where_clause = f"WHERE p.player_name IN ({placeholders}) AND ls.game_mode = %s"
+        where_clause = (
+            f"WHERE p.player_name IN ({placeholders}) AND {alias}.game_mode = %s"
+        )
         params = tuple(player_names) + (game_mode,)
         if region:
-            where_clause += " AND ls.region = %s"
+            where_clause += f" AND {alias}.region = %s"
             params += (region,)
         return where_clause, params, rank, region
 
@@ -128,9 +120,9 @@ def parse_rank_or_player_args(
             # Always use the alias - let the main query handle if player doesn't exist
             search_term = aliases[raw_term]
 
-    where_clause = "WHERE p.player_name = %s AND ls.game_mode = %s"
+    where_clause = f"WHERE p.player_name = %s AND {alias}.game_mode = %s"
     params = (search_term, game_mode)
     if region:
-        where_clause += " AND ls.region = %s"
+        where_clause += f" AND {alias}.region = %s"
         params += (region,)
     return where_clause, params, rank, region
@@ -0,0 +1,150 @@
+"""
+Past seasons archived to Parquet by scripts/handle_season_transition.py.
+
+Layout under SEASON_ARCHIVE_URI (a local directory or an s3:// prefix):
+
+    season=16/leaderboard_snapshots.parquet
+    season=16/daily_leaderboard_stats.parquet
+
+Rows are sorted by player_name, region, game_mode and written in row groups of
+ARCHIVE_ROW_GROUP_SIZE, so each row group's min/max statistics cover a narrow
+range of names and a filtered read only decodes the groups that can match.
+
+pyarrow is imported lazily: only the archive job and historical lookups need it.
+"""
+
+import os
+import re
+from typing import Optional
+
+from utils.constants import REGIONS
+
+SEASON_ARCHIVE_URI = os.environ.get("SEASON_ARCHIVE_URI", "")
+ARCHIVE_ROW_GROUP_SIZE = 100_000
+
+# Archived tables and the order their rows are written in
+ARCHIVE_TABLES = {
+    "leaderboard_snapshots": ("player_name", "region", "game_mode", "snapshot_time"),
+    "daily_leaderboard_stats": ("player_name", "region", "game_mode", "day_start"),
+}
+
+SEASON_ARG = re.compile(r"^s(\d+)$", re.IGNORECASE)
+
+
+def parse_season_arg(arg: Optional[str]) -> Optional[int]:
+    """Season number from a command argument like "s16", else None"""
+    match = SEASON_ARG.match(arg.strip()) if arg else None
+    return int(match.group(1)) if match else None
+
+
+def archive_schemas():
+    """Arrow schema of each archived table"""
+    import pyarrow as pa
+
+    return {
+        "leaderboard_snapshots": pa.schema(
+            [
+                ("player_name", pa.string()),
+                ("region", pa.string()),
+                ("game_mode", pa.string()),
+                ("rating", pa.int32()),
+                ("snapshot_time", pa.timestamp("us", tz="UTC")),
+            ]
+        ),
+        "daily_leaderboard_stats": pa.schema(
+            [
+                ("player_name", pa.string()),
+                ("region", pa.string()),
+                ("game_mode", pa.string()),
+                ("day_start", pa.date32()),
+                ("rating", pa.int32()),
+                ("rank", pa.int32()),
+                ("games_played", pa.int32()),
+                ("weekly_games_played", pa.int32()),
+                ("day_avg", pa.float64()),
+                ("weekly_avg", pa.float64()),
+            ]
+        ),
+    }
+
+
+def open_archive(root: str):
+    """(filesystem, base path) for an archive root, local or s3://"""
+    from pyarrow import fs
+
+    if "://" not in root:
+        root = os.path.abspath(root)
+    return fs.FileSystem.from_uri(root)
+
+
+def archive_path(base: str, season: int, table: str) -> str:
+    return f"{base.rstrip('/')}/season={season}/{table}.parquet"
+
+
+class SeasonArchive:
+    """Read-side of the season archive, for historical bot queries"""
+
+    def __init__(self, root: str = SEASON_ARCHIVE_URI):
+        self.root = root
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def _dataset(self, season: int, table: str):
+        import pyarrow.dataset as ds
+
+        filesystem, base = open_archive(self.root)
+        return ds.dataset(
+            archive_path(base, season, table), format="parquet", filesystem=filesystem
+        )
+
+    def has_season(self, season: int) -> bool:
+        from pyarrow import fs
+
+        filesystem, base = open_archive(self.root)
+        info = filesystem.get_file_info(
+            archive_path(base, season, "leaderboard_snapshots")
+        )
+        return info.type == fs.FileType.File
+
+    def peak(
+        self,
+        player_name: str,
+        season: int,
+        game_mode: str = "0",
+        region: Optional[str] = None,
+    ) -> list:
+        """
+        Peak rating per region for one player in an archived season, earliest
+        time first on ties. Streams the matching row groups batch by batch.
+        """
+        import pyarrow.dataset as ds
+
+        condition = (ds.field("player_name") == player_name) & (
+            ds.field("game_mode") == game_mode
+        )
+        if region:
+            condition = condition & (ds.field("region") == region)
+
+        best = {}
+        batches = self._dataset(season, "leaderboard_snapshots").to_batches(
+            columns=["region", "rating", "snapshot_time"], filter=condition
+        )
+        for batch in batches:
+            for row in batch.to_pylist():
+                current = best.get(row["region"])
+                if (
+                    current is None
+                    or row["rating"] > current["rating"]
+                    or (
+                        row["rating"] == current["rating"]
+                        and row["snapshot_time"] < current["snapshot_time"]
+                    )
+                ):
+                    best[row["region"]] = row
+
+        return [
+            {"player_name": player_name, **best[r]}
+            for r in sorted(best, key=REGIONS.index)
+        ]
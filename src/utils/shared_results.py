@@ -0,0 +1,147 @@
+"""
+Command results shared between bot shards.
+
+The same !top, !stats or !rank for a popular player is asked in many
+channels, and with sharding those channels sit on different processes.
+Each result is written to the command_results table with a short TTL, and
+any shard answering the same command with the same arguments reads it back
+instead of running the query again, so the database sees roughly one query
+per distinct question however many shards there are. The table is UNLOGGED:
+losing it on a crash only costs a few recomputed answers.
+
+Lookups run on the command executor's threads and share LeaderboardDB's
+connection pool; a cache error is logged and the command runs uncached.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+from logger import setup_logger
+from utils.command_cache import normalize
+
+logger = setup_logger("SharedResults")
+
+# Seconds a result is served to every shard
+DEFAULT_TTL = 20.0
+RESULT_TTLS = {
+    # Change only when the leaderboard is refreshed
+    "top10": 60.0,
+    "region_stats": 60.0,
+    "milestone": 60.0,
+}
+
+STATS_LOG_SECONDS = 60
+
+
+class SharedResultCache:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.errors = 0
+        self._logged = time.monotonic()
+
+    @staticmethod
+    def key(command: str, *args, **kwargs) -> str:
+        return json.dumps(
+            [
+                command,
+                [normalize(arg) for arg in args],
+                sorted((name, normalize(value)) for name, value in kwargs.items()),
+            ]
+        )
+
+    def get_or_run(self, command: str, fn, *args, **kwargs):
+        """fn(*args, **kwargs), or its result from another shard if still fresh"""
+        key = self.key(command, *args, **kwargs)
+        cached = self._get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits[command] += 1
+            self._maybe_log()
+            return cached
+
+        result = fn(*args, **kwargs)
+        with self._lock:
+            self.misses[command] += 1
+        # LeaderboardDB reports its errors as text; those aren't shared
+        if isinstance(result, str) and not result.startswith("Error"):
+            self._put(key, result, RESULT_TTLS.get(command, DEFAULT_TTL))
+        self._maybe_log()
+        return result
+
+    def _get(self, key: str):
+        conn = None
+        try:
+            conn = self.db._get_connection()
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT result FROM command_results
+                    WHERE key = %s AND expires_at > now()
+                    """,
+                    (key,),
+                )
+                row = cur.fetchone()
+            conn.commit()
+            return row[0] if row else None
+        except Exception as e:
+            self._failed(conn, e)
+            return None
+        finally:
+            if conn is not None:
+                self.db._connection_pool.putconn(conn)
+
+    def _put(self, key: str, result: str, ttl: float):
+        conn = None
+        try:
+            conn = self.db._get_connection()
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO command_results (key, result, expires_at)
+                    VALUES (%s, %s, now() + make_interval(secs => %s))
+                    ON CONFLICT (key) DO UPDATE
+                      SET result = EXCLUDED.result, expires_at = EXCLUDED.expires_at
+                    """,
+                    (key, result, ttl),
+                )
+            conn.commit()
+        except Exception as e:
+            self._failed(conn, e)
+        finally:
+            if conn is not None:
+                self.db._connection_pool.putconn(conn)
+
+    def _failed(self, conn, error):
+        with self._lock:
+            self.errors += 1
+        logger.error(f"Shared result cache error: {error}")
+        if conn is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_pct": round(100 * hits / (hits + misses), 1)
+                if hits + misses
+                else 0.0,
+                "hits_by_command": dict(self.hits),
+                "errors": self.errors,
+            }
+
+    def _maybe_log(self):
+        now = time.monotonic()
+        if now - self._logged >= STATS_LOG_SECONDS:
+            self._logged = now
+            logger.info(f"Shared result cache: {self.stats()}")
@@ -79,6 +79,35 @@ def get_all_live_channels():
         conn.close()
 
 
+# The bot reads the live channels every few seconds, so that read keeps one
+# connection open rather than connecting each time
+_live_conn = None
+
+
+def get_live_streams():
+    """{channel: (game_id, game_name)} for the channels twitch_live_check saw live"""
+    global _live_conn
+    if _live_conn is None or _live_conn.closed:
+        _live_conn = get_db_connection()
+    try:
+        with _live_conn:
+            with _live_conn.cursor() as cur:
+                cur.execute(
+                    "SELECT channel, game_id, game_name FROM channels WHERE live"
+                )
+                return {
+                    row[0].strip().lower(): (row[1], row[2]) for row in cur.fetchall()
+                }
+    except Exception:
+        # Most likely a dropped connection; reconnect on the next read
+        try:
+            _live_conn.close()
+        except Exception:
+            pass
+        _live_conn = None
+        raise
+
+
 def update_youtube(channel, youtube):
     channel = channel.lower()
     conn = get_db_connection()
@@ -27,4 +27,16 @@ class TimeRangeHelper:
         now = TimeRangeHelper.now_la()
         start_of_week = now - timedelta(days=now.weekday())  # Go back to Monday
         start = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(weeks=offset)
-        return start.astimezone(pytz.utc)
\ No newline at end of file
+        return start.astimezone(pytz.utc)
+
+    @staticmethod
+    def start_of_month_la(offset: int = 0):
+        """
+        Returns the start of the month `offset` months ago in UTC.
+        offset = 0 => current month
+        offset = 1 => last month
+        """
+        now = TimeRangeHelper.now_la()
+        year, month = divmod(now.year * 12 + now.month - 1 - offset, 12)
+        start = pytz.timezone("America/Los_Angeles").localize(datetime(year, month + 1, 1))
+        return start.astimezone(pytz.utc)
@@ -14,9 +14,23 @@ docker kill $(docker ps -q)
 docker rm $(docker ps -a -q)
 
 # Run containers with volume mounts
-docker run --restart always -d \
-  --name hs_twitch \
-  hs_leaderboards_twitch
+# TWITCH_SHARDS=3 ./start.sh runs three Twitch bot shards that split the
+# channels between them
+TWITCH_SHARDS=${TWITCH_SHARDS:-1}
+if [ "$TWITCH_SHARDS" -gt 1 ]; then
+  for shard in $(seq 0 $((TWITCH_SHARDS - 1))); do
+    docker run --restart always -d \
+      --name hs_twitch_$shard \
+      -e SHARD_ID=$shard \
+      -v wallii_data:/data \
+      hs_leaderboards_twitch
+  done
+else
+  docker run --restart always -d \
+    --name hs_twitch \
+    -v wallii_data:/data \
+    hs_leaderboards_twitch
+fi
 
 docker run --restart always -d \
   --name hs_discord \